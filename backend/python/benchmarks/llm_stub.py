@@ -0,0 +1,186 @@
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token of the stub's usage counts
+CHARS_PER_TOKEN = 4
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def stub_reply(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    A well-formed answer to each of the workflow's prompts: per-file summaries,
+    a file tree plan, or a cluster's folder name.
+    """
+    system = messages[0].get("content") or ""
+    prompt = messages[-1].get("content") or ""
+    if "Propose one folder name" in prompt:
+        return {"folder": "stub folder"}
+    if "dst_path" in system:
+        items = json.loads(prompt)
+        match = re.search(r"destination directory is '([^']+)'", system)
+        destination = match.group(1) if match else "/dst"
+        files = []
+        for item in items:
+            name = item["file_path"].rsplit("/", 1)[-1]
+            folder = (item.get("summary") or "misc").split()[0]
+            files.append({
+                "src_path": item["file_path"],
+                "dst_path": f"{destination}/{folder}/{name}",
+                "dst_path_new": f"{destination}/{folder}/new_{name}",
+            })
+        return {"files": files}
+    # Absolute paths only, skipping the schema example in the prompt
+    paths = re.findall(r'"file_path": "(/[^"]+)"', prompt)
+    return {"files": [{"file_path": path, "summary": f"topic{i % 8} summary of {path}"} for i, path in enumerate(paths)]}
+
+
+class StubLLMServer:
+    """
+    OpenAI-compatible chat completions server answering instantly computed
+    replies after a configurable delay, for benchmarking the workflow without a model.
+
+    Each request waits `latency` seconds plus its completion tokens at
+    `tokens_per_second`; streamed responses spread that time over their
+    chunks. Requests served and the peak number in flight are counted.
+
+    Use as a context manager, or call start() and stop().
+    """
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self.peak_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "peak_in_flight": self.peak_in_flight}
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.peak_in_flight = self._in_flight
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+            def _send_json(self, status: int, body: Dict[str, Any]):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub._enter()
+                try:
+                    self._complete(request)
+                finally:
+                    stub._exit()
+
+            def _complete(self, request: Dict[str, Any]):
+                messages = request.get("messages") or [{"content": ""}]
+                content = json.dumps(stub_reply(messages))
+                usage = {
+                    "prompt_tokens": sum(_tokens(m.get("content") or "") for m in messages),
+                    "completion_tokens": _tokens(content),
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                generation = usage["completion_tokens"] / stub.tokens_per_second if stub.tokens_per_second else 0.0
+                base = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                }
+                time.sleep(stub.latency)
+                if not request.get("stream"):
+                    time.sleep(generation)
+                    self._send_json(200, {
+                        **base,
+                        "object": "chat.completion",
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                pieces = [content[i:i + 64] for i in range(0, len(content), 64)]
+                for piece in pieces:
+                    time.sleep(generation / len(pieces))
+                    chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                final = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    final["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
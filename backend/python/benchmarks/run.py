@@ -0,0 +1,264 @@
+"""
+Benchmark the folder scan and organization hot paths and write the results as JSON.
+
+Run from backend/python:
+
+    python -m benchmarks.run --suite all --files 10000 100000 --output results.json
+    python -m benchmarks.run --suite llm --latency 0.5 --baseline results.json
+
+With --baseline, timings more than --tolerance slower than the baseline are
+reported as regressions and the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from benchmarks.llm_stub import StubLLMServer
+from benchmarks.synthetic_tree import SHAPES, generate_tree, synthetic_documents
+
+DEFAULT_TREE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "nst", "bench-trees")
+# Response layouts of /explorefolder, by Accept header
+ENCODINGS = {
+    "json": "application/json",
+    "columnar": "application/vnd.nst.columnar+json",
+    "msgpack": "application/msgpack",
+}
+# Metrics compared against a baseline; all are lower-is-better
+TIMING_METRICS = ("latency_median", "latency_p95", "wall_time")
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _latency_stats(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "latency_min": ordered[0],
+        "latency_median": statistics.median(ordered),
+        "latency_p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "latency_mean": statistics.fmean(ordered),
+    }
+
+
+def _explore_case(folder: str, encoding: str, parallel: bool, gzip: bool, repeat: int) -> Dict[str, Any]:
+    """
+    Time /explorefolder in a fresh process, so its peak RSS belongs to this case alone.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    rss_before = _peak_rss_bytes()
+    headers = {"Accept": ENCODINGS[encoding], "Accept-Encoding": "gzip" if gzip else "identity"}
+    samples = []
+    response = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.post("/explorefolder", json={"folder": folder, "parallel": parallel}, headers=headers)
+        samples.append(time.perf_counter() - started)
+        response.raise_for_status()
+    rss_after = _peak_rss_bytes()
+    return {
+        **_latency_stats(samples),
+        "payload_bytes": response.num_bytes_downloaded,
+        "decoded_bytes": len(response.content),
+        "peak_rss_bytes": rss_after,
+        "peak_rss_delta_bytes": rss_after - rss_before if rss_after is not None else None,
+    }
+
+
+def bench_explorefolder(
+    tree_dir: str,
+    file_counts: List[int],
+    shapes: List[str],
+    repeat: int,
+) -> List[Dict[str, Any]]:
+    """
+    /explorefolder latency, peak RSS and payload size over synthetic trees,
+    for every response layout, serial and parallel walks, with and without gzip.
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for files in file_counts:
+        for shape in shapes:
+            folder = os.path.join(tree_dir, f"{shape}-{files}")
+            started = time.perf_counter()
+            tree = generate_tree(folder, files=files, shape=shape)
+            print(f"Tree {shape}-{files} ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            for encoding in ENCODINGS:
+                for parallel in (False, True):
+                    for gzip in (False, True):
+                        params = {"files": files, "shape": shape, "folders": tree["folders"], "encoding": encoding, "parallel": parallel, "gzip": gzip, "repeat": repeat}
+                        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                            metrics = pool.submit(_explore_case, folder, encoding, parallel, gzip, repeat).result()
+                        name = f"explorefolder/{shape}-{files}/{encoding}{'/parallel' if parallel else ''}{'/gzip' if gzip else ''}"
+                        print(f"{name}: {metrics['latency_median'] * 1000:.1f} ms, {metrics['payload_bytes']} bytes", file=sys.stderr)
+                        results.append({"suite": "explorefolder", "name": name, "params": params, "metrics": metrics})
+    return results
+
+
+def bench_llm(
+    documents: int,
+    latency: float,
+    tokens_per_second: float,
+    max_concurrency: int,
+    stream: bool,
+) -> List[Dict[str, Any]]:
+    """
+    query_summaries and create_file_tree against a stub OpenAI-compatible
+    server, so only the workflow's own overhead and concurrency are measured.
+    """
+    # litellm requires a key for OpenAI-compatible endpoints; the stub ignores it
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    import dataorganization
+    from usage_accounting import usage_scope
+
+    docs = synthetic_documents(documents)
+    params = {"documents": documents, "latency": latency, "tokens_per_second": tokens_per_second, "max_concurrency": max_concurrency, "stream": stream}
+    results = []
+    with StubLLMServer(latency=latency, tokens_per_second=tokens_per_second) as stub:
+        with usage_scope(stage="benchmark") as meter:
+            started = time.perf_counter()
+            summaries = dataorganization.query_summaries.fn(
+                docs, "127.0.0.1", 0, "openai/stub", api_base=stub.url, stream=stream,
+                max_concurrency=max_concurrency, use_cache=False,
+            )
+            wall = time.perf_counter() - started
+        results.append({
+            "suite": "llm",
+            "name": "llm/query_summaries",
+            "params": params,
+            "metrics": {
+                "wall_time": wall,
+                "files": len(summaries["files"]),
+                "missing": summaries.get("missing", 0),
+                "files_per_second": len(summaries["files"]) / wall if wall else None,
+                **stub.stats(),
+                **meter.totals(),
+            },
+        })
+        print(f"llm/query_summaries: {wall:.2f}s for {len(summaries['files'])} files", file=sys.stderr)
+
+        for planner in ("single", "map_reduce", "embedding"):
+            stub.reset()
+            with usage_scope(stage="benchmark") as meter:
+                started = time.perf_counter()
+                file_tree = dataorganization.create_file_tree.fn(
+                    summaries["files"], "127.0.0.1", 0, "/bench/src", "/bench/dst", model="openai/stub",
+                    api_base=stub.url, stream=stream, planner=planner, max_concurrency=max_concurrency,
+                )
+                wall = time.perf_counter() - started
+            results.append({
+                "suite": "llm",
+                "name": f"llm/create_file_tree/{planner}",
+                "params": {**params, "planner": planner},
+                "metrics": {
+                    "wall_time": wall,
+                    "files": len(file_tree),
+                    **stub.stats(),
+                    **meter.totals(),
+                },
+            })
+            print(f"llm/create_file_tree/{planner}: {wall:.2f}s for {len(file_tree)} files", file=sys.stderr)
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """
+    The machine and revision the results were measured on.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        memory = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "memory_bytes": memory,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Timings of `results` more than `tolerance` (a fraction) slower than the baseline run of the same name.
+    """
+    previous = {entry["name"]: entry["metrics"] for entry in baseline}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["name"])
+        if old is None:
+            continue
+        for metric in TIMING_METRICS:
+            if metric in entry["metrics"] and old.get(metric):
+                ratio = entry["metrics"][metric] / old[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append({"name": entry["name"], "metric": metric, "baseline": old[metric], "current": entry["metrics"][metric], "ratio": ratio})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=("explorefolder", "llm", "all"), default="all")
+    parser.add_argument("--files", type=int, nargs="+", default=[10_000], help="Files per synthetic tree, e.g. 10000 100000 1000000")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed requests per /explorefolder case")
+    parser.add_argument("--tree-dir", default=DEFAULT_TREE_DIR, help="Where synthetic trees are generated and reused")
+    parser.add_argument("--documents", type=int, default=200, help="Documents summarized in the LLM suite")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the stub LLM waits before answering")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Stub LLM generation speed; 0 answers at once")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="LLM requests in flight at once")
+    parser.add_argument("--stream", action="store_true", help="Stream LLM responses")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON results file, or - for stdout")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.suite in ("explorefolder", "all"):
+        results.extend(bench_explorefolder(args.tree_dir, args.files, args.shapes, args.repeat))
+    if args.suite in ("llm", "all"):
+        results.extend(bench_llm(args.documents, args.latency, args.tokens_per_second, args.max_concurrency, args.stream))
+
+    report: Dict[str, Any] = {"environment": environment(), "results": results}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in report["regressions"]:
+            print(f"Regression: {regression['name']} {regression['metric']} {regression['ratio']:.2f}x baseline", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import os
+import json
+import random
+import shutil
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SHAPES = ("wide", "deep", "balanced")
+# Extension mix of a typical documents folder, as (extension, weight)
+DEFAULT_EXTENSIONS: List[Tuple[str, int]] = [
+    (".pdf", 20),
+    (".docx", 10),
+    (".xlsx", 5),
+    (".pptx", 3),
+    (".txt", 15),
+    (".md", 10),
+    (".csv", 7),
+    (".json", 5),
+    (".py", 5),
+    (".jpg", 12),
+    (".png", 8),
+]
+# Written beside the tree (not in it, so scans do not see it) to avoid generating an identical tree twice
+SPEC_SUFFIX = ".nst_bench_tree.json"
+WORDS = (
+    "invoice report budget meeting notes draft final review project plan summary "
+    "experiment results data analysis figure table appendix contract quarterly annual"
+).split()
+
+
+def _folders(shape: str, files: int, files_per_folder: int, depth: int, rng: random.Random) -> List[str]:
+    """
+    Relative folders of a tree with `files` files spread `files_per_folder` to a folder.
+    """
+    count = max(1, -(-files // files_per_folder))
+    if shape == "wide":
+        # Every folder directly under the root
+        return [f"dir{i:06d}" for i in range(count)]
+    if shape == "deep":
+        # Chains of `depth` nested folders, each level holding files
+        return [
+            os.path.join(f"chain{i // depth:05d}", *[f"level{level:02d}" for level in range(1, i % depth + 1)])
+            for i in range(count)
+        ]
+    # Balanced: a tree of `depth` levels with the same fan-out at every level
+    fan_out = 2
+    while fan_out ** depth < count:
+        fan_out += 1
+    folders = []
+    for i in range(count):
+        parts = []
+        n = i
+        for _ in range(depth):
+            parts.append(f"d{n % fan_out:03d}")
+            n //= fan_out
+        folders.append(os.path.join(*parts))
+    rng.shuffle(folders)
+    return folders
+
+
+def generate_tree(
+    root: str,
+    files: int = 10_000,
+    shape: str = "balanced",
+    files_per_folder: int = 100,
+    depth: int = 6,
+    extensions: Optional[List[Tuple[str, int]]] = None,
+    max_file_bytes: int = 4096,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Create a reproducible synthetic folder tree for benchmarks.
+
+    The same arguments always produce the same names, extensions and file
+    sizes. If `root` already holds a tree generated with the same arguments
+    it is reused, so large trees are only written once.
+
+    Args:
+        root (str): Folder to create the tree in; replaced if it holds a different tree.
+        files (int, optional): Number of files. Defaults to 10,000.
+        shape (str, optional): "wide", "deep" or "balanced". Defaults to "balanced".
+        files_per_folder (int, optional): Files in each folder.
+        depth (int, optional): Nesting depth of the deep and balanced shapes.
+        extensions (List[Tuple[str, int]], optional): (extension, weight) pairs of the mix.
+        max_file_bytes (int, optional): Upper bound of the random file sizes.
+        seed (int, optional): Random seed.
+
+    Returns:
+        Dict[str, Any]: The generation arguments, with the number of folders and total bytes written.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown tree shape: {shape}")
+    extensions = extensions or DEFAULT_EXTENSIONS
+    spec = {
+        "files": files,
+        "shape": shape,
+        "files_per_folder": files_per_folder,
+        "depth": depth,
+        "extensions": [list(pair) for pair in extensions],
+        "max_file_bytes": max_file_bytes,
+        "seed": seed,
+    }
+    spec_path = os.path.abspath(root).rstrip(os.sep) + SPEC_SUFFIX
+    try:
+        with open(spec_path, encoding="utf-8") as f:
+            existing = json.load(f)
+        if existing.get("spec") == spec and os.path.isdir(root):
+            return existing
+    except (OSError, ValueError):
+        pass
+    if os.path.exists(root):
+        shutil.rmtree(root)
+
+    rng = random.Random(seed)
+    folders = _folders(shape, files, files_per_folder, depth, rng)
+    names, weights = zip(*extensions)
+    filler = (" ".join(WORDS) + "\n").encode() * (max_file_bytes // 64 + 1)
+    total_bytes = 0
+    for i in range(files):
+        folder = os.path.join(root, folders[i // files_per_folder % len(folders)])
+        if i % files_per_folder == 0:
+            os.makedirs(folder, exist_ok=True)
+        name = f"{rng.choice(WORDS)}_{i:07d}{rng.choices(names, weights)[0]}"
+        size = rng.randint(0, max_file_bytes)
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(filler[:size])
+        total_bytes += size
+
+    info = {"spec": spec, "folders": len(set(folders)), "total_bytes": total_bytes}
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    logger.info(f"Generated {files} files in {len(set(folders))} folders under {root}")
+    return info
+
+
+def synthetic_documents(count: int, words: int = 400, source: str = "/bench/src", seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    In-memory documents shaped like load_documents' output, for benchmarking the LLM stages without parsing.
+    """
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        name = f"{rng.choice(WORDS)}_{i:07d}.txt"
+        documents.append({
+            "content": " ".join(rng.choices(WORDS, k=words)),
+            "file_path": f"{source}/{name}",
+            "file_name": name,
+            "file_type": "text/plain",
+        })
+    return documents
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Location of the checkpoint database; override with the NST_CHECKPOINT_PATH environment variable
+DEFAULT_CHECKPOINT_PATH = os.environ.get(
+    "NST_CHECKPOINT_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "nst", "checkpoints.sqlite3"),
+)
+# Checkpoints older than this many seconds are dropped
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    stage TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (stage, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints (created);
+"""
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Stable digest of a stage's inputs; any JSON-serializable values.
+    """
+    data = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Persistent SQLite store of completed workflow stage outputs, keyed by
+    stage and the fingerprint of the stage's inputs. A re-run with the same
+    inputs picks up the output instead of recomputing it.
+    """
+    def __init__(self, db_path: str = DEFAULT_CHECKPOINT_PATH, max_age: float = DEFAULT_MAX_AGE):
+        self.db_path = db_path
+        self.max_age = max_age
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """
+        The checkpointed output of `stage` for inputs with fingerprint `key`, or None.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM checkpoints WHERE stage = ? AND fingerprint = ? AND created >= ?",
+                (stage, key, time.time() - self.max_age),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, stage: str, key: str, value: Any):
+        """
+        Store the output of `stage`, then drop expired checkpoints.
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (stage, fingerprint, payload, created) VALUES (?, ?, ?, ?)",
+                (stage, key, payload, now),
+            )
+            deleted = conn.execute("DELETE FROM checkpoints WHERE created < ?", (now - self.max_age,)).rowcount
+        if deleted:
+            logger.info(f"Dropped {deleted} expired checkpoints")
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM checkpoints").fetchone()
+        return {"entries": count, "bytes": total}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """
+    Return the process-wide CheckpointStore at DEFAULT_CHECKPOINT_PATH, opening it on first use.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CheckpointStore()
+        return _default_store
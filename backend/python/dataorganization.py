@@ -1,13 +1,40 @@
 import json
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Callable, Optional, Tuple
 
 from dotenv import load_dotenv
-from llama_index.core import SimpleDirectoryReader
-import ollama
-from litellm import completion, success_callback
+from litellm import completion
+
+from checkpoints import fingerprint, get_checkpoint_store
+from deduplication import NearDuplicateIndex, fan_out_summaries, find_duplicate_files, find_near_duplicates, merge_groups
+from document_loading import DEFAULT_PARSE_WORKERS, iter_documents, list_document_files
+from excerpting import DEFAULT_EXCERPT_TOKENS, prepare_document, prompt_fields
+from organization_manifest import OrganizationManifest, stat_files
+from llm_clients import get_client_pool
+from materialization import materialize, resolve_destination, unique_directories
+from llm_scheduler import get_llm_scheduler
+from llm_batching import (
+    DEFAULT_BATCH_FILES,
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_MAX_CONCURRENCY,
+    count_tokens,
+    merge_file_results,
+    pack_batches,
+    run_batches,
+    truncate_tokens,
+)
+from progress import report_progress
+from stream_parsing import consume_stream
+from summary_cache import get_summary_cache, summary_key
+from usage_accounting import record_completion, usage_scope
+from embeddings import HashingEmbedder, cluster_texts, get_embedder
+from tree_planning import DEFAULT_CLUSTER_SIZE, cluster_label, cluster_summaries, folder_name, reconcile_plans
 
 from prefect import flow, task
+from prefect.futures import wait
 from prefect.logging import get_logger
 
 # Import Rich components
@@ -47,16 +74,23 @@ class ListResponse:
     def __init__(self, models):
         self.models = models
 
-# Global cost tracker
-COST_TRACKER = {"cost": 0.0}
+# Bump when the summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "2"
+
+# Summaries shown to the model when it names a cluster, and their token cap
+CLUSTER_NAME_SAMPLE = 12
+CLUSTER_NAME_SUMMARY_TOKENS = 60
+# Existing destination folders offered to the model as placement targets
+MAX_EXISTING_FOLDERS = 200
 
 @task
 def list_ollama_models():
     """
-    Fetch and display Ollama models using Rich Table.
+    Fetch and display Ollama models using Rich Table. The listing is cached
+    for a short while, so repeated runs do not query Ollama every time.
     """
     try:
-        ollama_models = ollama.list()
+        ollama_models = get_client_pool().list_models()
         if not ollama_models.models:
             logger.warning("No Ollama models found.")
             console.print("[bold yellow]No Ollama models found.[/bold yellow]")
@@ -91,53 +125,51 @@ def list_ollama_models():
         console.print(f"[bold red]Error fetching Ollama models:[/bold red] {e}")
 
 @task
-def track_cost_callback(kwargs, completion_response, start_time, end_time, stream=False):
-    """
-    Callback function to track and calculate the cost based on token usage.
+def preload_models(models: List[str], api_base: str) -> Dict[str, bool]:
     """
-    try:
-        if hasattr(completion_response, "to_dict"):
-            response_dict = completion_response.to_dict()
-        elif isinstance(completion_response, dict):
-            response_dict = completion_response
-        else:
-            response_dict = json.loads(str(completion_response))
+    Load the local Ollama models among `models` before their first completion
+    and keep them resident between stages. Other models are left alone.
 
-        usage = response_dict.get("usage", {})
-        total_tokens = usage.get("total_tokens", 0)
-        COST_TRACKER["cost"] = (total_tokens / 1000.0) * 0.003  # Example cost calculation
-        logger.info(f"Calculated cost: {COST_TRACKER['cost']}")
-        console.print(f"[bold green]Calculated cost:[/bold green] [yellow]{COST_TRACKER['cost']}[/yellow]")
-    except Exception as e:
-        logger.error(f"Error in track_cost_callback: {e}")
-        console.print(f"[bold red]Error in track_cost_callback:[/bold red] {e}")
+    Args:
+        models (List[str]): Model names as passed to litellm.
+        api_base (str): Base URL of the Ollama server.
 
-@task
-def set_success_callback():
-    """
-    Set the global success callback for cost tracking.
+    Returns:
+        Dict[str, bool]: Whether each Ollama model was loaded.
     """
     try:
-        # Ensure success_callback is treated as a list
-        # If success_callback is a list-like structure from litellm, we can do this:
-        success_callback.clear()
-        success_callback.append(track_cost_callback)
-        logger.info("Success callback set successfully.")
+        return get_client_pool().preload(models, api_base)
     except Exception as e:
-        logger.error(f"Error setting success callback: {e}")
-        console.print(f"[bold red]Error setting success callback:[/bold red] {e}")
+        logger.error(f"Error preloading models: {e}")
+        console.print(f"[bold red]Error preloading models:[/bold red] {e}")
+        return {}
 
 @task
-def load_documents(path: str) -> List[Dict[str, Any]]:
+def load_documents(
+    path: str,
+    workers: int = DEFAULT_PARSE_WORKERS,
+    excerpt_tokens: Optional[int] = None,
+    files: Optional[List[str]] = None,
+    fingerprint: bool = False
+) -> List[Dict[str, Any]]:
     """
     Load documents from the specified path.
+
+    Files are parsed one at a time through iter_documents, with PDF, DOCX and
+    similar formats parsed across `workers` processes. With `excerpt_tokens`,
+    each document is reduced to its excerpt as it is loaded, so full texts
+    are never held at once. `files` restricts loading to the given files.
+    With `fingerprint`, excerpted documents keep the simhash of their full
+    text for near-duplicate detection.
     """
     try:
-        reader = SimpleDirectoryReader(input_dir=path)
-        documents = reader.load_data()
+        documents = iter_documents(path, workers=workers, files=files)
+        if excerpt_tokens:
+            documents = (prepare_document(doc, excerpt_tokens, fingerprint) for doc in documents)
+        documents = list(documents)
         logger.info(f"Loaded {len(documents)} documents from {path}")
         console.print(f"[bold green]Loaded {len(documents)} documents from {path}[/bold green]")
-        return [{"content": d.text, **d.metadata} for d in documents]
+        return documents
     except Exception as e:
         logger.error(f"Error loading documents from {path}: {e}")
         console.print(f"[bold red]Error loading documents from {path}:[/bold red] {e}")
@@ -164,16 +196,128 @@ def process_metadata(doc_dicts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         return []
 
 @task
-def query_summaries(
+def find_exact_duplicates(paths: List[str]) -> Dict[str, List[str]]:
+    """
+    Find byte-identical copies among `paths`, so only one of each is parsed and summarized.
+
+    Returns:
+        Dict[str, List[str]]: The other copies of each duplicated file, keyed by the copy that is kept.
+    """
+    try:
+        duplicates = find_duplicate_files(paths)
+        copies = sum(len(members) for members in duplicates.values())
+        logger.info(f"Found {copies} exact duplicates of {len(duplicates)} files")
+        console.print(f"[bold green]Found {copies} exact duplicates of {len(duplicates)} files[/bold green]")
+        return duplicates
+    except Exception as e:
+        logger.error(f"Error finding duplicate files: {e}")
+        console.print(f"[bold red]Error finding duplicate files:[/bold red] {e}")
+        return {}
+
+@task
+def remove_near_duplicates(doc_dicts: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    """
+    Drop documents whose text nearly matches an earlier document's.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, List[str]]]: The remaining
+        documents, and the file paths of the near-duplicates of each kept document.
+    """
+    try:
+        groups = find_near_duplicates(doc_dicts)
+    except Exception as e:
+        logger.error(f"Error finding near-duplicate documents: {e}")
+        console.print(f"[bold red]Error finding near-duplicate documents:[/bold red] {e}")
+        return doc_dicts, {}
+    dropped = {path for members in groups.values() for path in members}
+    logger.info(f"Found {len(dropped)} near-duplicate documents")
+    console.print(f"[bold green]Found {len(dropped)} near-duplicate documents[/bold green]")
+    return [doc for doc in doc_dicts if doc["file_path"] not in dropped], groups
+
+def _read_response(
+    response: Any,
+    stream: bool = False,
+    on_item: Optional[Callable[[Any], None]] = None
+) -> Optional[Tuple[str, Dict[str, Any], List[Any]]]:
+    """
+    Read the content and token usage of a completion response, streamed or not.
+
+    When streaming, items of the "files" array are parsed as they arrive and
+    passed to `on_item` as soon as each is complete.
+
+    Returns:
+        Optional[Tuple[str, Dict[str, Any], List[Any]]]: The content, the usage
+        and the items parsed while streaming, or None if the response could not be read.
+    """
+    if response is None:
+        logger.warning("No response received from the API.")
+        console.print("[bold yellow]No response received from the API.[/bold yellow]")
+        return None
+
+    try:
+        if stream:
+            content, items, usage = consume_stream(response, "files", on_item)
+            return content, usage or {}, items
+        response_dict = response.to_dict() if hasattr(response, "to_dict") else json.loads(str(response))
+    except Exception as e:
+        logger.error(f"Error parsing response: {e}")
+        console.print(f"[bold red]Error parsing response:[/bold red] {e}")
+        return None
+
+    content = response_dict.get("choices", [{}])[0].get("message", {}).get("content", "")
+    return content, response_dict.get("usage") or {}, []
+
+def _pooled_completion(model: str, messages: List[Dict[str, Any]], api_base: Optional[str] = None, **kwargs: Any) -> Any:
+    """
+    litellm completion over the pooled, kept-alive connection of `api_base`.
+    """
+    return completion(model=model, messages=messages, api_base=api_base, **get_client_pool().completion_kwargs(model, api_base), **kwargs)
+
+def _record_usage(
+    model: str,
+    messages: List[Dict[str, str]],
+    content: str,
+    usage: Dict[str, Any],
+    started: float,
+    shared: bool = False
+) -> Dict[str, Any]:
+    """
+    Record a completion's tokens, latency and cost in the current usage scope.
+    Tokens are estimated when the provider reports no usage. A response
+    `shared` with an identical request is not recorded again.
+
+    Returns:
+        Dict[str, Any]: The usage that was recorded.
+    """
+    if not usage:
+        usage = {
+            "prompt_tokens": sum(count_tokens(message["content"]) for message in messages),
+            "completion_tokens": count_tokens(content or ""),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    if not shared:
+        record_completion(model, usage, time.perf_counter() - started)
+    return usage
+
+def _summarize_batch(
     doc_dicts: List[Dict[str, Any]],
-    host: str,
-    port: int,
     model: str,
-    api_base: str = None,
-    stream: bool = False
+    api_base: str,
+    stream: bool = False,
+    on_summary: Optional[Callable[[Dict[str, Any]], None]] = None
 ) -> Dict[str, Any]:
+    """
+    Summarize one batch of documents with a single completion call.
+
+    `on_summary` is called with each file's summary as soon as it is parsed,
+    which while streaming is before the rest of the response has arrived.
+
+    Returns:
+        Dict[str, Any]: The batch's "files" summaries and, if reported, its token "usage".
+    """
+    documents = json.dumps([prompt_fields(doc) for doc in doc_dicts], ensure_ascii=False)
     PROMPT = f""" 
-    The following is a list of file contents, along with their metadata. For each file, provide a summary of the contents. The purpose of the summary is to organize files based on their content. To this end provide a concise but informative summary. Try to make the summary as specific to the file as possible. {doc_dicts}
+    The following is a list of file excerpts, along with their metadata. Long files are shortened to their headings and the start and end of their content, separated by [...]. For each file, provide a summary of the contents. The purpose of the summary is to organize files based on their content. To this end provide a concise but informative summary. Try to make the summary as specific to the file as possible. {documents}
     
     Do not call any functions. Do not return a function call. Only return the requested JSON.
     Return a JSON object with the following schema:
@@ -190,26 +334,25 @@ def query_summaries(
     ```
     """.strip()
 
-    if not api_base:
-        api_base = f"http://{host}:{port}"
-        logger.info(f"API Base set to: {api_base}")
-        console.print(f"[bold blue]API Base set to: {api_base}[/bold blue]")
-
+    messages = [
+        {
+            "role": "system", 
+            "content": "Always return JSON. Do not include any other text or formatting characters."
+        },
+        {
+            "role": "user", 
+            "content": PROMPT
+        }
+    ]
+    started = time.perf_counter()
     try:
-        response = completion(
-            model=model, 
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "Always return JSON. Do not include any other text or formatting characters."
-                },
-                {
-                    "role": "user", 
-                    "content": PROMPT
-                }
-            ],
+        response, model, shared = get_llm_scheduler().complete(
+            _pooled_completion,
+            model,
+            messages,
             api_base=api_base,
             stream=stream,
+            **({"stream_options": {"include_usage": True}} if stream else {}),
             response_format={"type": "json_object"},  # Ensures the response is JSON
             # functions=[],  # Disable function calls
             # function_call="none"  # Do not allow the LLM to return a function call
@@ -217,81 +360,208 @@ def query_summaries(
     except Exception as e:
         logger.error(f"LiteLLM Error >>> {e}")
         console.print(f"[bold red]LiteLLM Error:[/bold red] {e}")
-        return {"files": [], "cost": COST_TRACKER["cost"]}
+        return {"files": []}
 
-    if response is None:
-        logger.warning("No response received from the API.")
-        console.print("[bold yellow]No response received from the API.[/bold yellow]")
-        return {"files": [], "cost": COST_TRACKER["cost"]}
+    result = _read_response(response, stream, on_summary)
+    if result is None:
+        return {"files": []}
+    content, usage, streamed = result
+    usage = _record_usage(model, messages, content, usage, started, shared)
 
-    try:
-        response_dict = response.to_dict() if hasattr(response, "to_dict") else json.loads(str(response))
-    except (TypeError, json.JSONDecodeError) as e:
-        logger.error(f"Error parsing response: {e}")
-        console.print(f"[bold red]Error parsing response:[/bold red] {e}")
-        return {"files": [], "cost": COST_TRACKER["cost"]}
-
-    content = response_dict.get("choices", [{}])[0].get("message", {}).get("content", "")
-    print(">>>> Content summary:")
-    print(content)
-
-    try:
-        summaries = json.loads(content)
-        print("Summaries:")
-        print(summaries)
-    except json.JSONDecodeError:
-        logger.error("Error decoding JSON content from summaries.")
-        console.print("[bold red]Error decoding JSON content from summaries.[/bold red]")
-        summaries = {"files": []}
-
-    if isinstance(summaries, list) and summaries and isinstance(summaries[0], dict):
-        summaries = summaries[0]
-
-    usage = response_dict.get("usage", {})
-    if usage and isinstance(summaries, dict):
+    if streamed:
+        summaries = {"files": streamed}
+    else:
+        try:
+            summaries = json.loads(content)
+        except json.JSONDecodeError:
+            logger.error("Error decoding JSON content from summaries.")
+            console.print("[bold red]Error decoding JSON content from summaries.[/bold red]")
+            summaries = {"files": []}
+
+        if isinstance(summaries, list) and summaries and isinstance(summaries[0], dict):
+            summaries = summaries[0]
+        if not isinstance(summaries, dict) or not isinstance(summaries.get("files"), list):
+            logger.error("Summaries response has no 'files' list.")
+            return {"files": []}
+        if on_summary is not None:
+            for item in summaries["files"]:
+                on_summary(item)
+
+    if usage:
         summaries["usage"] = {
             "completion_tokens": usage.get("completion_tokens"),
             "prompt_tokens": usage.get("prompt_tokens"),
             "total_tokens": usage.get("total_tokens")
         }
+    return summaries
 
-    if isinstance(summaries, dict):
-        summaries["cost"] = COST_TRACKER["cost"]
-    else:
-        summaries = {"files": [], "cost": COST_TRACKER["cost"]}
+@task
+def query_summaries(
+    doc_dicts: List[Dict[str, Any]],
+    host: str,
+    port: int,
+    model: str,
+    api_base: str = None,
+    stream: bool = False,
+    batch_tokens: int = DEFAULT_BATCH_TOKENS,
+    batch_files: int = DEFAULT_BATCH_FILES,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    use_cache: bool = True,
+    excerpt_tokens: int = DEFAULT_EXCERPT_TOKENS,
+    on_summary: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Summarize documents in token-budgeted batches, sending up to `max_concurrency` batches at once.
+
+    Each document is sent as a bounded excerpt of at most `excerpt_tokens`
+    tokens with only the metadata the model needs. Summaries are cached by
+    content hash, model and prompt version, so only new or changed documents
+    are sent to the model. Each batch is cached as soon as it completes, so
+    a failed or interrupted run resumes after its last completed batch.
+
+    Args:
+        doc_dicts (List[Dict[str, Any]]): Documents with their content and metadata.
+        host (str): API host address.
+        port (int): API port number.
+        model (str): Model name for summarizing documents.
+        api_base (str, optional): Base URL for the API. Defaults to None.
+        stream (bool, optional): Whether to use streaming. Defaults to False.
+        batch_tokens (int, optional): Document tokens per request.
+        batch_files (int, optional): Documents per request.
+        max_concurrency (int, optional): Requests in flight at once.
+        use_cache (bool, optional): Whether to reuse and store cached summaries. Defaults to True.
+        excerpt_tokens (int, optional): Token cap of each document's excerpt.
+        on_summary (Callable, optional): Called with each file's summary as soon as it is available.
+
+    Returns:
+        Dict[str, Any]: Merged "files" summaries, summed token "usage" and
+        "cost", and the number of documents "missing" a summary after failed batches.
+    """
+    if not api_base:
+        api_base = f"http://{host}:{port}"
+        logger.info(f"API Base set to: {api_base}")
+        console.print(f"[bold blue]API Base set to: {api_base}[/bold blue]")
+
+    doc_dicts = [prepare_document(doc, excerpt_tokens) for doc in doc_dicts]
+    prompt_version = f"{SUMMARY_PROMPT_VERSION}:{excerpt_tokens}"
+
+    cache = None
+    keys = {}
+    cached_files = []
+    pending = doc_dicts
+    if use_cache:
+        try:
+            cache = get_summary_cache()
+            keys = {
+                doc.get("file_path"): summary_key(doc["content_hash"], model, prompt_version)
+                for doc in doc_dicts
+            }
+            hits = cache.get_many(list(keys.values()))
+            cached_files = [
+                {"file_path": doc.get("file_path"), "summary": hits[keys[doc.get("file_path")]]}
+                for doc in doc_dicts if keys[doc.get("file_path")] in hits
+            ]
+            pending = [doc for doc in doc_dicts if keys[doc.get("file_path")] not in hits]
+            if on_summary is not None:
+                for item in cached_files:
+                    on_summary(item)
+            logger.info(f"Summary cache: {len(cached_files)} hits, {len(pending)} misses")
+            console.print(f"[bold blue]Summary cache: {len(cached_files)} hits, {len(pending)} misses[/bold blue]")
+        except Exception as e:
+            logger.error(f"Error reading summary cache: {e}")
+            console.print(f"[bold red]Error reading summary cache:[/bold red] {e}")
+            cache, cached_files, pending = None, [], doc_dicts
+
+    # Documents are costed as they appear in the prompt
+    batches = pack_batches(pending, batch_tokens, lambda doc: count_tokens(json.dumps(prompt_fields(doc), ensure_ascii=False)), max_items=batch_files)
+    logger.info(f"Summarizing {len(pending)} documents in {len(batches)} batches, {max_concurrency} at a time")
+    console.print(f"[bold blue]Summarizing {len(pending)} documents in {len(batches)} batches[/bold blue]")
+
+    done = [len(cached_files)]
+    done_lock = threading.Lock()
+
+    def store(files: List[Dict[str, Any]]):
+        try:
+            cache.put_many(
+                (keys[item["file_path"]], item["summary"])
+                for item in files
+                if item.get("file_path") in keys and isinstance(item.get("summary"), str)
+            )
+        except Exception as e:
+            logger.error(f"Error writing summary cache: {e}")
+            console.print(f"[bold red]Error writing summary cache:[/bold red] {e}")
+
+    def summarize(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = _summarize_batch(batch, model, api_base, stream, on_summary)
+        if cache is not None:
+            # Checkpoint the batch before moving on
+            store(result.get("files", []))
+        with done_lock:
+            done[0] += len(batch)
+            summarized = done[0]
+        report_progress("summarizing", documents=summarized, total=len(doc_dicts))
+        return result
+
+    report_progress("summarizing", documents=done[0], total=len(doc_dicts))
+    with usage_scope(stage="summarizing") as usage:
+        results = run_batches(summarize, batches, max_concurrency)
+    summaries = merge_file_results(results)
+    summaries["files"] = cached_files + summaries["files"]
+    summaries["cost"] = usage.totals()["cost"]
+    summarized = {item.get("file_path") for item in summaries["files"]}
+    summaries["missing"] = sum(1 for doc in doc_dicts if doc.get("file_path") not in summarized)
 
     logger.info(f"Generated summaries for {len(summaries.get('files', []))} files with cost {summaries.get('cost')}")
     console.print(f"[bold green]Generated summaries for {len(summaries.get('files', []))} files with cost {summaries.get('cost')}[/bold green]")
     return summaries
 
 
-@task
-def create_file_tree(
+def find_key(obj: Any, key: str) -> Any:
+    """
+    Return the first value stored under `key` anywhere in a nested dict/list structure.
+    """
+    if isinstance(obj, dict):
+        if key in obj:
+            return obj[key]
+        for value in obj.values():
+            result = find_key(value, key)
+            if result is not None:
+                return result
+    elif isinstance(obj, list):
+        for item in obj:
+            result = find_key(item, key)
+            if result is not None:
+                return result
+    return None
+
+def _existing_folders_note(existing_folders: Optional[List[str]]) -> str:
+    """
+    Prompt text offering the destination's existing folders as placement targets.
+    """
+    if not existing_folders:
+        return ""
+    folders = json.dumps(existing_folders[:MAX_EXISTING_FOLDERS], ensure_ascii=False)
+    return f"The destination already contains these folders (relative to the destination directory). Prefer placing files in one of them when it fits, and only create a new folder otherwise: {folders}"
+
+def _plan_file_tree(
     summaries: List[Dict[str, Any]],
-    host: str,
-    port: int,
     source_path: str,
     destination_path: str,
-    model: str = "llama-3.1-70b-versatile",
-    api_base: str = None,
-    stream: bool = False
+    model: str,
+    api_base: str,
+    stream: bool = False,
+    existing_folders: Optional[List[str]] = None,
+    on_entry: Optional[Callable[[Dict[str, str]], None]] = None,
+    fallback_models: Optional[List[str]] = None
 ) -> List[Dict[str, str]]:
-    # Define the helper function within the task
-    def find_key(obj: Any, key: str) -> Any:
-        if isinstance(obj, dict):
-            if key in obj:
-                return obj[key]
-            for value in obj.values():
-                result = find_key(value, key)
-                if result is not None:
-                    return result
-        elif isinstance(obj, list):
-            for item in obj:
-                result = find_key(item, key)
-                if result is not None:
-                    return result
-        return None
+    """
+    Ask the model for the destination of every summarized file in one completion call.
+
+    `on_entry` is called with each file's entry as soon as it is parsed.
 
+    Returns:
+        List[Dict[str, str]]: src_path, dst_path and dst_path_new for each file.
+    """
     PROMPT = f"""
     You will be provided with a list of source files and a summary of their contents. The source files are located in '{source_path}', and the destination directory is '{destination_path}'.
     
@@ -305,6 +575,7 @@ def create_file_tree(
     - Use clear and descriptive names without spaces or special characters.
     - Do not change the file extension.
     - If the file is already well-named or follows a known convention, retain its name for 'dst_path'.
+    {_existing_folders_note(existing_folders)}
     
     **Example**:
     ```json
@@ -335,40 +606,34 @@ def create_file_tree(
     Do **not** wrap the "files" key inside any other keys.
     """.strip()
 
-    if not api_base:
-        api_base = f"http://{host}:{port}"
-        logger.info(f"API Base set to: {api_base}")
-        console.print(f"[bold blue]API Base set to: {api_base}[/bold blue]")
-
+    messages = [
+        {"role": "system", "content": PROMPT},
+        {"role": "user", "content": json.dumps(summaries)},
+    ]
+    started = time.perf_counter()
     try:
-        response = completion(
-            model=model,
-            messages=[
-                {"role": "system", "content": PROMPT},
-                {"role": "user", "content": json.dumps(summaries)},
-            ],
+        response, model, shared = get_llm_scheduler().complete(
+            _pooled_completion,
+            model,
+            messages,
             api_base=api_base,
+            fallbacks=fallback_models or [],
             stream=stream,
-            response_format={"type": "json_object"}  # Ensures the response is JSON
+            response_format={"type": "json_object"},  # Ensures the response is JSON
+            **({"stream_options": {"include_usage": True}} if stream else {})
         )
     except Exception as e:
         logger.error(f"LiteLLM Error >>> {e}")
         console.print(f"[bold red]LiteLLM Error:[/bold red] {e}")
         return []
 
-    if response is None:
-        logger.warning("No response received from the API.")
-        console.print("[bold yellow]No response received from the API.[/bold yellow]")
+    result = _read_response(response, stream, on_entry)
+    if result is None:
         return []
-
-    try:
-        response_dict = response.to_dict() if hasattr(response, "to_dict") else json.loads(str(response))
-    except (TypeError, json.JSONDecodeError) as e:
-        logger.error(f"Error parsing response: {e}")
-        console.print(f"[bold red]Error parsing response:[/bold red] {e}")
-        return []
-
-    content = response_dict.get("choices", [{}])[0].get("message", {}).get("content", "")
+    content, usage, streamed = result
+    _record_usage(model, messages, content, usage, started, shared)
+    if streamed:
+        return streamed
 
     try:
         parsed_content = json.loads(content)
@@ -381,125 +646,186 @@ def create_file_tree(
         console.print(f"[bold yellow]Raw Content:[/bold yellow]\n{content}")
         return []
 
-    logger.info(f"Created file tree for {len(file_tree)} files")
-    console.print(f"[bold green]Created file tree for {len(file_tree)} files[/bold green]")
+    if on_entry is not None:
+        for entry in file_tree:
+            on_entry(entry)
     return file_tree
 
+def _name_cluster(
+    summaries: List[Dict[str, Any]],
+    model: str,
+    api_base: str,
+    existing_folders: Optional[List[str]] = None,
+    fallback_models: Optional[List[str]] = None
+) -> str:
     """
-    Create a file tree based on the provided summaries.
-    Returns src_path, dst_path, and dst_path_new for each file.
-    """
-    # Define the helper function within the task
-    def find_key(obj: Any, key: str) -> Any:
-        if isinstance(obj, dict):
-            if key in obj:
-                return obj[key]
-            for value in obj.values():
-                result = find_key(value, key)
-                if result is not None:
-                    return result
-        elif isinstance(obj, list):
-            for item in obj:
-                result = find_key(item, key)
-                if result is not None:
-                    return result
-        return None
+    Ask the model for one folder name for a cluster of related files.
 
+    Only a sample of the cluster's summaries is sent. Falls back to the
+    cluster's most common terms if the call fails or returns no usable name.
+    """
+    sample = [
+        {
+            "file_name": os.path.basename(item.get("file_path", "")),
+            "summary": truncate_tokens(str(item.get("summary", "")), CLUSTER_NAME_SUMMARY_TOKENS)
+        }
+        for item in summaries[:CLUSTER_NAME_SAMPLE]
+    ]
     PROMPT = f"""
-    You will be provided with a list of source files and a summary of their contents. The source files are located in '{source_path}', and the destination directory is '{destination_path}'.
-    
-    For each file, propose:
-    1. 'dst_path': A new file path under the destination directory with the same file name.
-    2. 'dst_path_new': A new file path under the destination directory with an updated file name (e.g., adding a version number or timestamp).
-    
-    Follow good naming conventions and organizational best practices. Here are guidelines:
-    - Group related files together.
-    - Incorporate metadata such as date, version, or experiment details into folder names.
+    The following files were grouped together because their contents are related. Propose one folder name for the whole group.
+
+    Guidelines:
+    - Describe what the files have in common.
+    - Incorporate metadata such as date, version, or experiment details if all files share it.
     - Use clear and descriptive names without spaces or special characters.
-    - Do not change the file extension.
-    - If the file is already well-named or follows a known convention, retain its name for 'dst_path'.
-    
-    **Example**:
-    ```json
-    {{
-        "files": [
-            {{
-                "src_path": "/home/user/source/file1.txt",
-                "dst_path": "/home/user/destination/2024/04/file1.txt",
-                "dst_path_new": "/home/user/destination/2024/04/file1_v2.txt"
-            }}
-        ]
-    }}
-    ```
-    
-    **Important:** Your response **must** be a JSON object with the following schema **at the top level**:
+    - You may use one level of subfolder, e.g. "finance/invoices_2024".
+    {_existing_folders_note(existing_folders)}
+
+    Return a JSON object with the following schema:
     ```json
-    {{
-        "files": [
-            {{
-                "src_path": "original file path",
-                "dst_path": "new file path under destination directory with same file name",
-                "dst_path_new": "new file path under destination directory with updated file name"
-            }}
-        ]
-    }}
+    {{"folder": "folder name"}}
     ```
-    
-    Do **not** wrap the "files" key inside any other keys.
-    """.strip()
 
-    if not api_base:
-        api_base = f"http://{host}:{port}"
-        logger.info(f"API Base set to: {api_base}")
-        console.print(f"[bold blue]API Base set to: {api_base}[/bold blue]")
+    Files: {json.dumps(sample, ensure_ascii=False)}
+    """.strip()
 
+    messages = [
+        {"role": "system", "content": "Always return JSON. Do not include any other text or formatting characters."},
+        {"role": "user", "content": PROMPT},
+    ]
+    started = time.perf_counter()
     try:
-        response = completion(
-            model=model,
-            messages=[
-                {"role": "system", "content": PROMPT},
-                {"role": "user", "content": json.dumps(summaries)},
-            ],
+        response, used_model, shared = get_llm_scheduler().complete(
+            _pooled_completion,
+            model,
+            messages,
             api_base=api_base,
-            stream=stream
+            fallbacks=fallback_models or [],
+            response_format={"type": "json_object"}
         )
+        response_dict = response.to_dict() if hasattr(response, "to_dict") else json.loads(str(response))
+        content = response_dict.get("choices", [{}])[0].get("message", {}).get("content", "")
+        _record_usage(used_model, messages, content, response_dict.get("usage") or {}, started, shared)
+        name = folder_name(find_key(json.loads(content), "folder") or "")
+        if name:
+            return name
+        logger.warning("No folder name in the response, naming the cluster by its terms.")
     except Exception as e:
-        logger.error(f"LiteLLM Error >>> {e}")
-        console.print(f"[bold red]LiteLLM Error:[/bold red] {e}")
-        return []
+        logger.error(f"Error naming cluster: {e}")
+        console.print(f"[bold red]Error naming cluster:[/bold red] {e}")
+    return cluster_label(summaries)
 
-    if response is None:
-        logger.warning("No response received from the API.")
-        console.print("[bold yellow]No response received from the API.[/bold yellow]")
-        return []
+@task
+def create_file_tree(
+    summaries: List[Dict[str, Any]],
+    host: str,
+    port: int,
+    source_path: str,
+    destination_path: str,
+    model: str = "llama-3.1-70b-versatile",
+    api_base: str = None,
+    stream: bool = False,
+    planner: str = "auto",
+    cluster_size: int = DEFAULT_CLUSTER_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    embedder: str = "hashing",
+    existing_folders: Optional[List[str]] = None,
+    on_entry: Optional[Callable[[Dict[str, str]], None]] = None,
+    fallback_models: Optional[List[str]] = None
+) -> List[Dict[str, str]]:
+    """
+    Create a file tree based on the provided summaries.
 
-    try:
-        if hasattr(response, "to_dict"):
-            response_dict = response.to_dict()
-        elif isinstance(response, dict):
-            response_dict = response
-        else:
-            response_dict = json.loads(str(response))
-    except (TypeError, json.JSONDecodeError) as e:
-        logger.error(f"Error parsing response: {e}")
-        console.print(f"[bold red]Error parsing response:[/bold red] {e}")
-        return []
+    The "single" planner asks for the whole tree in one call. The "map_reduce"
+    planner clusters summaries locally, plans each cluster in parallel and
+    reconciles the cluster plans into one tree, so the work per call stays
+    bounded. "auto" uses a single call when everything fits in one cluster.
+    The "embedding" planner groups files by k-means over embeddings from
+    `embedder` and only asks the model to name each group; files keep their
+    names.
 
-    content = response_dict.get("choices", [{}])[0].get("message", {}).get("content", "")
+    Args:
+        summaries (List[Dict[str, Any]]): file_path and summary of each file.
+        host (str): API host address.
+        port (int): API port number.
+        source_path (str): Path to the source documents directory.
+        destination_path (str): Path to the destination directory for organized files.
+        model (str, optional): Model name for creating the file tree.
+        api_base (str, optional): Base URL for the API. Defaults to None.
+        stream (bool, optional): Whether to use streaming. Defaults to False.
+        planner (str, optional): "auto", "single", "map_reduce" or "embedding". Defaults to "auto".
+        cluster_size (int, optional): Files per planning call in map-reduce mode.
+        max_concurrency (int, optional): Planning calls in flight at once.
+        embedder (str, optional): "hashing" or "ollama/<model>" for the embedding planner.
+        existing_folders (List[str], optional): Destination folders offered as placement targets.
+        on_entry (Callable, optional): Called with each file's entry once it is final. With the
+            single-call planner and streaming, that is as soon as the entry has been received,
+            before reconciliation may number its name or merge its folder's spelling.
+        fallback_models (List[str], optional): Models tried in order when `model` keeps failing.
 
-    try:
-        parsed_content = json.loads(content)
-        file_tree = find_key(parsed_content, "files")
-        if file_tree is None:
-            raise KeyError("'files' key not found in the response.")
-    except (json.JSONDecodeError, KeyError) as e:
-        logger.error(f"Error decoding JSON content: {e}")
-        console.print(f"[bold red]Error decoding JSON content:[/bold red] {e}")
-        console.print(f"[bold yellow]Raw Content:[/bold yellow]\n{content}")
+    Returns:
+        List[Dict[str, str]]: src_path, dst_path and dst_path_new for each file.
+    """
+    if not summaries:
         return []
 
-    logger.info(f"Created file tree for {len(file_tree)} files")
-    console.print(f"[bold green]Created file tree for {len(file_tree)} files[/bold green]")
+    if not api_base:
+        api_base = f"http://{host}:{port}"
+        logger.info(f"API Base set to: {api_base}")
+        console.print(f"[bold blue]API Base set to: {api_base}[/bold blue]")
+
+    with usage_scope(stage="planning") as usage:
+        single = planner == "single" or (planner == "auto" and len(summaries) <= cluster_size)
+        if single:
+            preview = None
+            if on_entry is not None:
+                expected = {s.get("file_path") for s in summaries}
+
+                def preview(entry: Dict[str, str]):
+                    # Streamed entries are passed on only if they are safe to act on
+                    if entry.get("src_path") in expected and resolve_destination(entry.get("dst_path") or "", destination_path):
+                        on_entry(entry)
+
+            plan = _plan_file_tree(summaries, source_path, destination_path, model, api_base, stream, existing_folders, preview, fallback_models)
+            # The model's plan is untrusted: keep only known sources and destinations under destination_path.
+            # A failed call stays an empty tree rather than everything placed in the destination root.
+            file_tree = reconcile_plans([summaries], [plan], destination_path) if plan else []
+        elif planner == "embedding":
+            texts = [f"{os.path.basename(s.get('file_path', ''))} {s.get('summary', '')}" for s in summaries]
+            try:
+                groups = cluster_texts(texts, get_embedder(embedder, api_base), cluster_size)
+            except Exception as e:
+                logger.error(f"Error embedding summaries with {embedder}, using the hashing vectorizer: {e}")
+                console.print(f"[bold red]Error embedding summaries with {embedder}:[/bold red] {e}")
+                groups = cluster_texts(texts, HashingEmbedder(), cluster_size)
+            clusters = [[summaries[i] for i in group] for group in groups]
+            logger.info(f"Naming {len(clusters)} clusters of {len(summaries)} files")
+            console.print(f"[bold blue]Naming {len(clusters)} clusters of {len(summaries)} files[/bold blue]")
+            names = run_batches(lambda cluster: _name_cluster(cluster, model, api_base, existing_folders, fallback_models), clusters, max_concurrency)
+            plans = [
+                [{"src_path": s.get("file_path"), "dst_path": os.path.join(destination_path, name, os.path.basename(s.get("file_path", "")))} for s in cluster]
+                for cluster, name in zip(clusters, names)
+            ]
+            file_tree = reconcile_plans(clusters, plans, destination_path)
+        else:
+            clusters = cluster_summaries(summaries, cluster_size)
+            logger.info(f"Planning {len(summaries)} files in {len(clusters)} clusters, {max_concurrency} at a time")
+            console.print(f"[bold blue]Planning {len(summaries)} files in {len(clusters)} clusters[/bold blue]")
+            plans = run_batches(
+                lambda cluster: _plan_file_tree(cluster, source_path, destination_path, model, api_base, stream, existing_folders, fallback_models=fallback_models),
+                clusters,
+                max_concurrency
+            )
+            file_tree = reconcile_plans(clusters, plans, destination_path)
+
+    if on_entry is not None and not single:
+        # Planners that reconcile their results only know final entries at the end
+        for entry in file_tree:
+            on_entry(entry)
+
+    cost = usage.totals()["cost"]
+    logger.info(f"Created file tree for {len(file_tree)} files with cost {cost}")
+    console.print(f"[bold green]Created file tree for {len(file_tree)} files with cost {cost}[/bold green]")
     return file_tree
 
 @task
@@ -529,23 +855,95 @@ def concatenate_summaries_and_file_tree(
     console.print(f"[bold green]Concatenated summary and file tree for {len(concatenated)} files[/bold green]")
     return concatenated
 
+@task
+def materialize_file_tree(
+    file_tree: List[Dict[str, str]],
+    destination_path: str,
+    mode: str = "copy",
+    dry_run: bool = False,
+    source_path: Optional[str] = None,
+    sources: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Put the files of the file tree in place by moving, hard linking or copying them.
+    Entries whose source is not one of `sources` under `source_path`, or whose
+    destination is outside `destination_path`, are reported as failed.
+
+    Args:
+        file_tree (List[Dict[str, str]]): src_path, dst_path and dst_path_new of each file.
+        destination_path (str): Destination directory; its .nst_journal folder keeps the rollback journal.
+        mode (str, optional): "move", "hardlink" or "copy". Defaults to "copy".
+        dry_run (bool, optional): Only report the planned operations. Defaults to False.
+        source_path (str, optional): Folder every placed file must come from.
+        sources (List[str], optional): The summarized files, the only ones that may be placed.
+
+    Returns:
+        Dict[str, Any]: Counts of folders and files handled, failures and the journal path.
+    """
+    try:
+        result = materialize(file_tree, destination_path, mode, dry_run, sources=sources, source_path=source_path)
+    except Exception as e:
+        logger.error(f"Error materializing file tree: {e}")
+        console.print(f"[bold red]Error materializing file tree:[/bold red] {e}")
+        return {"mode": mode, "dry_run": dry_run, "error": str(e)}
+    action = "Would apply" if dry_run else "Applied"
+    logger.info(f"{action} {result['files']} {mode} operations in {result['directories']} new folders, {len(result['failed'])} failed")
+    console.print(f"[bold green]{action} {result['files']} {mode} operations in {result['directories']} new folders, {len(result['failed'])} failed[/bold green]")
+    return result
+
+def _load_checkpoint(stage: str, key: str) -> Optional[Any]:
+    """
+    Return the checkpointed output of a workflow stage, or None if there is none or it cannot be read.
+    """
+    try:
+        value = get_checkpoint_store().get(stage, key)
+    except Exception as e:
+        logger.error(f"Error reading {stage} checkpoint: {e}")
+        console.print(f"[bold red]Error reading {stage} checkpoint:[/bold red] {e}")
+        return None
+    if value is not None:
+        logger.info(f"Resuming from the {stage} checkpoint")
+        console.print(f"[bold blue]Resuming from the {stage} checkpoint[/bold blue]")
+    return value
+
+def _save_checkpoint(stage: str, key: str, value: Any):
+    try:
+        get_checkpoint_store().put(stage, key, value)
+    except Exception as e:
+        logger.error(f"Error writing {stage} checkpoint: {e}")
+        console.print(f"[bold red]Error writing {stage} checkpoint:[/bold red] {e}")
+
+def _directory_creator() -> Callable[[Dict[str, str]], None]:
+    """
+    Return a thread-safe callback that creates the destination folders of a
+    file tree entry, so folders can be made while the tree is still streaming.
+    """
+    created = set()
+    lock = threading.Lock()
+
+    def create(entry: Dict[str, str]):
+        for key in ("dst_path", "dst_path_new"):
+            folder = os.path.dirname(entry.get(key) or "")
+            with lock:
+                if not folder or folder in created:
+                    continue
+                created.add(folder)
+            try:
+                os.makedirs(folder, exist_ok=True)
+            except OSError as e:
+                logger.error(f"Error creating {folder}: {e}")
+    return create
+
 @task
 def create_subdirectories(file_tree: List[Dict[str, str]]):
     """
-    Create all necessary subdirectories in the destination paths.
+    Create all necessary subdirectories in the destination paths, each
+    folder once, with one makedirs call per deepest folder.
     """
     try:
-        for file in file_tree:
-            dst_path = file.get("dst_path")
-            dst_path_new = file.get("dst_path_new")
-            
-            # Extract directories from the destination paths
-            dst_dir = os.path.dirname(dst_path)
-            dst_new_dir = os.path.dirname(dst_path_new)
-            
-            # Create the directories if they don't exist
-            os.makedirs(dst_dir, exist_ok=True)
-            os.makedirs(dst_new_dir, exist_ok=True)
+        paths = [file.get(key) for file in file_tree for key in ("dst_path", "dst_path_new")]
+        for folder in unique_directories(paths):
+            os.makedirs(folder, exist_ok=True)
         
         logger.info("All necessary subdirectories created.")
         console.print("[bold green]All necessary subdirectories created.[/bold green]")
@@ -596,6 +994,80 @@ def display_concatenated_dict(concatenated_dict: List[Dict[str, Any]]):
     
     console.print(table)
 
+def _summarize_pipelined(
+    source_path: str,
+    files: Optional[List[str]],
+    host: str,
+    port: int,
+    model: str,
+    api_base: str = None,
+    stream: bool = False,
+    chunk_size: int = DEFAULT_BATCH_FILES,
+    max_in_flight: int = DEFAULT_MAX_CONCURRENCY,
+    deduplicate: bool = False
+) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+    """
+    Load documents and summarize them chunk by chunk while loading continues.
+
+    Each chunk of `chunk_size` unique documents is submitted as its own
+    query_summaries task run as soon as it is loaded, with at most
+    `max_in_flight` runs outstanding. With `deduplicate`, documents that
+    nearly match one loaded earlier are not summarized. Must be called
+    inside a flow.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, List[str]]]: Merged "files" summaries,
+        summed token "usage" and "cost", as query_summaries, and the
+        near-duplicates of each summarized document.
+    """
+    futures = []
+    in_flight = deque()
+    seen = set()
+    chunk = []
+    index = NearDuplicateIndex() if deduplicate else None
+    near_duplicates: Dict[str, List[str]] = {}
+
+    def submit(docs: List[Dict[str, Any]]):
+        while len(in_flight) >= max_in_flight:
+            in_flight.popleft().wait()
+        future = query_summaries.submit(
+            doc_dicts=docs,
+            host=host,
+            port=port,
+            model=model,
+            api_base=api_base,
+            stream=stream,
+            max_concurrency=1
+        )
+        futures.append(future)
+        in_flight.append(future)
+
+    for doc in iter_documents(source_path, files=files):
+        report_progress("loading", documents=len(seen))
+        # Same de-duplication as process_metadata
+        if doc["file_path"] in seen:
+            continue
+        seen.add(doc["file_path"])
+        doc = prepare_document(doc, DEFAULT_EXCERPT_TOKENS, fingerprint=index is not None)
+        representative = index.add(doc["file_path"], fingerprint=doc["simhash"]) if index is not None else None
+        if representative is not None:
+            near_duplicates.setdefault(representative, []).append(doc["file_path"])
+            continue
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            submit(chunk)
+            chunk = []
+    if chunk:
+        submit(chunk)
+
+    results = [future.result() for future in futures]
+    summaries = merge_file_results(results)
+    summaries["cost"] = sum(result.get("cost", 0.0) for result in results)
+    summaries["missing"] = sum(result.get("missing", 0) for result in results)
+    logger.info(f"Summarized {len(seen)} documents in {len(futures)} pipelined chunks")
+    console.print(f"[bold green]Summarized {len(seen)} documents in {len(futures)} pipelined chunks[/bold green]")
+    return summaries, near_duplicates
+
 @flow(name="Document Processing Workflow")
 def document_processing_workflow(
     source_path: str,
@@ -604,12 +1076,41 @@ def document_processing_workflow(
     api_port: int,
     summary_model: str,
     tree_model: str,
-    api_base: str = None,
-    stream: bool = False
+    api_base: Optional[str] = None,
+    stream: bool = False,
+    incremental: bool = False,
+    concurrent: bool = False,
+    deduplicate: bool = True,
+    materialize_mode: Optional[str] = None,
+    dry_run: bool = False,
+    resume: bool = True,
+    planner: str = "auto",
+    embedder: str = "hashing"
 ) -> Dict[str, Any]:
     """
     Orchestrates the document processing workflow: loading documents, querying summaries, creating a file tree, and concatenating results.
 
+    In incremental mode, a manifest in the destination folder records what
+    earlier runs organized. Only new or changed source files are summarized
+    and placed, with the folders already in use offered as targets, and the
+    returned concatenated data covers every file in the manifest.
+
+    In concurrent mode, tasks without a data dependency run side by side on
+    the flow's task runner: model listing overlaps document loading,
+    documents are summarized in chunks while later ones are still loading,
+    and folder creation, concatenation and display run together.
+
+    With deduplication, byte-identical copies are found by size and content
+    hashes before parsing, and documents whose text nearly matches another's
+    are found by SimHash after loading. Only one document of each group is
+    summarized; the others receive its summary.
+
+    With resume, the summaries and the file tree are checkpointed once each
+    stage completes, keyed by a fingerprint of the stage's inputs, so a
+    re-run over unchanged files skips the stages that already finished.
+    Summaries of an unfinished stage are picked up batch by batch from the
+    summary cache.
+
     Args:
         source_path (str): Path to the source documents directory.
         destination_path (str): Path to the destination directory for organized files.
@@ -619,55 +1120,170 @@ def document_processing_workflow(
         tree_model (str): Model name for creating file tree.
         api_base (str, optional): Base URL for the API. Defaults to None.
         stream (bool, optional): Whether to use streaming. Defaults to False.
+        incremental (bool, optional): Whether to only organize files added or changed since the last run. Defaults to False.
+        concurrent (bool, optional): Whether to run independent tasks concurrently and pipeline loading into summarization. Defaults to False.
+        deduplicate (bool, optional): Whether to summarize duplicate and near-duplicate documents once. Defaults to True.
+        materialize_mode (str, optional): "move", "hardlink" or "copy" to put the files in place; None only creates the folders. Defaults to None.
+        dry_run (bool, optional): With `materialize_mode`, only report the planned operations. Defaults to False.
+        resume (bool, optional): Whether to reuse and store stage checkpoints. Defaults to True.
+        planner (str, optional): create_file_tree planner: "auto", "single", "map_reduce" or "embedding". Defaults to "auto".
+        embedder (str, optional): "hashing" or "ollama/<model>" for the embedding planner. Defaults to "hashing".
 
     Returns:
-        Dict[str, Any]: Dictionary containing summaries, file_tree, and concatenated data.
+        Dict[str, Any]: Dictionary containing summaries, file_tree, concatenated data and, with `materialize_mode`, the materialization report.
     """
     # Initial setup
-    set_success_callback()
-    list_ollama_models()
-
-    # Load and process documents
-    loaded_docs = load_documents(source_path)
-    unique_docs = process_metadata(loaded_docs)
-
-    # Generate summaries
-    summaries = query_summaries(
-        doc_dicts=unique_docs,
-        host=api_host,
-        port=api_port,
-        model=summary_model,
-        api_base=api_base,
-        stream=stream
+    model_base = api_base or f"http://{api_host}:{api_port}"
+    if concurrent:
+        models_future = list_ollama_models.submit()
+        # Local models load while documents are read
+        preload_models.submit([summary_model, tree_model], model_base)
+    else:
+        list_ollama_models()
+        preload_models([summary_model, tree_model], model_base)
+
+    # In incremental mode, find the files that changed since the last run
+    manifest = None
+    files = None
+    existing_folders = None
+    if incremental:
+        manifest = OrganizationManifest.load(destination_path)
+        stats = stat_files(list_document_files(source_path))
+        files, removed = manifest.diff(source_path, stats)
+        manifest.remove(removed)
+        existing_folders = manifest.folders()
+        logger.info(f"Incremental run: {len(files)} new or changed files, {len(removed)} removed")
+        console.print(f"[bold blue]Incremental run: {len(files)} new or changed files, {len(removed)} removed[/bold blue]")
+
+    paths = files if files is not None else list_document_files(source_path)
+
+    # A previous run over the same files may already have summarized them
+    summaries_key = fingerprint(
+        "summaries", sorted(stat_files(paths).items()), summary_model, SUMMARY_PROMPT_VERSION, DEFAULT_EXCERPT_TOKENS, deduplicate
     )
+    summaries = _load_checkpoint("summaries", summaries_key) if resume else None
+
+    if summaries is None:
+        # Copies of the same file are only loaded once
+        duplicates = {}
+        if deduplicate:
+            duplicates = find_exact_duplicates(paths)
+            copies = {path for members in duplicates.values() for path in members}
+            paths = [path for path in paths if path not in copies]
+
+        report_progress("loading", documents=0)
+        if concurrent:
+            # Summarize chunks of documents while the rest are still loading
+            summaries, near_duplicates = _summarize_pipelined(
+                source_path, paths, api_host, api_port, summary_model, api_base, stream, deduplicate=deduplicate
+            )
+        else:
+            # Load and process documents, keeping only excerpts of their content
+            loaded_docs = load_documents(source_path, excerpt_tokens=DEFAULT_EXCERPT_TOKENS, files=paths, fingerprint=deduplicate)
+            unique_docs = process_metadata(loaded_docs)
+            near_duplicates = {}
+            if deduplicate:
+                unique_docs, near_duplicates = remove_near_duplicates(unique_docs)
+
+            # Generate summaries
+            summaries = query_summaries(
+                doc_dicts=unique_docs,
+                host=api_host,
+                port=api_port,
+                model=summary_model,
+                api_base=api_base,
+                stream=stream
+            )
+
+        # Duplicates share their representative's summary
+        duplicates = merge_groups(duplicates, near_duplicates)
+        if duplicates:
+            summaries["files"] = fan_out_summaries(summaries.get("files", []), duplicates)
+            summaries["duplicates"] = duplicates
+
+        # Only a complete stage is checkpointed; a partial one is resumed batch by batch from the summary cache
+        if resume and not summaries.get("missing"):
+            _save_checkpoint("summaries", summaries_key, summaries)
 
     # Create file tree
-    file_tree = create_file_tree(
-        summaries=summaries.get("files", []),
-        host=api_host,
-        port=api_port,
-        source_path=source_path,
-        destination_path=destination_path,
-        model=tree_model,
-        api_base=api_base,
-        stream=stream
+    report_progress("planning", files=len(summaries.get("files", [])))
+    file_tree_key = fingerprint(
+        "file_tree",
+        [(item.get("file_path"), item.get("summary")) for item in summaries.get("files", [])],
+        tree_model, summary_model, source_path, destination_path, existing_folders, planner, embedder
     )
+    file_tree = _load_checkpoint("file_tree", file_tree_key) if resume else None
+    if file_tree is None:
+        # Renew the tree model's residency, which a long summarization may have outlasted
+        preload_models([tree_model], model_base)
+        file_tree = create_file_tree(
+            summaries=summaries.get("files", []),
+            host=api_host,
+            port=api_port,
+            source_path=source_path,
+            destination_path=destination_path,
+            model=tree_model,
+            api_base=api_base,
+            stream=stream,
+            planner=planner,
+            embedder=embedder,
+            existing_folders=existing_folders,
+            # While streaming, folders are created as soon as each entry arrives
+            on_entry=_directory_creator() if stream else None,
+            fallback_models=[summary_model]
+        )
+        planned = {entry.get("src_path") for entry in file_tree}
+        if resume and file_tree and all(item.get("file_path") in planned for item in summaries.get("files", [])):
+            _save_checkpoint("file_tree", file_tree_key, file_tree)
+
+    report_progress("organizing", files=len(file_tree))
+    sources = [item.get("file_path") for item in summaries.get("files", []) if item.get("file_path")]
+    if concurrent:
+        # Folder creation, concatenation and display only depend on the file tree
+        if materialize_mode:
+            subdirectories_future = materialize_file_tree.submit(file_tree, destination_path, materialize_mode, dry_run, source_path, sources)
+        else:
+            subdirectories_future = create_subdirectories.submit(file_tree)
+        concatenated_future = concatenate_summaries_and_file_tree.submit(summaries.get("files", []), file_tree)
+        display_futures = [
+            display_organized_files.submit(file_tree),
+            display_concatenated_dict.submit(concatenated_future)
+        ]
+        concatenated_dict = concatenated_future.result()
+        wait([subdirectories_future, models_future, *display_futures])
+        materialization = subdirectories_future.result() if materialize_mode else None
+    else:
+        # Put the files in place, or only create the necessary subdirectories
+        materialization = None
+        if materialize_mode:
+            materialization = materialize_file_tree(file_tree, destination_path, materialize_mode, dry_run, source_path, sources)
+        else:
+            create_subdirectories(file_tree)
 
-    # Create necessary subdirectories
-    create_subdirectories(file_tree)
+        # Concatenate summaries and file_tree
+        concatenated_dict = concatenate_summaries_and_file_tree(summaries.get("files", []), file_tree)
 
-    # Concatenate summaries and file_tree
-    concatenated_dict = concatenate_summaries_and_file_tree(summaries.get("files", []), file_tree)
+        # Display organized files using Rich
+        display_organized_files(file_tree)
 
-    # Display organized files using Rich
-    display_organized_files(file_tree)
+        # Display concatenated summaries and file_tree
+        display_concatenated_dict(concatenated_dict)
 
-    # Display concatenated summaries and file_tree
-    display_concatenated_dict(concatenated_dict)
+    if manifest is not None:
+        manifest.update(concatenated_dict, stats)
+        try:
+            manifest.save()
+        except OSError as e:
+            logger.error(f"Error saving manifest {manifest.path}: {e}")
+            console.print(f"[bold red]Error saving manifest {manifest.path}:[/bold red] {e}")
+        concatenated_dict = manifest.concatenated_data()
 
     # Return all results
-    return {
+    results = {
         "summaries": summaries,
         "file_tree": file_tree,
         "concatenated_data": concatenated_dict
-    }
\ No newline at end of file
+    }
+    if materialization is not None:
+        results["materialization"] = materialization
+    return results
\ No newline at end of file
@@ -0,0 +1,205 @@
+import os
+import re
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bytes hashed first; files that still collide are hashed in full
+PARTIAL_HASH_BYTES = 64 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+# SimHash fingerprints within this many differing bits are near-duplicates
+NEAR_DUPLICATE_DISTANCE = 6
+SIMHASH_BITS = 64
+# Words per shingle, and the fewest words a text needs to be compared at all
+SHINGLE_WORDS = 3
+MIN_SIMHASH_WORDS = 50
+# Longer texts are fingerprinted from a sample of about this many shingles, chosen by hash so
+# an insertion does not shift which shingles are picked
+MAX_SIMHASH_SHINGLES = 8192
+
+_WORD = re.compile(r"\w+")
+
+
+def _hash_file(path: str, limit: Optional[int] = None) -> Optional[str]:
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = limit
+    try:
+        with open(path, "rb") as f:
+            while remaining is None or remaining > 0:
+                chunk = f.read(HASH_CHUNK_BYTES if remaining is None else min(HASH_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+    except OSError as e:
+        logger.warning(f"Cannot hash {path}: {e}")
+        return None
+    return digest.hexdigest()
+
+
+def _split_groups(groups: Iterable[List[str]], key) -> List[List[str]]:
+    result = []
+    for group in groups:
+        buckets: Dict[Any, List[str]] = {}
+        for path in group:
+            value = key(path)
+            if value is not None:
+                buckets.setdefault(value, []).append(path)
+        result.extend(bucket for bucket in buckets.values() if len(bucket) > 1)
+    return result
+
+
+def find_duplicate_files(paths: Sequence[str], partial_bytes: int = PARTIAL_HASH_BYTES) -> Dict[str, List[str]]:
+    """
+    Find byte-identical files without reading most of them.
+
+    Files are bucketed by size; only files sharing a size have their first
+    `partial_bytes` hashed, and only files that still collide are hashed in
+    full.
+
+    Returns:
+        Dict[str, List[str]]: The other copies of each duplicated file, keyed
+        by the copy that comes first in path order.
+    """
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError as e:
+            logger.warning(f"Cannot stat {path}: {e}")
+    groups = _split_groups([sorted(sizes)], sizes.get)
+    groups = _split_groups(groups, lambda path: _hash_file(path, partial_bytes))
+    # Files no larger than the partial hash are already fully compared
+    groups = [group for group in groups if sizes[group[0]] <= partial_bytes] + _split_groups(
+        [group for group in groups if sizes[group[0]] > partial_bytes], _hash_file
+    )
+    return {group[0]: group[1:] for group in groups}
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> Optional[int]:
+    """
+    SimHash fingerprint of a text's word shingles; None if the text is too short to compare.
+
+    The whole text contributes. Past MAX_SIMHASH_SHINGLES shingles, only
+    those whose hash falls in a fixed sample are counted.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_SIMHASH_WORDS:
+        return None
+    shingles = len(words) - SHINGLE_WORDS + 1
+    # Keep one shingle in `step`, a power of two, by the low bits of its hash
+    step = 1
+    while shingles > MAX_SIMHASH_SHINGLES * step:
+        step *= 2
+    hashes = []
+    for i in range(shingles):
+        h = int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode(), digest_size=bits // 8).digest(), "big")
+        if h % step == 0:
+            hashes.append(h)
+    if not hashes:
+        return None
+    # One row of bits per shingle; a bit is set where most shingles have it set
+    data = np.frombuffer(b"".join(h.to_bytes(bits // 8, "little") for h in hashes), dtype=np.uint8).reshape(len(hashes), -1)
+    ones = np.unpackbits(data, axis=1, bitorder="little").sum(axis=0, dtype=np.int64)
+    return sum(1 << int(bit) for bit in np.flatnonzero(2 * ones > len(hashes)))
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate detection over SimHash fingerprints.
+
+    Fingerprints are split into `max_distance + 1` bands. Two fingerprints
+    that differ in at most `max_distance` bits agree on at least one band, so
+    only texts sharing a band are compared.
+    """
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_DISTANCE, bits: int = SIMHASH_BITS):
+        self.max_distance = max_distance
+        self.bits = bits
+        self.bands = max_distance + 1
+        self.band_bits = -(-bits // self.bands)
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in range(self.bands)]
+        self._fingerprints: Dict[str, int] = {}
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [fingerprint >> (band * self.band_bits) & mask for band in range(self.bands)]
+
+    def add(self, key: str, text: Optional[str] = None, fingerprint: Optional[int] = None) -> Optional[str]:
+        """
+        Compare a text, or its precomputed simhash `fingerprint`, with the ones added before.
+
+        Returns:
+            Optional[str]: The key of an earlier near-duplicate, in which case
+            this text is not indexed, or None if the text is new.
+        """
+        if fingerprint is None and text is not None:
+            fingerprint = simhash(text, self.bits)
+        if fingerprint is None:
+            return None
+        bands = self._band_values(fingerprint)
+        for table, value in zip(self._tables, bands):
+            for other in table.get(value, []):
+                if bin(fingerprint ^ self._fingerprints[other]).count("1") <= self.max_distance:
+                    return other
+        self._fingerprints[key] = fingerprint
+        for table, value in zip(self._tables, bands):
+            table.setdefault(value, []).append(key)
+        return None
+
+
+def find_near_duplicates(
+    doc_dicts: Sequence[Dict[str, Any]],
+    max_distance: int = NEAR_DUPLICATE_DISTANCE
+) -> Dict[str, List[str]]:
+    """
+    Group documents whose text is nearly identical: by the "simhash" of their
+    full text that prepare_document computed, else their "content" or "excerpt".
+
+    Returns:
+        Dict[str, List[str]]: The file paths of the near-duplicates of each
+        document that has any, keyed by the first one's file path.
+    """
+    index = NearDuplicateIndex(max_distance)
+    groups: Dict[str, List[str]] = {}
+    for doc in doc_dicts:
+        representative = index.add(doc["file_path"], doc.get("content") or doc.get("excerpt") or "", doc.get("simhash"))
+        if representative is not None:
+            groups.setdefault(representative, []).append(doc["file_path"])
+    return groups
+
+
+def merge_groups(*group_maps: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """
+    Combine duplicate groups, following chains so every member points at its final representative.
+    """
+    parent: Dict[str, str] = {}
+    for groups in group_maps:
+        for representative, members in groups.items():
+            for member in members:
+                parent[member] = representative
+
+    def root(path: str) -> str:
+        while path in parent:
+            path = parent[path]
+        return path
+
+    merged: Dict[str, List[str]] = {}
+    for member in parent:
+        merged.setdefault(root(member), []).append(member)
+    return merged
+
+
+def fan_out_summaries(files: Sequence[Dict[str, Any]], groups: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """
+    Give every duplicate the summary of its representative, marked with "duplicate_of".
+    """
+    result = list(files)
+    for item in files:
+        for member in groups.get(item.get("file_path"), []):
+            result.append({**item, "file_path": member, "duplicate_of": item["file_path"]})
+    return result
@@ -0,0 +1,143 @@
+import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from llama_index.core import SimpleDirectoryReader
+
+from parsed_text_cache import file_key, get_parsed_text_cache
+
+logger = logging.getLogger(__name__)
+
+# Formats whose parsers are CPU bound; these are parsed in worker processes
+PROCESS_EXTENSIONS = frozenset({".pdf", ".docx", ".pptx", ".ppt", ".pptm", ".epub", ".hwp", ".ipynb"})
+# Worker processes used for those formats; each one imports llama_index again, so they are capped
+DEFAULT_PARSE_WORKERS = min(os.cpu_count() or 1, int(os.environ.get("NST_PARSE_WORKERS", 4)))
+# Formats whose parsed text is cached; cheaper formats are faster to parse again than to cache
+CACHED_EXTENSIONS = PROCESS_EXTENSIONS
+
+
+def list_document_files(path: str, recursive: bool = False) -> List[str]:
+    """
+    List the files SimpleDirectoryReader would load from `path`, without parsing them.
+    """
+    try:
+        reader = SimpleDirectoryReader(input_dir=path, recursive=recursive)
+    except ValueError as e:
+        # Raised when the directory has no loadable files
+        logger.info(f"No documents in {path}: {e}")
+        return []
+    return [str(p) for p in reader.input_files]
+
+
+def _cached(file_path: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    The cached parse of a file, or None if it is not a cached format or not cached yet.
+    """
+    if os.path.splitext(file_path)[1].lower() not in CACHED_EXTENSIONS:
+        return None
+    key = file_key(file_path)
+    if key is None:
+        return None
+    try:
+        return get_parsed_text_cache().get(key)
+    except Exception as e:
+        logger.error(f"Error reading parsed text cache for {file_path}: {e}")
+        return None
+
+
+def join_pages(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge the per-page documents a reader returns for one file into a single
+    document, so hashing, excerpting and fingerprinting see the whole file.
+    """
+    if len(documents) <= 1:
+        return documents
+    metadata = {key: value for key, value in documents[0].items() if key not in ("content", "page_label")}
+    content = "\n\n".join(doc.get("content") or "" for doc in documents)
+    return [{"content": content, **metadata, "pages": len(documents)}]
+
+
+def load_file(file_path: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+    """
+    Parse one file into a document dict holding the text under "content" and the reader's metadata.
+
+    Formats that split into pages or slides are joined into one document
+    with the number of "pages".
+    With `use_cache`, the parse of CPU-heavy formats is reused from the
+    parsed text cache until the file changes.
+    """
+    if use_cache:
+        cached = _cached(file_path)
+        if cached is not None:
+            return cached
+    key = file_key(file_path)
+    try:
+        documents = SimpleDirectoryReader(input_files=[file_path]).load_data()
+    except Exception as e:
+        logger.error(f"Error loading {file_path}: {e}")
+        return []
+    documents = join_pages([{"content": d.text, **d.metadata} for d in documents])
+    # The key is taken before parsing, so a file changed meanwhile is never cached under its new identity
+    if use_cache and key is not None and os.path.splitext(file_path)[1].lower() in CACHED_EXTENSIONS:
+        try:
+            get_parsed_text_cache().put(key, documents)
+        except Exception as e:
+            logger.error(f"Error writing parsed text cache for {file_path}: {e}")
+    return documents
+
+
+def iter_documents(
+    path: str,
+    recursive: bool = False,
+    workers: int = DEFAULT_PARSE_WORKERS,
+    process_extensions: Iterable[str] = PROCESS_EXTENSIONS,
+    files: Optional[List[str]] = None,
+    use_cache: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the documents under `path` one file at a time.
+
+    Files with an extension in `process_extensions` are parsed in a pool of
+    `workers` processes while the others are parsed inline. At most two
+    parses per worker are outstanding, so memory use is bounded by the
+    largest few files rather than the size of the folder. Documents are
+    yielded in file order. Files whose parse is cached are read from the
+    cache here instead of being sent to a worker.
+
+    Args:
+        path (str): Folder to load.
+        recursive (bool, optional): Whether to include subfolders. Defaults to False.
+        workers (int, optional): Worker processes for CPU-heavy formats; 1 parses everything inline.
+        process_extensions (Iterable[str], optional): Extensions parsed in worker processes.
+        files (List[str], optional): Files to load instead of listing `path`.
+        use_cache (bool, optional): Whether to reuse and store parsed text. Defaults to True.
+    """
+    if files is None:
+        files = list_document_files(path, recursive)
+    process_extensions = {ext.lower() for ext in process_extensions}
+    window = max(1, workers) * 2
+    pool: Optional[ProcessPoolExecutor] = None
+    pending: Deque[Future] = deque()
+    try:
+        for file_path in files:
+            cached = _cached(file_path) if use_cache else None
+            if cached is None and workers > 1 and os.path.splitext(file_path)[1].lower() in process_extensions:
+                if pool is None:
+                    # Spawned workers do not inherit the server's threads and locks
+                    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                future = pool.submit(load_file, file_path, use_cache)
+            else:
+                future = Future()
+                future.set_result(cached if cached is not None else load_file(file_path, use_cache))
+            pending.append(future)
+            # Hand out finished files in order, and wait once the window is full
+            while pending and (pending[0].done() or len(pending) > window):
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
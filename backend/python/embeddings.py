@@ -0,0 +1,133 @@
+import re
+import math
+import zlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Dimensions of the hashing vectorizer
+HASHING_DIM = 1024
+# Texts per Ollama embedding request
+OLLAMA_EMBED_BATCH = 64
+
+_WORD = re.compile(r"[a-z0-9]{2,}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingProvider:
+    """
+    Turns texts into L2-normalized embedding rows.
+    """
+    name = "base"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Offline stand-in for a real embedding model: words and word pairs hashed
+    into a fixed number of signed buckets.
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(vectors)
+
+
+class OllamaEmbedder(EmbeddingProvider):
+    """
+    Embeddings from a local Ollama embedding model such as nomic-embed-text.
+    """
+    def __init__(self, model: str, host: Optional[str] = None):
+        import ollama
+
+        self.name = f"ollama/{model}"
+        self.model = model
+        self.client = ollama.Client(host=host)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows = []
+        for i in range(0, len(texts), OLLAMA_EMBED_BATCH):
+            response = self.client.embed(model=self.model, input=list(texts[i:i + OLLAMA_EMBED_BATCH]))
+            rows.extend(response.embeddings)
+        return _normalize(np.asarray(rows, dtype=np.float32).reshape(len(texts), -1))
+
+
+def get_embedder(name: str = "hashing", host: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Build a provider from its name: "hashing" or "ollama/<model>".
+    """
+    if name == "hashing":
+        return HashingEmbedder()
+    if name.startswith("ollama/"):
+        return OllamaEmbedder(name.split("/", 1)[1], host)
+    raise ValueError(f"Unknown embedding provider: {name}")
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 50, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means over L2-normalized rows with k-means++ seeding.
+
+    Returns:
+        np.ndarray: The cluster label of every row.
+    """
+    n = len(vectors)
+    k = max(1, min(k, n))
+    if k == 1:
+        return np.zeros(n, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    centers = [vectors[rng.integers(n)]]
+    distance = 1.0 - vectors @ centers[0]
+    for _ in range(1, k):
+        weights = np.clip(distance, 0, None).astype(np.float64) ** 2
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centers.append(vectors[index])
+        distance = np.minimum(distance, 1.0 - vectors @ vectors[index])
+    centers = np.stack(centers)
+
+    labels = np.full(n, -1, dtype=np.int64)
+    for _ in range(iterations):
+        similarity = vectors @ centers.T
+        new_labels = similarity.argmax(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = vectors[labels == c]
+            if len(members):
+                centers[c] = members.sum(axis=0)
+            else:
+                # Re-seed an empty cluster with the point its center fits worst
+                centers[c] = vectors[similarity.max(axis=1).argmin()]
+        centers = _normalize(centers)
+    return labels
+
+
+def cluster_texts(texts: Sequence[str], embedder: EmbeddingProvider, cluster_size: int) -> List[List[int]]:
+    """
+    Embed `texts` and group their indices into about len(texts) / cluster_size clusters.
+    """
+    if not texts:
+        return []
+    vectors = embedder.embed(texts)
+    labels = kmeans(vectors, math.ceil(len(texts) / max(1, cluster_size)))
+    clusters = {}
+    for index, label in enumerate(labels):
+        clusters.setdefault(int(label), []).append(index)
+    return list(clusters.values())
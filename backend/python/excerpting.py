@@ -0,0 +1,99 @@
+import re
+from typing import Any, Dict, List
+
+from deduplication import simhash
+from llm_batching import count_tokens, truncate_tokens
+from summary_cache import content_hash
+
+# Tokens of file content sent per document when summarizing
+DEFAULT_EXCERPT_TOKENS = 800
+# Metadata the model sees; llama_index adds dates, ids and other fields it does not need
+PROMPT_METADATA = ("file_path", "file_name", "file_type", "file_size", "pages")
+# Fields of a prepared document that are not sent to the model
+INTERNAL_FIELDS = ("content_hash", "simhash")
+# Share of the excerpt spent on detected headings
+HEADINGS_SHARE = 0.2
+# Share of the remaining excerpt taken from the start of the file; the rest comes from the end
+HEAD_SHARE = 0.7
+# Characters per token assumed when pre-cutting long texts before tokenizing
+CHARS_PER_TOKEN = 8
+MAX_HEADINGS = 30
+
+_HEADING_PATTERNS = [
+    re.compile(r"^#{1,6}\s+\S"),                              # Markdown
+    re.compile(r"^(\d+\.)+\d*\s+[A-Z]"),                      # 1. / 2.3 Numbered
+    re.compile(r"^(chapter|section|part|appendix)\b", re.I),
+    re.compile(r"^[A-Z][A-Z0-9 ,:&/()'-]{3,60}$"),           # ALL CAPS line
+    re.compile(r"^(def|class|function|func|fn)\s+\w+"),       # Source code
+]
+_UNDERLINE = re.compile(r"^(=+|-+)$")
+
+
+def detect_headings(text: str, limit: int = MAX_HEADINGS) -> List[str]:
+    """
+    Find heading-like lines: Markdown and setext headings, numbered and ALL CAPS
+    titles, chapter markers and top-level code definitions.
+    """
+    headings = []
+    previous = ""
+    for raw in text.splitlines():
+        line = raw.strip()
+        if _UNDERLINE.match(line) and previous and len(line) >= 3:
+            headings.append(previous)
+        elif line and len(line) <= 120 and any(p.match(line) for p in _HEADING_PATTERNS):
+            headings.append(line)
+        if len(headings) >= limit:
+            break
+        previous = line
+    return list(dict.fromkeys(headings))
+
+
+def build_excerpt(text: str, max_tokens: int = DEFAULT_EXCERPT_TOKENS) -> str:
+    """
+    Return `text` if it fits in `max_tokens`, otherwise its detected headings
+    followed by head and tail segments, together within the token cap.
+    """
+    # Only the first and last few thousand characters can end up in the excerpt
+    window = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= 2 * window and count_tokens(text) <= max_tokens:
+        return text
+
+    parts = []
+    budget = max_tokens
+    headings = detect_headings(text)
+    if headings:
+        block = truncate_tokens("Headings: " + "; ".join(headings), int(max_tokens * HEADINGS_SHARE))
+        parts.append(block)
+        budget -= count_tokens(block)
+    head_tokens = int(budget * HEAD_SHARE)
+    parts.append(truncate_tokens(text[:window], head_tokens))
+    parts.append("[...]")
+    # Leave room for the separators, which can merge with neighbouring tokens
+    parts.append(truncate_tokens(text[-window:], budget - head_tokens - 8, from_end=True))
+    return "\n".join(parts)
+
+
+def prepare_document(doc: Dict[str, Any], max_tokens: int = DEFAULT_EXCERPT_TOKENS, fingerprint: bool = False) -> Dict[str, Any]:
+    """
+    Reduce a loaded document to what the summarizer needs: the PROMPT_METADATA
+    fields, a bounded "excerpt" of its content and the "content_hash" of the
+    full content. With `fingerprint`, the "simhash" of the full content is
+    kept for near-duplicate detection. Already prepared documents are
+    returned unchanged.
+    """
+    if "excerpt" in doc:
+        return doc
+    content = doc.get("content", "")
+    prepared = {key: doc[key] for key in PROMPT_METADATA if key in doc}
+    prepared["excerpt"] = build_excerpt(content, max_tokens)
+    prepared["content_hash"] = content_hash(content)
+    if fingerprint:
+        prepared["simhash"] = simhash(content)
+    return prepared
+
+
+def prompt_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The part of a prepared document that is sent to the model.
+    """
+    return {key: value for key, value in doc.items() if key not in INTERNAL_FIELDS}
@@ -0,0 +1,258 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+
+from folder_scanner import file_extension
+
+logger = logging.getLogger(__name__)
+
+# Location of the index database; override with the NST_INDEX_PATH environment variable
+DEFAULT_INDEX_PATH = os.environ.get(
+    "NST_INDEX_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "nst", "folder_index.sqlite3"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL,
+    is_link INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (root, path)
+);
+CREATE TABLE IF NOT EXISTS files (
+    dir_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ext TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir_id);
+"""
+
+
+class FolderIndex:
+    """
+    Persistent SQLite index of scanned folders: one row per directory and per file.
+
+    A refresh stats every indexed directory but only lists the ones whose mtime
+    changed, so rescans of an unchanged tree cost one stat per directory. A
+    directory's mtime only changes when entries are added, removed or renamed,
+    so size and mtime of files edited in place are refreshed the next time
+    their directory changes.
+    """
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def refresh(self, root: str) -> Dict[str, Any]:
+        """
+        Bring the index for `root` up to date, listing only changed directories.
+
+        Returns:
+            Dict[str, Any]: Counts of visited and re-listed directories and the elapsed time.
+        """
+        root = os.path.abspath(root)
+        start = time.perf_counter()
+        with self._write_lock, self._connect() as conn:
+            known = {}
+            links = set()
+            children: Dict[str, List[str]] = {}
+            for dir_id, path, parent, mtime_ns, is_link in conn.execute(
+                "SELECT id, path, parent, mtime_ns, is_link FROM dirs WHERE root = ?", (root,)
+            ):
+                known[path] = (dir_id, mtime_ns)
+                if is_link:
+                    links.add(path)
+                if parent is not None:
+                    children.setdefault(parent, []).append(path)
+
+            visited = set()
+            relisted = 0
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                if path in links:
+                    # Symlinked directories are listed but never followed
+                    visited.add(path)
+                    continue
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                visited.add(path)
+                if path in known and known[path][1] == mtime_ns:
+                    # Unchanged directory: reuse the indexed subdirectories
+                    stack.extend(children.get(path, []))
+                    continue
+
+                relisted += 1
+                dir_id = known[path][0] if path in known else None
+                subdirs, linked = self._relist(conn, root, path, dir_id, mtime_ns)
+                stack.extend(subdirs)
+                visited.update(linked)
+
+            # Drop directories that disappeared (or became unreadable) since the last scan
+            removed = [(dir_id,) for path, (dir_id, _) in known.items() if path not in visited]
+            if removed:
+                conn.executemany("DELETE FROM files WHERE dir_id = ?", removed)
+                conn.executemany("DELETE FROM dirs WHERE id = ?", removed)
+            conn.execute(
+                "INSERT OR REPLACE INTO roots (root, scanned_at) VALUES (?, ?)",
+                (root, time.time()),
+            )
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Indexed {root}: {len(visited)} directories, {relisted} re-listed in {elapsed:.3f}s")
+        return {"directories": len(visited), "relisted": relisted, "elapsed": elapsed}
+
+    def _relist(
+        self, conn: sqlite3.Connection, root: str, path: str, dir_id: Optional[int], mtime_ns: int
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Re-list one directory, replacing its file rows.
+
+        Returns the subdirectories to descend into and the symlinked directories,
+        which are recorded as folders but not followed.
+        """
+        subdirs = []
+        linked = []
+        rows = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if entry.is_symlink():
+                                linked.append(entry.path)
+                            else:
+                                subdirs.append(entry.path)
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    rows.append((entry.name, st.st_size, st.st_mtime_ns, file_extension(entry.name)))
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {path}: {e}")
+
+        if dir_id is None:
+            parent = None if path == root else os.path.dirname(path)
+            dir_id = conn.execute(
+                "INSERT INTO dirs (root, path, parent, mtime_ns) VALUES (?, ?, ?, ?)",
+                (root, path, parent, mtime_ns),
+            ).lastrowid
+        else:
+            conn.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, dir_id))
+            conn.execute("DELETE FROM files WHERE dir_id = ?", (dir_id,))
+        conn.executemany(
+            "INSERT INTO files (dir_id, name, size, mtime_ns, ext) VALUES (?, ?, ?, ?, ?)",
+            [(dir_id, *row) for row in rows],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO dirs (root, path, parent, mtime_ns, is_link) VALUES (?, ?, ?, 0, 1)",
+            [(root, link, path) for link in linked],
+        )
+        return subdirs, linked
+
+    def is_indexed(self, root: str) -> bool:
+        root = os.path.abspath(root)
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM roots WHERE root = ?", (root,)).fetchone() is not None
+
+    def listing(self, root: str) -> Dict[str, Any]:
+        """
+        Return files (absolute), folders (relative to the root) and extensions from the index.
+
+        File rows are read grouped by directory so each directory prefix is built once.
+        """
+        root = os.path.abspath(root)
+        prefix_len = len(os.path.join(root, ""))
+        files = []
+        folders = []
+        extensions = set()
+        with self._connect() as conn:
+            prefixes = {}
+            for dir_id, path in conn.execute("SELECT id, path FROM dirs WHERE root = ?", (root,)):
+                prefixes[dir_id] = os.path.join(path, "")
+                if path != root:
+                    folders.append(path[prefix_len:])
+            rows = conn.execute(
+                "SELECT dir_id, name, ext FROM files WHERE dir_id IN (SELECT id FROM dirs WHERE root = ?) ORDER BY dir_id",
+                (root,),
+            )
+            for dir_id, group in groupby(rows, key=itemgetter(0)):
+                prefix = prefixes[dir_id]
+                for _, name, ext in group:
+                    files.append(prefix + name)
+                    extensions.add(ext)
+        return {"files": files, "folders": folders, "extensions": list(extensions)}
+
+    def stats(self, root: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer extension and count questions for an indexed root without touching the disk.
+
+        Returns None if the root has never been indexed.
+        """
+        root = os.path.abspath(root)
+        with self._connect() as conn:
+            row = conn.execute("SELECT scanned_at FROM roots WHERE root = ?", (root,)).fetchone()
+            if row is None:
+                return None
+            by_extension = {
+                ext: {"count": count, "bytes": total}
+                for ext, count, total in conn.execute(
+                    "SELECT files.ext, COUNT(*), COALESCE(SUM(files.size), 0) FROM files "
+                    "JOIN dirs ON files.dir_id = dirs.id WHERE dirs.root = ? GROUP BY files.ext",
+                    (root,),
+                )
+            }
+            (folder_count,) = conn.execute("SELECT COUNT(*) FROM dirs WHERE root = ? AND path != ?", (root, root)).fetchone()
+        return {
+            "path": root,
+            "scanned_at": row[0],
+            "file_count": sum(v["count"] for v in by_extension.values()),
+            "folder_count": folder_count,
+            "total_bytes": sum(v["bytes"] for v in by_extension.values()),
+            "extensions": by_extension,
+        }
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_folder_index() -> FolderIndex:
+    """
+    Return the process-wide FolderIndex at DEFAULT_INDEX_PATH, opening it on first use.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = FolderIndex()
+        return _default_index
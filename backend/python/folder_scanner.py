@@ -0,0 +1,558 @@
+import os
+import re
+import fnmatch
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterator, List, NamedTuple, Optional, Set, Tuple, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Default number of threads used for parallel fan-out across subdirectories.
+# os.scandir releases the GIL while it waits on the filesystem, so threads
+# overlap well on network shares and cold caches.
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class DirectoryListing(NamedTuple):
+    """
+    The contents of a single directory visited during a scan.
+    """
+    path: str                 # absolute path of the directory
+    rel_path: str             # path relative to the scan root ('' for the root itself)
+    depth: int                # 0 for the root, 1 for its children, ...
+    dirs: List[str]           # names of the subdirectories
+    files: List[os.DirEntry]  # entries for the non-directory children
+
+
+def file_extension(name: str) -> str:
+    """
+    Return the extension of a file name, matching os.path.splitext.
+    """
+    dot = name.rfind(".")
+    if dot <= 0:
+        return ""
+    # Leading dots do not start an extension (".bashrc", "..cfg")
+    if name[0] == "." and not name[:dot].strip("."):
+        return ""
+    return name[dot:]
+
+
+def _list_directory(path: str) -> Tuple[List[str], List[str], List[os.DirEntry]]:
+    """
+    List one directory with os.scandir.
+
+    Returns the subdirectory names, the names of the subdirectories that should
+    be descended into (symlinked directories are listed but not followed, like
+    os.walk), and the entries of everything else.
+    """
+    dirs = []
+    descend = []
+    files = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry.name)
+                    try:
+                        if not entry.is_symlink():
+                            descend.append(entry.name)
+                    except OSError:
+                        pass
+                else:
+                    files.append(entry)
+    except OSError as e:
+        # Unreadable directories are skipped, as os.walk does by default
+        logger.debug(f"Skipping unreadable directory {path}: {e}")
+    return dirs, descend, files
+
+
+def _join(parent: str, name: str) -> str:
+    return os.path.join(parent, name) if parent else name
+
+
+class IgnoreRule(NamedTuple):
+    base: str                 # directory of the .gitignore, relative to the scan root
+    regex: "re.Pattern[str]"  # compiled pattern, see _gitignore_regex
+    negate: bool              # "!pattern" re-includes a previously ignored path
+    dir_only: bool            # "pattern/" only matches directories
+    anchored: bool            # patterns containing a slash match relative to `base`
+
+
+def _gitignore_regex(pattern: str) -> "re.Pattern[str]":
+    """
+    Translate a gitignore glob into a regex.
+
+    "*" and "?" do not cross "/", "**/" matches zero or more directories,
+    "/**" everything below, and [...] character classes are kept.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif c == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[" and "]" in pattern[i + 2:]:
+            close = pattern.index("]", i + 2)
+            body = pattern[i + 1:close]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = close + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+def _read_gitignore(path: str, base: str) -> List[IgnoreRule]:
+    """
+    Parse the .gitignore in directory `path` into rules.
+    """
+    rules = []
+    try:
+        with open(os.path.join(path, ".gitignore"), encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        rules.append(IgnoreRule(base, _gitignore_regex(line.lstrip("/")), negate, dir_only, anchored))
+    return rules
+
+
+def _is_ignored(rules: List[IgnoreRule], rel_path: str, name: str, is_dir: bool) -> bool:
+    """
+    Apply gitignore-style rules to one entry; the last matching rule wins.
+    """
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.anchored:
+            target = rel_path[len(rule.base) + 1:] if rule.base else rel_path
+            matched = rule.regex.match(target) is not None
+        else:
+            matched = rule.regex.match(name) is not None
+        if matched:
+            ignored = not rule.negate
+    return ignored
+
+
+def _normalize_extensions(extensions: Optional[List[str]]) -> Optional[Set[str]]:
+    if extensions is None:
+        return None
+    return {(ext if ext.startswith(".") or not ext else "." + ext).lower() for ext in extensions}
+
+
+class ScanFilter:
+    """
+    Server-side filters applied while walking, so pruned directories are never descended into.
+
+    Depth counts from the root's children (depth 1). Extension, pattern, size
+    and time filters apply to files; hidden and .gitignore rules also prune
+    directories. Size and time filters need one stat per file. .gitignore
+    support covers negation, directory-only, anchored and "**" patterns, but
+    not global excludes or core.excludesFile.
+    """
+    def __init__(
+        self,
+        include_extensions: Optional[List[str]] = None,
+        exclude_extensions: Optional[List[str]] = None,
+        patterns: Optional[List[str]] = None,
+        max_depth: Optional[int] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None,
+        include_hidden: bool = True,
+        respect_gitignore: bool = False,
+    ):
+        self.include_extensions = _normalize_extensions(include_extensions)
+        self.exclude_extensions = _normalize_extensions(exclude_extensions) or set()
+        self.patterns = patterns or []
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.include_hidden = include_hidden
+        self.respect_gitignore = respect_gitignore
+        self.needs_stat = any(v is not None for v in (min_size, max_size, modified_after, modified_before))
+
+    @property
+    def is_noop(self) -> bool:
+        """
+        True when the filter accepts every entry, so the walk can skip it entirely.
+        """
+        return (
+            self.include_extensions is None
+            and not self.exclude_extensions
+            and not self.patterns
+            and self.max_depth is None
+            and not self.needs_stat
+            and self.include_hidden
+            and not self.respect_gitignore
+        )
+
+    def accept_file(self, entry: os.DirEntry, rel_path: str) -> bool:
+        name = entry.name
+        ext = file_extension(name).lower()
+        if self.include_extensions is not None and ext not in self.include_extensions:
+            return False
+        if ext in self.exclude_extensions:
+            return False
+        if self.patterns and not any(
+            fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in self.patterns
+        ):
+            return False
+        if self.needs_stat:
+            try:
+                st = entry.stat()
+            except OSError:
+                return False
+            if self.min_size is not None and st.st_size < self.min_size:
+                return False
+            if self.max_size is not None and st.st_size > self.max_size:
+                return False
+            if self.modified_after is not None and st.st_mtime < self.modified_after:
+                return False
+            if self.modified_before is not None and st.st_mtime > self.modified_before:
+                return False
+        return True
+
+
+def _visit(
+    path: str, rel_path: str, depth: int, rules: List[IgnoreRule], scan_filter: Optional[ScanFilter]
+) -> Tuple[List[str], List[str], List[os.DirEntry], List[IgnoreRule]]:
+    """
+    List one directory and apply the scan filter to its entries.
+
+    Returns the listed subdirectories, the ones to descend into, the accepted
+    files and the ignore rules in effect for the children.
+    """
+    dirs, descend, files = _list_directory(path)
+    if scan_filter is None:
+        return dirs, descend, files, rules
+
+    if scan_filter.respect_gitignore and any(entry.name == ".gitignore" for entry in files):
+        rules = rules + _read_gitignore(path, rel_path)
+    child_depth = depth + 1
+    if scan_filter.max_depth is not None and child_depth > scan_filter.max_depth:
+        return [], [], [], rules
+
+    def keep_dir(name: str) -> bool:
+        if not scan_filter.include_hidden and name.startswith("."):
+            return False
+        return not (rules and _is_ignored(rules, _join(rel_path, name), name, True))
+
+    dirs = [name for name in dirs if keep_dir(name)]
+    descend = [name for name in descend if keep_dir(name)] if child_depth != scan_filter.max_depth else []
+    kept = []
+    for entry in files:
+        name = entry.name
+        if not scan_filter.include_hidden and name.startswith("."):
+            continue
+        child_rel = _join(rel_path, name)
+        if rules and _is_ignored(rules, child_rel, name, False):
+            continue
+        if scan_filter.accept_file(entry, child_rel):
+            kept.append(entry)
+    return dirs, descend, kept, rules
+
+
+# Hook that trims a listing before the walk descends; dropped directories are not visited
+ListingSelector = Callable[[DirectoryListing], DirectoryListing]
+
+
+def _select(
+    listing: DirectoryListing, descend: List[str], select: Optional[ListingSelector]
+) -> Tuple[DirectoryListing, List[str]]:
+    if select is None:
+        return listing, descend
+    listing = select(listing)
+    kept = set(listing.dirs)
+    return listing, [name for name in descend if name in kept]
+
+
+def _walk_serial(
+    root: str, scan_filter: Optional[ScanFilter], select: Optional[ListingSelector]
+) -> Iterator[DirectoryListing]:
+    stack = [(root, "", 0, [])]
+    while stack:
+        path, rel_path, depth, rules = stack.pop()
+        dirs, descend, files, rules = _visit(path, rel_path, depth, rules, scan_filter)
+        listing, descend = _select(DirectoryListing(path, rel_path, depth, dirs, files), descend, select)
+        yield listing
+        # Push in reverse so directories are visited in listing order
+        for name in reversed(descend):
+            stack.append((os.path.join(path, name), _join(rel_path, name), depth + 1, rules))
+
+
+_FANOUT_POOL = None
+_FANOUT_POOL_LOCK = threading.Lock()
+
+
+def _fanout_pool() -> ThreadPoolExecutor:
+    """
+    Return the thread pool shared by all parallel scans, creating it on first use.
+    """
+    global _FANOUT_POOL
+    with _FANOUT_POOL_LOCK:
+        if _FANOUT_POOL is None:
+            _FANOUT_POOL = ThreadPoolExecutor(max_workers=DEFAULT_SCAN_WORKERS, thread_name_prefix="scan")
+        return _FANOUT_POOL
+
+
+def _walk_parallel(
+    root: str, workers: int, scan_filter: Optional[ScanFilter], select: Optional[ListingSelector]
+) -> Iterator[DirectoryListing]:
+    pool = _fanout_pool()
+    pending = {pool.submit(_visit, root, "", 0, [], scan_filter): (root, "", 0)}
+    queued = []
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, rel_path, depth = pending.pop(future)
+                dirs, descend, files, rules = future.result()
+                listing, descend = _select(DirectoryListing(path, rel_path, depth, dirs, files), descend, select)
+                for name in descend:
+                    queued.append((os.path.join(path, name), _join(rel_path, name), depth + 1, rules))
+                # Keep at most `workers` directories in flight for this scan
+                while queued and len(pending) < workers:
+                    child = queued.pop()
+                    pending[pool.submit(_visit, *child, scan_filter)] = child[:3]
+                yield listing
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_scan(
+    root: str,
+    workers: int = 1,
+    scan_filter: Optional[ScanFilter] = None,
+    select: Optional[ListingSelector] = None,
+) -> Iterator[DirectoryListing]:
+    """
+    Walk a directory tree with os.scandir, yielding one DirectoryListing per directory.
+
+    Args:
+        root (str): Directory to scan.
+        workers (int, optional): Number of threads to fan out across subdirectories.
+            With 1 (the default) the walk is serial and top-down; with more the
+            directories are yielded in completion order.
+        scan_filter (ScanFilter, optional): Filters applied during the walk. Defaults to None.
+        select (ListingSelector, optional): Called on each listing, in the caller's
+            thread, before its subdirectories are queued. Only the directories left
+            in the returned listing are descended into. Defaults to None.
+
+    Yields:
+        DirectoryListing: The contents of each visited directory.
+    """
+    root = os.path.abspath(root)
+    if workers > 1:
+        return _walk_parallel(root, workers, scan_filter, select)
+    return _walk_serial(root, scan_filter, select)
+
+
+def scan_folder(root: str, workers: int = 1, scan_filter: Optional[ScanFilter] = None) -> Dict[str, Any]:
+    """
+    Scan a folder and collect its files, folders and extensions.
+
+    Files are returned as absolute paths and folders relative to the root,
+    each folder listed once.
+
+    Args:
+        root (str): Directory to scan.
+        workers (int, optional): Number of threads for parallel fan-out. Defaults to 1.
+        scan_filter (ScanFilter, optional): Filters applied during the walk. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: Dictionary with files, folders and extensions lists.
+    """
+    files = []
+    folders = []
+    extensions = set()
+    for listing in iter_scan(root, workers=workers, scan_filter=scan_filter):
+        prefix = os.path.join(listing.path, "")
+        for entry in listing.files:
+            name = entry.name
+            files.append(prefix + name)
+            extensions.add(file_extension(name))
+        for name in listing.dirs:
+            folders.append(_join(listing.rel_path, name))
+    return {"files": files, "folders": folders, "extensions": list(extensions)}
+
+
+def resolve_workers(parallel: bool, workers: Optional[int] = None) -> int:
+    """
+    Translate the request's parallel flag and worker count into a thread count.
+    """
+    if not parallel:
+        return 1
+    if not workers or workers < 1:
+        return DEFAULT_SCAN_WORKERS
+    return min(workers, DEFAULT_SCAN_WORKERS)
+
+
+def iter_folder_batches(
+    root: str, workers: int = 1, batch_size: int = 1000, scan_filter: Optional[ScanFilter] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Scan a folder incrementally, yielding batches of entries while the walk runs.
+
+    Only the extension set and the counters are kept for the whole walk, so
+    memory use does not grow with the size of the tree.
+
+    Args:
+        root (str): Directory to scan.
+        workers (int, optional): Number of threads for parallel fan-out. Defaults to 1.
+        batch_size (int, optional): Maximum number of entries per batch. Defaults to 1000.
+        scan_filter (ScanFilter, optional): Filters applied during the walk. Defaults to None.
+
+    Yields:
+        Dict[str, Any]: "batch" records with files and folders, followed by one
+            "summary" record with the extensions and counts.
+    """
+    files = []
+    folders = []
+    extensions = set()
+    file_count = 0
+    folder_count = 0
+    for listing in iter_scan(root, workers=workers, scan_filter=scan_filter):
+        prefix = os.path.join(listing.path, "")
+        # Flush inside the loops so a single huge directory is still split up
+        for name in listing.dirs:
+            folders.append(_join(listing.rel_path, name))
+            if len(files) + len(folders) >= batch_size:
+                file_count += len(files)
+                folder_count += len(folders)
+                yield {"type": "batch", "files": files, "folders": folders}
+                files = []
+                folders = []
+        for entry in listing.files:
+            name = entry.name
+            files.append(prefix + name)
+            extensions.add(file_extension(name))
+            if len(files) + len(folders) >= batch_size:
+                file_count += len(files)
+                folder_count += len(folders)
+                yield {"type": "batch", "files": files, "folders": folders}
+                files = []
+                folders = []
+    if files or folders:
+        file_count += len(files)
+        folder_count += len(folders)
+        yield {"type": "batch", "files": files, "folders": folders}
+    yield {
+        "type": "summary",
+        "extensions": list(extensions),
+        "file_count": file_count,
+        "folder_count": folder_count,
+    }
+
+
+def aggregate_folder(root: str, workers: int = 1, scan_filter: Optional[ScanFilter] = None) -> Dict[str, Any]:
+    """
+    Count files and bytes per extension without building any path lists.
+
+    Args:
+        root (str): Directory to scan.
+        workers (int, optional): Number of threads for parallel fan-out. Defaults to 1.
+        scan_filter (ScanFilter, optional): Filters applied during the walk. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: Per-extension counts and byte totals plus overall counts.
+    """
+    by_extension: Dict[str, Dict[str, int]] = {}
+    folder_count = 0
+    for listing in iter_scan(root, workers=workers, scan_filter=scan_filter):
+        folder_count += len(listing.dirs)
+        for entry in listing.files:
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                size = 0
+            ext = file_extension(entry.name)
+            bucket = by_extension.get(ext)
+            if bucket is None:
+                bucket = by_extension[ext] = {"count": 0, "bytes": 0}
+            bucket["count"] += 1
+            bucket["bytes"] += size
+    return {
+        "file_count": sum(v["count"] for v in by_extension.values()),
+        "folder_count": folder_count,
+        "total_bytes": sum(v["bytes"] for v in by_extension.values()),
+        "extensions": by_extension,
+    }
+
+
+def scan_folder_columnar(root: str, workers: int = 1, scan_filter: Optional[ScanFilter] = None) -> Dict[str, Any]:
+    """
+    Scan a folder into a compact columnar layout without building per-file path strings.
+
+    Directories are stored once in a table of paths relative to the root; files
+    and folders refer to it by index.
+
+    Returns:
+        Dict[str, Any]: Dictionary with dirs (relative directory paths, '' for the
+            root), file_dir/file_name columns, folders (dir indices) and extensions.
+    """
+    dirs = []
+    dir_index: Dict[str, int] = {}
+    file_dir = []
+    file_name = []
+    folders = []
+    extensions = set()
+
+    def intern(rel_path: str) -> int:
+        index = dir_index.get(rel_path)
+        if index is None:
+            index = dir_index[rel_path] = len(dirs)
+            dirs.append(rel_path)
+        return index
+
+    for listing in iter_scan(root, workers=workers, scan_filter=scan_filter):
+        if listing.files:
+            index = intern(listing.rel_path)
+            for entry in listing.files:
+                name = entry.name
+                file_dir.append(index)
+                file_name.append(name)
+                extensions.add(file_extension(name))
+        for name in listing.dirs:
+            folders.append(intern(_join(listing.rel_path, name)))
+    return {
+        "dirs": dirs,
+        "file_dir": file_dir,
+        "file_name": file_name,
+        "folders": folders,
+        "extensions": list(extensions),
+    }
@@ -0,0 +1,257 @@
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Set, Tuple, Any
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler, FileSystemEvent
+
+from folder_scanner import iter_scan
+
+logger = logging.getLogger(__name__)
+
+# Pending deltas per subscriber before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = 10000
+
+
+def _empty_delta(event: str) -> Dict[str, Any]:
+    return {
+        "type": "delta",
+        "event": event,
+        "added_files": [],
+        "added_folders": [],
+        "removed_files": [],
+        "removed_folders": [],
+    }
+
+
+class FolderTree:
+    """
+    In-memory tree of a watched root: the file and subdirectory names of every directory.
+
+    Files are reported as absolute paths and folders relative to the root,
+    matching /explorefolder.
+    """
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.files: Dict[str, Set[str]] = {}
+        self.subdirs: Dict[str, Set[str]] = {}
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    def add_tree(self, path: str, delta: Dict[str, Any]):
+        """
+        Scan the directory at `path` and add it and its contents to the tree.
+        """
+        if path != self.root:
+            parent, name = os.path.split(path)
+            if name not in self.subdirs.setdefault(parent, set()):
+                self.subdirs[parent].add(name)
+                delta["added_folders"].append(self._rel(path))
+        for listing in iter_scan(path):
+            # Only report entries the tree did not know yet; watchdog may already
+            # have sent events for some of them
+            files = self.files.setdefault(listing.path, set())
+            subdirs = self.subdirs.setdefault(listing.path, set())
+            for entry in listing.files:
+                if entry.name not in files:
+                    files.add(entry.name)
+                    delta["added_files"].append(os.path.join(listing.path, entry.name))
+            for name in listing.dirs:
+                if name not in subdirs:
+                    subdirs.add(name)
+                    delta["added_folders"].append(self._rel(os.path.join(listing.path, name)))
+
+    def add_file(self, path: str, delta: Dict[str, Any]):
+        parent, name = os.path.split(path)
+        names = self.files.setdefault(parent, set())
+        if name not in names:
+            names.add(name)
+            delta["added_files"].append(path)
+
+    def remove(self, path: str, delta: Dict[str, Any]):
+        """
+        Remove a file, or a directory and everything below it, from the tree.
+        """
+        parent, name = os.path.split(path)
+        if name in self.files.get(parent, ()):
+            self.files[parent].discard(name)
+            delta["removed_files"].append(path)
+            return
+        if name not in self.subdirs.get(parent, ()):
+            return
+        self.subdirs[parent].discard(name)
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            delta["removed_folders"].append(self._rel(current))
+            delta["removed_files"].extend(os.path.join(current, n) for n in self.files.pop(current, ()))
+            stack.extend(os.path.join(current, n) for n in self.subdirs.pop(current, ()))
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "file_count": sum(len(names) for names in self.files.values()),
+            "folder_count": sum(len(names) for names in self.subdirs.values()),
+        }
+
+    def listing(self) -> Dict[str, List[str]]:
+        return {
+            "files": [os.path.join(d, n) for d, names in self.files.items() for n in names],
+            "folders": [self._rel(os.path.join(d, n)) for d, names in self.subdirs.items() for n in names],
+        }
+
+
+class FolderWatcher(FileSystemEventHandler):
+    """
+    Watches one root with watchdog (inotify on Linux), applies create, delete and
+    move events to a FolderTree and fans the resulting deltas out to subscribers.
+    """
+    def __init__(self, root: str, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.root = os.path.abspath(root)
+        self.loop = loop
+        self.tree = FolderTree(self.root)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._lock = threading.Lock()
+        self._observer = None
+        self.started = threading.Event()  # set once start() finished, successfully or not
+        self.error = None
+
+    def start(self):
+        """
+        Scan the root and start observing it. Blocks for the initial scan.
+        """
+        # Schedule first so nothing created during the initial scan is missed
+        self._observer = Observer()
+        self._observer.schedule(self, self.root, recursive=True)
+        self._observer.start()
+        with self._lock:
+            self.tree.add_tree(self.root, _empty_delta("scan"))
+        logger.info(f"Watching folder: {self.root}")
+
+    def stop(self):
+        # Observer.stop() only signals the observer thread, it does not wait for it
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        logger.info(f"Stopped watching folder: {self.root}")
+
+    def _publish(self, delta: Dict[str, Any]):
+        if any(delta[key] for key in ("added_files", "added_folders", "removed_files", "removed_folders")):
+            self.loop.call_soon_threadsafe(self._broadcast, delta)
+
+    def _broadcast(self, delta: Dict[str, Any]):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # A slow client missed deltas: tell it to fetch the folder again
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "reset"})
+
+    def _inside(self, path: str) -> bool:
+        return path == self.root or path.startswith(os.path.join(self.root, ""))
+
+    def on_created(self, event: FileSystemEvent):
+        if not self._inside(event.src_path):
+            return
+        delta = _empty_delta("created")
+        with self._lock:
+            if event.is_directory:
+                self.tree.add_tree(event.src_path, delta)
+            else:
+                self.tree.add_file(event.src_path, delta)
+        self._publish(delta)
+
+    def on_deleted(self, event: FileSystemEvent):
+        if not self._inside(event.src_path):
+            return
+        delta = _empty_delta("deleted")
+        with self._lock:
+            self.tree.remove(event.src_path, delta)
+        self._publish(delta)
+
+    def on_moved(self, event: FileSystemEvent):
+        delta = _empty_delta("moved")
+        with self._lock:
+            if self._inside(event.src_path):
+                self.tree.remove(event.src_path, delta)
+            if self._inside(event.dest_path):
+                if event.is_directory:
+                    self.tree.add_tree(event.dest_path, delta)
+                else:
+                    self.tree.add_file(event.dest_path, delta)
+        self._publish(delta)
+
+    def snapshot(self, include_listing: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            record = {"type": "ready", "path": self.root, **self.tree.counts()}
+            if include_listing:
+                record.update(self.tree.listing())
+        return record
+
+
+class WatcherRegistry:
+    """
+    Shares one FolderWatcher per root between subscribers and stops it when the last one leaves.
+    """
+    def __init__(self):
+        self._watchers: Dict[str, FolderWatcher] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, root: str, loop: asyncio.AbstractEventLoop) -> Tuple[FolderWatcher, asyncio.Queue]:
+        """
+        Subscribe to a root, starting its watcher if needed. Blocks for the initial scan.
+
+        The registry lock is only held to look up or register the watcher; the
+        scan runs outside it, and later subscribers of the same root wait for it.
+
+        Raises:
+            OSError: If the watcher could not be started (e.g. the inotify watch limit was reached).
+        """
+        root = os.path.abspath(root)
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            watcher = self._watchers.get(root)
+            starting = watcher is None
+            if starting:
+                watcher = FolderWatcher(root, loop)
+                self._watchers[root] = watcher
+            watcher.subscribers.add(queue)
+
+        if starting:
+            try:
+                watcher.start()
+            except OSError as e:
+                logger.error(f"Error starting watcher for {root}: {e}")
+                watcher.error = e
+                watcher.stop()
+                with self._lock:
+                    if self._watchers.get(root) is watcher:
+                        del self._watchers[root]
+            finally:
+                watcher.started.set()
+        else:
+            watcher.started.wait()
+
+        if watcher.error is not None:
+            watcher.subscribers.discard(queue)
+            raise watcher.error
+        return watcher, queue
+
+    def unsubscribe(self, watcher: FolderWatcher, queue: asyncio.Queue):
+        """
+        Remove a subscriber, stopping the watcher after the last one. Does not block,
+        so it is safe to call from the event loop.
+        """
+        with self._lock:
+            watcher.subscribers.discard(queue)
+            if not watcher.subscribers and self._watchers.get(watcher.root) is watcher:
+                del self._watchers[watcher.root]
+            else:
+                return
+        watcher.stop()
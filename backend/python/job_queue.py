@@ -0,0 +1,196 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from progress import progress_reporter
+from usage_accounting import usage_scope
+
+logger = logging.getLogger(__name__)
+
+# Jobs run at once; the rest wait in the queue
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+# Finished jobs kept for polling before the oldest are dropped
+MAX_FINISHED_JOBS = 100
+# Progress events kept per job for late subscribers
+MAX_JOB_EVENTS = 1000
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running job at its next progress report after it was cancelled.
+    """
+
+
+class Job:
+    """
+    One queued or running unit of background work, with its status, progress events and result.
+    """
+    def __init__(self, job_id: str, kind: str, params: Dict[str, Any]):
+        self.job_id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.progress: Optional[Dict[str, Any]] = None
+        self.events: List[Dict[str, Any]] = []
+        self.subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self.cancel_requested = threading.Event()
+        self.future: Optional[Future] = None
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event: Dict[str, Any]):
+        """
+        Record an event and pass it to every subscriber. Safe to call from any thread.
+        """
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, "time": time.time(), **event}
+            self.events.append(event)
+            if len(self.events) > MAX_JOB_EVENTS:
+                del self.events[0]
+            subscribers = list(self.subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def report(self, event: Dict[str, Any]):
+        """
+        Progress reporter of the job's context: records the event, or stops the job if it was cancelled.
+        """
+        if self.cancel_requested.is_set():
+            raise JobCancelled(self.job_id)
+        self.progress = event
+        self.emit({"type": "progress", **event})
+
+    def set_status(self, status: str, **data: Any):
+        self.status = status
+        if status == RUNNING:
+            self.started_at = time.time()
+        elif status in FINISHED:
+            self.finished_at = time.time()
+        self.emit({"type": "status", "status": status, **data})
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, since: int = 0) -> Tuple[List[Dict[str, Any]], asyncio.Queue]:
+        """
+        Return the recorded events after `since` and a queue receiving the ones that follow.
+        """
+        queue = asyncio.Queue()
+        with self._lock:
+            backlog = [event for event in self.events if event["seq"] > since]
+            self.subscribers.add((loop, queue))
+        return backlog, queue
+
+    def unsubscribe(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        with self._lock:
+            self.subscribers.discard((loop, queue))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool. Jobs beyond `max_workers` wait in the
+    pool's queue, so long runs never occupy the server's request threads.
+
+    Cancellation is cooperative: a queued job is dropped, a running one stops
+    at its next report_progress call.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_CONCURRENT_JOBS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, fn: Callable[..., Any], params: Dict[str, Any]) -> Job:
+        """
+        Queue `fn(**params)` as a job and return it.
+        """
+        job = Job(uuid.uuid4().hex, kind, params)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        job.set_status(QUEUED)
+        job.future = self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any]):
+        if job.cancel_requested.is_set():
+            job.set_status(CANCELLED)
+            return
+        job.set_status(RUNNING)
+        try:
+            with progress_reporter(job.report), usage_scope(job_id=job.job_id):
+                result = fn(**job.params)
+        except JobCancelled:
+            logger.info(f"Job {job.job_id} cancelled")
+            job.set_status(CANCELLED)
+        except Exception as e:
+            if job.cancel_requested.is_set():
+                # Cancellation surfaced through a task wrapper as another exception
+                job.set_status(CANCELLED)
+            else:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                job.error = str(e)
+                job.set_status(FAILED, error=job.error)
+        else:
+            job.result = result
+            job.set_status(SUCCEEDED)
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Request cancellation of a job. Returns None if the job is unknown.
+        """
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            # Still queued: it will never start
+            job.set_status(CANCELLED)
+        return job
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_requested.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,118 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Tokenizer used to size prompts; close enough for the local and hosted models we target
+DEFAULT_ENCODING = "cl100k_base"
+# Prompt tokens of document content per summarization request
+DEFAULT_BATCH_TOKENS = 6000
+# Documents per request, so the JSON answer stays well inside the output limit
+DEFAULT_BATCH_FILES = 20
+# Requests in flight at once
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # tiktoken downloads its tables on first use; fall back to a character estimate offline
+        logger.warning(f"Tokenizer {name} unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """
+    Count the tokens of `text`, or estimate them at four characters per token
+    when the tokenizer cannot be loaded.
+    """
+    enc = _encoding(encoding)
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, from_end: bool = False, encoding: str = DEFAULT_ENCODING) -> str:
+    """
+    Keep the first (or, with `from_end`, the last) `max_tokens` tokens of `text`.
+    """
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(encoding)
+    if enc is None:
+        chars = max_tokens * 4
+        return text[-chars:] if from_end else text[:chars]
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[-max_tokens:] if from_end else tokens[:max_tokens])
+
+
+def pack_batches(
+    items: Sequence[T],
+    token_budget: int,
+    cost: Callable[[T], int],
+    max_items: Optional[int] = None,
+) -> List[List[T]]:
+    """
+    Greedily pack items, in order, into batches whose summed cost stays within
+    `token_budget` and which hold at most `max_items` items. An item costing
+    more than the budget on its own gets a batch to itself.
+    """
+    batches: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item in items:
+        tokens = cost(item)
+        full = max_items is not None and len(current) >= max_items
+        if current and (used + tokens > token_budget or full):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def run_batches(fn: Callable[[T], R], batches: Sequence[T], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> List[R]:
+    """
+    Apply `fn` to every batch with at most `max_concurrency` calls in flight.
+    Results are returned in batch order, and the first exception is re-raised.
+    """
+    if max_concurrency <= 1 or len(batches) <= 1:
+        return [fn(batch) for batch in batches]
+    workers = min(max_concurrency, len(batches))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as pool:
+        # Each call runs in a copy of the caller's context so context variables carry over
+        futures = [pool.submit(copy_context().run, fn, batch) for batch in batches]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def merge_file_results(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-batch `{"files": [...], "usage": {...}}` results into one, concatenating
+    files and summing token usage.
+    """
+    files = []
+    usage = {"completion_tokens": 0, "prompt_tokens": 0, "total_tokens": 0}
+    for result in results:
+        files.extend(result.get("files", []))
+        for key in usage:
+            usage[key] += (result.get("usage") or {}).get(key) or 0
+    return {"files": files, "usage": usage}
@@ -0,0 +1,150 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import httpx
+import ollama
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per api_base
+POOL_MAX_CONNECTIONS = int(os.environ.get("NST_LLM_POOL_CONNECTIONS", 32))
+POOL_KEEPALIVE_EXPIRY = 120.0
+# How long Ollama keeps a preloaded model in memory
+DEFAULT_KEEP_ALIVE = os.environ.get("NST_OLLAMA_KEEP_ALIVE", "30m")
+# Seconds a listing of the installed Ollama models is reused
+MODEL_LIST_TTL = float(os.environ.get("NST_MODEL_LIST_TTL", 60))
+
+OLLAMA_PREFIXES = ("ollama/", "ollama_chat/")
+
+
+def is_ollama_model(model: str) -> bool:
+    return model.startswith(OLLAMA_PREFIXES)
+
+
+class ClientPool:
+    """
+    Long-lived HTTP clients for model backends.
+
+    Every api_base gets one pooled httpx client, so completions reuse warm
+    keep-alive connections instead of connecting per call. Local Ollama
+    models can be preloaded and kept resident with `keep_alive`, and the
+    installed model list is cached for `model_list_ttl` seconds.
+    """
+    def __init__(
+        self,
+        max_connections: int = POOL_MAX_CONNECTIONS,
+        keep_alive: str = DEFAULT_KEEP_ALIVE,
+        model_list_ttl: float = MODEL_LIST_TTL,
+        clock=time.monotonic,
+    ):
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        self.model_list_ttl = model_list_ttl
+        self.clock = clock
+        self._http: Dict[str, HTTPHandler] = {}
+        self._ollama: Dict[Optional[str], ollama.Client] = {}
+        self._model_lists: Dict[Optional[str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def http_handler(self, api_base: str) -> HTTPHandler:
+        """
+        litellm handler around the pooled httpx client of `api_base`.
+        """
+        with self._lock:
+            handler = self._http.get(api_base)
+            if handler is None:
+                client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+                    ),
+                )
+                handler = self._http[api_base] = HTTPHandler(client=client)
+            return handler
+
+    def ollama_client(self, host: Optional[str] = None) -> ollama.Client:
+        with self._lock:
+            client = self._ollama.get(host)
+            if client is None:
+                client = self._ollama[host] = ollama.Client(host=host)
+            return client
+
+    def completion_kwargs(self, model: str, api_base: Optional[str]) -> Dict[str, Any]:
+        """
+        Extra litellm completion arguments that route the call through the pool.
+
+        litellm sends Ollama requests through the given HTTP handler. Other
+        providers go through OpenAI-style SDK clients that litellm already
+        caches per api_base and key, so they need nothing extra.
+        """
+        if api_base and is_ollama_model(model):
+            return {"client": self.http_handler(api_base)}
+        return {}
+
+    def preload(self, models: Iterable[str], api_base: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Load Ollama models into memory ahead of their first completion and keep
+        them resident for `keep_alive`. Calling it again for a loaded model only
+        renews its keep-alive. Other models are skipped.
+
+        Returns:
+            Dict[str, bool]: Whether each Ollama model was loaded.
+        """
+        loaded = {}
+        for model in dict.fromkeys(models):
+            if not is_ollama_model(model):
+                continue
+            name = model.split("/", 1)[1]
+            started = time.perf_counter()
+            try:
+                # An empty prompt loads the model without generating anything
+                self.ollama_client(api_base).generate(model=name, prompt="", keep_alive=self.keep_alive)
+                loaded[model] = True
+                logger.info(f"Preloaded {model} in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                loaded[model] = False
+                logger.warning(f"Could not preload {model}: {e}")
+        return loaded
+
+    def list_models(self, host: Optional[str] = None) -> Any:
+        """
+        ollama.list() of `host`, reused for `model_list_ttl` seconds.
+        """
+        now = self.clock()
+        with self._lock:
+            cached = self._model_lists.get(host)
+        if cached is not None and now - cached[0] < self.model_list_ttl:
+            return cached[1]
+        models = self.ollama_client(host).list()
+        with self._lock:
+            self._model_lists[host] = (now, models)
+        return models
+
+    def close(self):
+        with self._lock:
+            handlers = list(self._http.values())
+            self._http.clear()
+            self._ollama.clear()
+            self._model_lists.clear()
+        for handler in handlers:
+            handler.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """
+    The process-wide pool, shared by every job.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import litellm
+
+from llm_batching import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Requests and prompt tokens per minute allowed against each api_base/model; 0 means unlimited
+DEFAULT_REQUESTS_PER_MINUTE = float(os.environ.get("NST_LLM_REQUESTS_PER_MINUTE", 0))
+DEFAULT_TOKENS_PER_MINUTE = float(os.environ.get("NST_LLM_TOKENS_PER_MINUTE", 0))
+# Attempts per model after the first, and the backoff between them in seconds
+DEFAULT_MAX_RETRIES = int(os.environ.get("NST_LLM_MAX_RETRIES", 3))
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+# Model tried last when every other model of a request failed, e.g. "ollama/llama3.2"
+DEFAULT_FALLBACK_MODEL = os.environ.get("NST_LLM_FALLBACK_MODEL") or None
+DEFAULT_FALLBACK_API_BASE = os.environ.get("NST_LLM_FALLBACK_API_BASE", "http://localhost:11434")
+
+# Failures worth another attempt; anything else, such as a bad request, fails the model at once
+RETRYABLE_ERRORS = (
+    litellm.RateLimitError,
+    litellm.Timeout,
+    litellm.APIConnectionError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per second on average and bursts of up to `capacity` units.
+    """
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Take `amount` units, waiting until they are available. Requests larger
+        than the bucket take all of it.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+
+class LLMScheduler:
+    """
+    Shared gateway for completion requests.
+
+    - Requests to each api_base/model pass a requests-per-minute and a prompt
+      tokens-per-minute token bucket.
+    - Transient failures (rate limits, timeouts, connection and server errors)
+      are retried with exponential backoff and jitter.
+    - Identical non-streamed requests in flight at the same time are sent once
+      and share the response.
+    - When a model keeps failing, the request moves on to its fallback models
+      and finally to the local fallback model, if one is configured.
+    """
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        fallback_model: Optional[str] = DEFAULT_FALLBACK_MODEL,
+        fallback_api_base: Optional[str] = DEFAULT_FALLBACK_API_BASE,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.fallback_model = fallback_model
+        self.fallback_api_base = fallback_api_base
+        self.sleep = sleep
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, kind: str, api_base: Optional[str], model: str, per_minute: float) -> Optional[TokenBucket]:
+        if per_minute <= 0:
+            return None
+        key = (kind, api_base or "", model)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(per_minute / 60.0, per_minute, sleep=self.sleep)
+            return bucket
+
+    def _throttle(self, model: str, api_base: Optional[str], messages: List[Dict[str, Any]]):
+        waited = 0.0
+        requests = self._bucket("requests", api_base, model, self.requests_per_minute)
+        if requests is not None:
+            waited += requests.acquire()
+        tokens = self._bucket("tokens", api_base, model, self.tokens_per_minute)
+        if tokens is not None:
+            waited += tokens.acquire(sum(count_tokens(str(m.get("content", ""))) for m in messages))
+        if waited:
+            logger.info(f"Rate limited {model} for {waited:.2f}s")
+
+    def _chain(self, model: str, api_base: Optional[str], fallbacks: Sequence[str]) -> List[Tuple[str, Optional[str]]]:
+        chain = []
+        for name in [model, *fallbacks]:
+            if name and (name, api_base) not in chain:
+                chain.append((name, api_base))
+        if self.fallback_model and all(name != self.fallback_model for name, _ in chain):
+            chain.append((self.fallback_model, self.fallback_api_base))
+        return chain
+
+    def _attempt(self, completion_fn: Callable[..., Any], model: str, api_base: Optional[str], messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            self._throttle(model, api_base, messages)
+            try:
+                return completion_fn(model=model, messages=messages, api_base=api_base, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning(f"{model} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                self.sleep(delay)
+
+    def _run(self, completion_fn: Callable[..., Any], chain: List[Tuple[str, Optional[str]]], messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> Tuple[Any, str]:
+        error: Optional[Exception] = None
+        for model, api_base in chain:
+            try:
+                return self._attempt(completion_fn, model, api_base, messages, kwargs), model
+            except Exception as e:
+                error = e
+                logger.error(f"{model} failed: {e}")
+        raise error
+
+    def complete(
+        self,
+        completion_fn: Callable[..., Any],
+        model: str,
+        messages: List[Dict[str, Any]],
+        api_base: Optional[str] = None,
+        fallbacks: Sequence[str] = (),
+        **kwargs: Any
+    ) -> Tuple[Any, str, bool]:
+        """
+        Send a completion request through the scheduler.
+
+        Args:
+            completion_fn (Callable): litellm's completion or a compatible function.
+            model (str): Model to try first.
+            messages (List[Dict[str, Any]]): Chat messages.
+            api_base (str, optional): Base URL shared by `model` and `fallbacks`.
+            fallbacks (Sequence[str], optional): Models to try in order when `model` keeps failing.
+            **kwargs: Passed on to `completion_fn`.
+
+        Returns:
+            Tuple[Any, str, bool]: The response, the model that produced it, and
+            whether it was shared with an identical request already in flight.
+
+        Raises:
+            Exception: The last error once every model has failed.
+        """
+        chain = self._chain(model, api_base, fallbacks)
+        if kwargs.get("stream"):
+            # A stream can only be read once, so it is never shared
+            response, used = self._run(completion_fn, chain, messages, kwargs)
+            return response, used, False
+
+        key = hashlib.sha256(json.dumps([chain, messages, kwargs], sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            response, used = future.result()
+            return response, used, True
+
+        try:
+            result = self._run(completion_fn, chain, messages, kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result[0], result[1], False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    The process-wide scheduler, so every job shares the same rate limits.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -1,15 +1,29 @@
 import os
 import random
+import asyncio
 import logging
 import sys
 import json
-from typing import List
-from fastapi import FastAPI, HTTPException
+import multiprocessing
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import glob
 import uvicorn
 from dataorganization import document_processing_workflow
+from folder_scanner import (
+    ScanFilter, scan_folder, scan_folder_columnar, iter_folder_batches, aggregate_folder, resolve_workers
+)
+from folder_index import get_folder_index
+from folder_watcher import WatcherRegistry
+from materialization import is_registered_journal, rollback as rollback_materialization
+from job_queue import FINISHED as FINISHED_JOB_STATUSES, SUCCEEDED, Job, JobManager
+from usage_accounting import get_usage_ledger
+from response_encoding import JSON_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, negotiate_media_type, columnar_from_listing, encode_response
+from walk_snapshots import SnapshotStore, decode_cursor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,9 +40,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Walk snapshots backing the paginated listing
+snapshot_store = SnapshotStore()
+
+# Live folder watchers shared between /explorefolder/watch subscribers
+watcher_registry = WatcherRegistry()
+WATCH_KEEPALIVE = 15  # seconds between keep-alive comments on idle watch and job event streams
+
+# Background data organization runs; NST_MAX_CONCURRENT_JOBS bounds how many run at once
+job_manager = JobManager(max_workers=int(os.environ.get("NST_MAX_CONCURRENT_JOBS", 2)))
+
 # Define request and response models
 class FolderRequest(BaseModel):
     folder: str
+    parallel: bool = False  # fan the walk out across subdirectories
+    workers: Optional[int] = None  # threads for the parallel walk (defaults to the scan pool size)
+    use_index: bool = False  # answer from the persistent folder index, rescanning only changed directories
+    # Filters applied during the walk; pruned directories are never descended into
+    include_extensions: Optional[List[str]] = None  # e.g. [".pdf", "docx"]
+    exclude_extensions: Optional[List[str]] = None
+    patterns: Optional[List[str]] = None  # glob patterns matched against the file name or relative path
+    max_depth: Optional[int] = Field(None, ge=0)  # 1 = only the folder's direct children
+    min_size: Optional[int] = None  # bytes
+    max_size: Optional[int] = None  # bytes
+    modified_after: Optional[float] = None  # unix timestamp
+    modified_before: Optional[float] = None  # unix timestamp
+    include_hidden: bool = True
+    respect_gitignore: bool = False
+
+    def scan_filter(self) -> Optional[ScanFilter]:
+        """
+        Build the ScanFilter for this request, or None when no filter is set.
+        """
+        scan_filter = ScanFilter(
+            include_extensions=self.include_extensions,
+            exclude_extensions=self.exclude_extensions,
+            patterns=self.patterns,
+            max_depth=self.max_depth,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            modified_after=self.modified_after,
+            modified_before=self.modified_before,
+            include_hidden=self.include_hidden,
+            respect_gitignore=self.respect_gitignore,
+        )
+        return None if scan_filter.is_noop else scan_filter
+
+class FolderStreamRequest(FolderRequest):
+    batch_size: int = Field(1000, ge=1, le=100000)  # entries per NDJSON batch record
+
+class FolderPageRequest(FolderRequest):
+    folder: str = ""  # not needed when continuing from a cursor
+    limit: int = Field(500, ge=1, le=10000)
+    cursor: Optional[str] = None
+    depth_limits: Optional[Dict[int, int]] = None  # max folders and max files kept per depth (1 = the folder's children)
+
+class FolderPageResponse(BaseModel):
+    message: str
+    path: str
+    files: List[str]
+    folders: List[str]
+    extensions: List[str]
+    next_cursor: Optional[str]
+    complete: bool
+    total_files: int
+    total_folders: int
+
+class DataOrgRequest(BaseModel):
+    source_directory: str
+    destination_directory: str
+    summary_model: str
+    tree_model: str
+    api_base_url: Optional[str] = None
+    use_streaming: bool = False
+    incremental: bool = False  # only organize files added or changed since the last run
+    concurrent: bool = False  # run independent workflow steps side by side
+    deduplicate: bool = True  # summarize duplicate and near-duplicate files once
+    materialize_mode: Optional[Literal["move", "hardlink", "copy"]] = None  # put the files in place
+    dry_run: bool = False  # with materialize_mode, only report the planned operations
+    resume: bool = True  # reuse the stages a previous run over the same files completed
+    planner: Literal["auto", "single", "map_reduce", "embedding"] = "auto"  # how the file tree is planned
+    embedder: str = "hashing"  # "hashing" or "ollama/<model>", for the embedding planner
+
+class RollbackRequest(BaseModel):
+    journal: str
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    params: Dict[str, Any]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
 
 class FolderResponse(BaseModel):
     message: str
@@ -37,6 +143,16 @@ class FolderResponse(BaseModel):
     folders: List[str]
     extensions: List[str]
 
+class ColumnarFolderResponse(BaseModel):
+    message: str
+    path: str
+    root: str  # absolute path the dirs table is relative to
+    dirs: List[str]  # relative directory paths, '' for the root
+    file_dir: List[int]  # index into dirs of each file's directory
+    file_name: List[str]
+    folders: List[int]  # indices into dirs
+    extensions: List[str]
+
 # Define endpoints
 @app.get("/health")
 async def health_check():
@@ -54,69 +170,340 @@ async def get_random_number():
     logger.info(f"Random number generated: {number}")
     return {"number": number}
 
-@app.post("/explorefolder", response_model=FolderResponse)
-async def explore_folder(request: FolderRequest):
+# The endpoint returns a Response itself, so the model only documents the plain JSON layout
+@app.post(
+    "/explorefolder",
+    response_model=FolderResponse,
+    responses={200: {"content": {
+        COLUMNAR_JSON_MEDIA_TYPE: {"schema": ColumnarFolderResponse.model_json_schema()},
+        MSGPACK_MEDIA_TYPE: {"schema": ColumnarFolderResponse.model_json_schema()},
+    }}},
+)
+async def explore_folder(
+    request: FolderRequest,
+    accept: str = Header(JSON_MEDIA_TYPE),
+    accept_encoding: str = Header(""),
+):
+    """
+    List a folder. Send `Accept: application/vnd.nst.columnar+json` or
+    `Accept: application/msgpack` for the compact columnar layout, where
+    directories are stored once and files refer to them by index.
+    """
     logger.info(f"Exploring folder: {request.folder}")
-    files = []
-    folders = []
-    extensions = set()
-    
-    # Walk through all directories and subdirectories
-    for root, dirs, filenames in os.walk(request.folder):
-        # Add folders (with relative paths from the root folder)
-        rel_root = os.path.relpath(root, request.folder)
-        if rel_root != '.':
-            folders.append(rel_root)
-        folders.extend([os.path.join(rel_root, d) for d in dirs])
-        
-        # Add files (with absolute paths)
-        for filename in filenames:
-            abs_path = os.path.abspath(os.path.join(root, filename))
-            files.append(abs_path)
-            extensions.add(os.path.splitext(filename)[1])
-    
-    # Convert extensions set to list
-    extensions = list(extensions)
-    
-    return {
-        "message": "Folder explored", 
-        "path": request.folder, 
-        "files": files, 
-        "folders": folders, 
-        "extensions": extensions
-    }
-
-# @app.post("/dataorg")
-# async def data_organization(
-#     source_directory: str, 
-#     destination_directory: str, 
-#     summary_model: str, 
-#     tree_model: str, 
-#     api_base_url: str, 
-#     use_streaming: bool = False
-# ):
-#     # Ensure destination directory exists
-#     os.makedirs(destination_directory, exist_ok=True)
-
-#     # Run the workflow
-#     organized_files_result = document_processing_workflow(
-#         source_path=source_directory,
-#         destination_path=destination_directory,
-#         api_host="localhost",
-#         api_port=8111,
-#         summary_model=summary_model,
-#         tree_model=tree_model,
-#         api_base=api_base_url,
-#         stream=use_streaming
-#     )
-
-#     # Extract the results
-#     concatenated_data = organized_files_result.get("concatenated_data", [])
-
-#     return concatenated_data
+    if not os.path.isdir(request.folder):
+        raise HTTPException(status_code=404, detail=f"Folder not found: {request.folder}")
+
+    scan_filter = request.scan_filter()
+    if request.use_index and scan_filter is not None:
+        raise HTTPException(status_code=400, detail="Filters are not supported together with use_index")
+
+    media_type = negotiate_media_type(accept)
+    columnar = media_type != JSON_MEDIA_TYPE
+    if request.use_index:
+        # Refresh the persistent index (only changed directories are listed) and answer from it
+        index = get_folder_index()
+        await run_in_threadpool(index.refresh, request.folder)
+        result = await run_in_threadpool(index.listing, request.folder)
+        if columnar:
+            result = {
+                **columnar_from_listing(request.folder, result["files"], result["folders"]),
+                "extensions": result["extensions"],
+            }
+    else:
+        # Walk the tree in a worker thread so the event loop keeps serving requests
+        workers = resolve_workers(request.parallel, request.workers)
+        scan = scan_folder_columnar if columnar else scan_folder
+        result = await run_in_threadpool(scan, request.folder, workers, scan_filter)
+
+    payload = {"message": "Folder explored", "path": request.folder}
+    if columnar:
+        payload["root"] = os.path.abspath(request.folder)
+    payload.update(result)
+    # Serialize directly (no response_model re-validation) off the event loop
+    return await run_in_threadpool(encode_response, payload, media_type, accept_encoding)
+
+@app.post("/explorefolder/stream")
+async def explore_folder_stream(request: FolderStreamRequest):
+    """
+    Stream the folder listing as newline-delimited JSON while the walk runs.
+    """
+    logger.info(f"Streaming folder: {request.folder}")
+    if not os.path.isdir(request.folder):
+        raise HTTPException(status_code=404, detail=f"Folder not found: {request.folder}")
+
+    workers = resolve_workers(request.parallel, request.workers)
+    scan_filter = request.scan_filter()
+
+    def ndjson_lines():
+        for record in iter_folder_batches(request.folder, workers, request.batch_size, scan_filter):
+            if record["type"] == "summary":
+                record["path"] = request.folder
+            yield json.dumps(record) + "\n"
+
+    # StreamingResponse iterates synchronous generators in a worker thread
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/explorefolder/page", response_model=FolderPageResponse)
+async def explore_folder_page(request: FolderPageRequest):
+    """
+    Return one page of the folder listing, walking the disk only as far as needed.
+
+    The first request starts a server-side walk snapshot; pass the returned
+    `next_cursor` to read the following pages from it.
+    """
+    if request.cursor:
+        try:
+            snapshot_id, offset = decode_cursor(request.cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        snapshot = snapshot_store.get(snapshot_id)
+        if snapshot is None:
+            raise HTTPException(status_code=410, detail="Cursor expired, start a new listing")
+    else:
+        logger.info(f"Paging folder: {request.folder}")
+        if not os.path.isdir(request.folder):
+            raise HTTPException(status_code=404, detail=f"Folder not found: {request.folder}")
+        workers = resolve_workers(request.parallel, request.workers)
+        snapshot = snapshot_store.create(request.folder, workers, request.depth_limits, request.scan_filter())
+        offset = 0
+
+    page = await run_in_threadpool(snapshot.page, offset, request.limit)
+    return {"message": "Folder page", "path": snapshot.root, **page}
+
+@app.post("/explorefolder/aggregate")
+async def explore_folder_aggregate(request: FolderRequest):
+    """
+    Return per-extension file counts and byte totals without any path lists.
+    """
+    logger.info(f"Aggregating folder: {request.folder}")
+    if not os.path.isdir(request.folder):
+        raise HTTPException(status_code=404, detail=f"Folder not found: {request.folder}")
+
+    scan_filter = request.scan_filter()
+    if request.use_index:
+        if scan_filter is not None:
+            raise HTTPException(status_code=400, detail="Filters are not supported together with use_index")
+        # Refresh the persistent index and answer the counts from it
+        index = get_folder_index()
+        await run_in_threadpool(index.refresh, request.folder)
+        stats = await run_in_threadpool(index.stats, request.folder)
+        result = {key: stats[key] for key in ("file_count", "folder_count", "total_bytes", "extensions")}
+    else:
+        workers = resolve_workers(request.parallel, request.workers)
+        result = await run_in_threadpool(aggregate_folder, request.folder, workers, scan_filter)
+    return {"message": "Folder aggregated", "path": request.folder, **result}
+
+@app.post("/explorefolder/index")
+async def index_folder(request: FolderRequest):
+    """
+    Create or incrementally refresh the persistent index of a folder.
+    """
+    logger.info(f"Indexing folder: {request.folder}")
+    if not os.path.isdir(request.folder):
+        raise HTTPException(status_code=404, detail=f"Folder not found: {request.folder}")
+    result = await run_in_threadpool(get_folder_index().refresh, request.folder)
+    return {"message": "Folder indexed", "path": request.folder, **result}
+
+@app.post("/explorefolder/index/stats")
+async def index_folder_stats(request: FolderRequest):
+    """
+    Return per-extension counts and byte totals from the index without touching the disk.
+    """
+    stats = await run_in_threadpool(get_folder_index().stats, request.folder)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Folder not indexed: {request.folder}")
+    return stats
+
+@app.get("/explorefolder/watch")
+async def watch_folder(folder: str, snapshot: bool = False):
+    """
+    Keep a folder listing live: stream create, delete and move deltas as server-sent events.
+
+    The first event ("ready") carries the counts, and the full listing when
+    `snapshot` is set. A "reset" event means the client fell behind and should
+    list the folder again.
+    """
+    logger.info(f"Watching folder: {folder}")
+    if not os.path.isdir(folder):
+        raise HTTPException(status_code=404, detail=f"Folder not found: {folder}")
+
+    loop = asyncio.get_running_loop()
+    try:
+        watcher, queue = await run_in_threadpool(watcher_registry.subscribe, folder, loop)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Could not watch folder: {e}")
+    ready = await run_in_threadpool(watcher.snapshot, snapshot)
+
+    async def events():
+        try:
+            yield f"data: {json.dumps(ready)}\n\n"
+            while True:
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=WATCH_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(delta)}\n\n"
+                if delta["type"] == "reset":
+                    break
+        finally:
+            watcher_registry.unsubscribe(watcher, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def run_data_organization(
+    source_directory: str,
+    destination_directory: str,
+    summary_model: str,
+    tree_model: str,
+    api_base_url: Optional[str] = None,
+    use_streaming: bool = False,
+    incremental: bool = False,
+    concurrent: bool = False,
+    deduplicate: bool = True,
+    materialize_mode: Optional[str] = None,
+    dry_run: bool = False,
+    resume: bool = True,
+    planner: str = "auto",
+    embedder: str = "hashing",
+) -> Dict[str, Any]:
+    """
+    Run the document processing workflow for one /dataorg job.
+    """
+    # Ensure destination directory exists
+    os.makedirs(destination_directory, exist_ok=True)
+
+    # Run the workflow
+    return document_processing_workflow(
+        source_path=source_directory,
+        destination_path=destination_directory,
+        api_host="localhost",
+        api_port=8111,
+        summary_model=summary_model,
+        tree_model=tree_model,
+        api_base=api_base_url,
+        stream=use_streaming,
+        incremental=incremental,
+        concurrent=concurrent,
+        deduplicate=deduplicate,
+        materialize_mode=materialize_mode,
+        dry_run=dry_run,
+        resume=resume,
+        planner=planner,
+        embedder=embedder,
+    )
+
+@app.post("/dataorg/jobs", response_model=JobResponse, status_code=202)
+async def submit_data_organization(request: DataOrgRequest):
+    """
+    Queue a data organization run. Poll /dataorg/jobs/{job_id} or follow its
+    /events stream, then fetch /result.
+    """
+    if not os.path.isdir(request.source_directory):
+        raise HTTPException(status_code=404, detail=f"Folder not found: {request.source_directory}")
+    job = job_manager.submit("dataorg", run_data_organization, request.model_dump())
+    logger.info(f"Queued data organization job {job.job_id} for {request.source_directory}")
+    return job.snapshot()
+
+@app.get("/dataorg/jobs", response_model=List[JobResponse])
+async def list_data_organization_jobs():
+    return [job.snapshot() for job in job_manager.list()]
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+@app.get("/dataorg/jobs/{job_id}", response_model=JobResponse)
+async def get_data_organization_job(job_id: str):
+    return get_job_or_404(job_id).snapshot()
+
+@app.delete("/dataorg/jobs/{job_id}", response_model=JobResponse)
+async def cancel_data_organization_job(job_id: str):
+    """
+    Cancel a job. A queued job never starts; a running one stops at its next progress step.
+    """
+    get_job_or_404(job_id)
+    return job_manager.cancel(job_id).snapshot()
+
+@app.get("/dataorg/jobs/{job_id}/result")
+async def get_data_organization_result(job_id: str):
+    """
+    Return the workflow result of a finished job; 409 while it is queued or running or if it did not succeed.
+    """
+    job = get_job_or_404(job_id)
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}" + (f": {job.error}" if job.error else ""))
+    return job.result
+
+@app.post("/dataorg/rollback")
+async def rollback_data_organization(request: RollbackRequest):
+    """
+    Undo the file operations of a materialized run from the journal path in its result.
+    Only journals written by this server are accepted.
+    """
+    if not is_registered_journal(request.journal):
+        raise HTTPException(status_code=403, detail=f"Not a journal of this server: {request.journal}")
+    if not os.path.isfile(request.journal):
+        raise HTTPException(status_code=404, detail=f"Journal not found: {request.journal}")
+    return await run_in_threadpool(rollback_materialization, request.journal)
+
+@app.get("/dataorg/jobs/{job_id}/usage")
+async def get_data_organization_usage(job_id: str):
+    """
+    Tokens, latency, cost and throughput of a job's model calls, in total and per stage and model.
+    """
+    get_job_or_404(job_id)
+    return get_usage_ledger().summary(job_id=job_id)
+
+@app.get("/usage")
+async def get_usage(job_id: Optional[str] = None, stage: Optional[str] = None, model: Optional[str] = None):
+    """
+    Model usage of the process since it started, optionally narrowed to one job, stage or model.
+    """
+    labels = {key: value for key, value in (("job_id", job_id), ("stage", stage), ("model", model)) if value is not None}
+    return get_usage_ledger().summary(**labels)
+
+@app.get("/dataorg/jobs/{job_id}/events")
+async def data_organization_job_events(job_id: str, since: int = 0, last_event_id: Optional[str] = Header(None)):
+    """
+    Stream a job's status and progress events as server-sent events, starting
+    after event `since` (or the Last-Event-ID header on reconnect). The stream
+    ends after the job finishes.
+    """
+    job = get_job_or_404(job_id)
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    loop = asyncio.get_running_loop()
+    backlog, queue = job.subscribe(loop, since)
+
+    async def events():
+        try:
+            for event in backlog:
+                yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "status" and event["status"] in FINISHED_JOB_STATUSES:
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=WATCH_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "status" and event["status"] in FINISHED_JOB_STATUSES:
+                    return
+        finally:
+            job.unsubscribe(loop, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 # Run the server
 if __name__ == "__main__":
+    # In the frozen binary, parse worker processes re-run this executable; this
+    # turns them into workers instead of starting another server
+    multiprocessing.freeze_support()
+
     # Default configuration
     host = "127.0.0.1"
     port = 8111
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import uuid
+import errno
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODES = ("move", "hardlink", "copy")
+# File operations run at once; they are I/O-bound, so more threads than cores
+DEFAULT_MATERIALIZE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Operations handed to a worker at a time
+OPERATION_CHUNK = 256
+# Rollback journals are kept in this folder of the destination
+JOURNAL_DIR = ".nst_journal"
+# Every journal this server wrote is listed here; only those can be rolled back
+JOURNAL_REGISTRY = os.environ.get(
+    "NST_JOURNAL_REGISTRY",
+    os.path.join(os.path.expanduser("~"), ".cache", "nst", "journals.txt"),
+)
+_registry_lock = threading.Lock()
+
+# Linux ioctl that makes dst share src's blocks (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def unique_directories(paths: Iterable[str]) -> List[str]:
+    """
+    The folders that must exist for `paths`, without any folder that is a
+    parent of another, so each is created by a single makedirs call.
+    """
+    # Component order puts every folder right before its first subfolder
+    folders = sorted({os.path.dirname(path) for path in paths if path}, key=lambda folder: folder.split(os.sep))
+    leaves = []
+    for folder, following in zip(folders, folders[1:] + [""]):
+        if not following.startswith(os.path.join(folder, "")):
+            leaves.append(folder)
+    return leaves
+
+
+def _missing_directories(leaves: Sequence[str]) -> List[str]:
+    """
+    Folders makedirs will create for `leaves`, parents first.
+    """
+    missing = set()
+    for leaf in leaves:
+        folder = leaf
+        while folder and folder not in missing and not os.path.isdir(folder):
+            missing.add(folder)
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                break
+            folder = parent
+    return sorted(missing, key=lambda folder: (folder.count(os.sep), folder))
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def copy_file(src: str, dst: str):
+    """
+    Copy a file as cheaply as the platform allows: a reflink clone, then
+    copy_file_range inside the kernel, then a plain copy. Metadata is copied too.
+    """
+    with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+        if not _reflink(fsrc.fileno(), fdst.fileno()):
+            copied = False
+            if hasattr(os, "copy_file_range"):
+                try:
+                    size = os.fstat(fsrc.fileno()).st_size
+                    while size > 0:
+                        sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size)
+                        if sent == 0:
+                            break
+                        size -= sent
+                    copied = size == 0
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL):
+                        raise
+            if not copied:
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                shutil.copyfileobj(fsrc, fdst)
+    shutil.copystat(src, dst)
+
+
+def _apply(mode: str, src: str, dst: str) -> str:
+    """
+    Apply one operation and return what was actually done, for the journal.
+    """
+    if os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, "Destination exists", dst)
+    if mode == "move":
+        try:
+            os.rename(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            copy_file(src, dst)
+            os.unlink(src)
+        return "move"
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+    copy_file(src, dst)
+    return "copy"
+
+
+class Journal:
+    """
+    Append-only JSON lines record of file operations. Each operation is
+    written and synced to disk before it is applied, so a crashed or partial
+    run can still be rolled back.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, entries: Iterable[Dict[str, Any]]):
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        if not lines:
+            return
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def _is_under(path: str, folder: str) -> bool:
+    return path.startswith(os.path.join(folder, ""))
+
+
+def resolve_destination(path: str, destination_path: str) -> Optional[str]:
+    """
+    Absolute form of a planned destination, relative ones taken from
+    `destination_path`; None if it falls outside it or in its journal folder.
+    """
+    destination = os.path.abspath(destination_path)
+    resolved = os.path.abspath(os.path.join(destination, path))
+    if not _is_under(resolved, destination) or _is_under(resolved, os.path.join(destination, JOURNAL_DIR)):
+        return None
+    return resolved
+
+
+def plan_operations(
+    file_tree: Sequence[Dict[str, str]],
+    destination_path: str,
+    use_new_names: bool = False,
+    sources: Optional[Iterable[str]] = None,
+    source_path: Optional[str] = None,
+) -> Tuple[List[Tuple[str, str]], List[Dict[str, str]]]:
+    """
+    (source, destination) pairs of a file tree, using dst_path_new with `use_new_names`.
+
+    Entries are rejected when their destination is not under
+    `destination_path`, or when their source is not one of `sources` or not
+    under `source_path`, so a model-proposed path can never reach other files.
+
+    Returns:
+        Tuple[List[Tuple[str, str]], List[Dict[str, str]]]: The operations and the rejected entries.
+    """
+    key = "dst_path_new" if use_new_names else "dst_path"
+    allowed = {os.path.abspath(path) for path in sources} if sources is not None else None
+    source_root = os.path.abspath(source_path) if source_path else None
+    operations, rejected = [], []
+    for entry in file_tree:
+        src = entry.get("src_path")
+        dst = entry.get(key) or entry.get("dst_path")
+        if not src or not dst:
+            continue
+        src = os.path.abspath(src)
+        resolved = resolve_destination(dst, destination_path)
+        if resolved is None:
+            rejected.append({"src": src, "dst": dst, "error": "Destination is outside the destination folder"})
+        elif (allowed is not None and src not in allowed) or (source_root and not _is_under(src, source_root)):
+            rejected.append({"src": src, "dst": dst, "error": "Source is not one of the organized files"})
+        elif src != resolved:
+            operations.append((src, resolved))
+    return operations, rejected
+
+
+def _register_journal(journal_path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(JOURNAL_REGISTRY)), exist_ok=True)
+    with _registry_lock, open(JOURNAL_REGISTRY, "a", encoding="utf-8") as f:
+        f.write(os.path.abspath(journal_path) + "\n")
+
+
+def is_registered_journal(journal_path: str) -> bool:
+    """
+    Whether `journal_path` is a journal written by materialize in this installation.
+    """
+    target = os.path.abspath(journal_path)
+    try:
+        with open(JOURNAL_REGISTRY, encoding="utf-8") as f:
+            return any(line.rstrip("\n") == target for line in f)
+    except FileNotFoundError:
+        return False
+
+
+def materialize(
+    file_tree: Sequence[Dict[str, str]],
+    destination_path: str,
+    mode: str = "copy",
+    dry_run: bool = False,
+    use_new_names: bool = False,
+    workers: int = DEFAULT_MATERIALIZE_WORKERS,
+    sources: Optional[Iterable[str]] = None,
+    source_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Apply a file tree: create its folders once each, then move, hard link or
+    copy every file on a thread pool, journaling each step for rollback.
+
+    Existing destination files are never overwritten; those operations fail
+    and are reported, as do entries plan_operations rejects. Hard links and
+    moves across file systems fall back to copies.
+
+    Args:
+        file_tree (Sequence[Dict[str, str]]): src_path, dst_path and dst_path_new of each file.
+        destination_path (str): Destination folder; the journal is kept in it.
+        mode (str, optional): "move", "hardlink" or "copy". Defaults to "copy".
+        dry_run (bool, optional): Only report what would be done. Defaults to False.
+        use_new_names (bool, optional): Place files at dst_path_new instead of dst_path.
+        workers (int, optional): File operations run at once.
+        sources (Iterable[str], optional): The only files that may be placed.
+        source_path (str, optional): Folder every placed file must come from.
+
+    Returns:
+        Dict[str, Any]: Counts of folders and files handled, the failures and the journal path.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown materialization mode: {mode}")
+    operations, rejected = plan_operations(file_tree, destination_path, use_new_names, sources, source_path)
+    folders = _missing_directories(unique_directories(dst for _, dst in operations))
+    result: Dict[str, Any] = {
+        "mode": mode,
+        "dry_run": dry_run,
+        "directories": len(folders),
+        "files": len(operations),
+        "applied": {},
+        "failed": list(rejected),
+        "journal": None,
+    }
+    if dry_run:
+        result["operations"] = [{"op": mode, "src": src, "dst": dst} for src, dst in operations]
+        return result
+
+    journal_path = os.path.join(os.path.abspath(destination_path), JOURNAL_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl")
+    journal = Journal(journal_path)
+    _register_journal(journal_path)
+    result["journal"] = journal_path
+    try:
+        created = []
+        for folder in folders:
+            try:
+                os.mkdir(folder)
+                created.append({"op": "mkdir", "path": folder})
+            except FileExistsError:
+                pass
+        journal.write(created)
+
+        def run(chunk: Sequence[Tuple[str, str]]) -> Tuple[Dict[str, int], List[Dict[str, str]]]:
+            done, pending, failed = {}, [], []
+            for src, dst in chunk:
+                if os.path.lexists(dst):
+                    failed.append({"src": src, "dst": dst, "error": str(FileExistsError(errno.EEXIST, "Destination exists", dst))})
+                else:
+                    pending.append((src, dst))
+            # The whole chunk is journaled ahead of its first operation: one sync per chunk,
+            # and rollback checks which of them actually happened
+            journal.write({"op": mode, "src": src, "dst": dst} for src, dst in pending)
+            not_applied = []
+            for src, dst in pending:
+                try:
+                    op = _apply(mode, src, dst)
+                except OSError as e:
+                    failed.append({"src": src, "dst": dst, "error": str(e)})
+                    not_applied.append({"op": "failed", "src": src, "dst": dst})
+                    continue
+                done[op] = done.get(op, 0) + 1
+            journal.write(not_applied)
+            return done, failed
+
+        chunks = [operations[i:i + OPERATION_CHUNK] for i in range(0, len(operations), OPERATION_CHUNK)]
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="materialize") as pool:
+            for done, failed in pool.map(run, chunks):
+                for op, count in done.items():
+                    result["applied"][op] = result["applied"].get(op, 0) + count
+                result["failed"].extend(failed)
+    finally:
+        journal.close()
+    if result["failed"]:
+        logger.warning(f"{len(result['failed'])} of {len(operations) + len(rejected)} file operations failed")
+    return result
+
+
+def rollback(journal_path: str) -> Dict[str, Any]:
+    """
+    Undo a materialization from its journal, newest step first: moved files
+    go back, linked and copied files are removed and created folders are
+    removed if empty. Only journals written by materialize are accepted.
+
+    Operations are journaled before they are applied, so steps a crashed
+    run never reached, or that failed, are skipped by looking at the files.
+
+    Returns:
+        Dict[str, Any]: Counts of undone steps and the steps that could not be undone.
+    """
+    if not is_registered_journal(journal_path):
+        raise PermissionError(errno.EACCES, "Not a materialization journal", journal_path)
+    with open(journal_path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    not_applied = {entry["dst"] for entry in entries if entry["op"] == "failed"}
+    undone = 0
+    failed = []
+    for entry in reversed(entries):
+        if entry["op"] == "failed" or (entry["op"] != "mkdir" and (entry["dst"] in not_applied or not os.path.lexists(entry["dst"]))):
+            continue
+        try:
+            if entry["op"] == "mkdir":
+                os.rmdir(entry["path"])
+            elif entry["op"] == "move":
+                if os.path.lexists(entry["src"]):
+                    # Either the source was recreated or a cross-device move stopped before removing it; keep both
+                    raise FileExistsError(errno.EEXIST, "Source exists again", entry["src"])
+                os.makedirs(os.path.dirname(entry["src"]), exist_ok=True)
+                shutil.move(entry["dst"], entry["src"])
+            else:
+                os.unlink(entry["dst"])
+            undone += 1
+        except OSError as e:
+            failed.append({**entry, "error": str(e)})
+    if not failed:
+        os.replace(journal_path, f"{journal_path}.rolled-back")
+    return {"undone": undone, "failed": failed}
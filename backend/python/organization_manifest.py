@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Manifest file kept in the destination folder
+MANIFEST_NAME = ".nst_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def stat_files(paths: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    Size and mtime (ns) of each readable file.
+    """
+    stats = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats[os.path.abspath(path)] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+
+class OrganizationManifest:
+    """
+    What previous runs organized into a destination folder: for every source
+    file its size and mtime when it was summarized, its summary and where it
+    was placed.
+
+    Stored as JSON next to the organized files so an incremental run can tell
+    which source files are new or changed, and which folders already exist.
+    """
+    def __init__(self, destination_path: str, files: Dict[str, Dict[str, Any]] = None):
+        self.destination_path = os.path.abspath(destination_path)
+        self.path = os.path.join(self.destination_path, MANIFEST_NAME)
+        self.files: Dict[str, Dict[str, Any]] = files or {}
+
+    @classmethod
+    def load(cls, destination_path: str) -> "OrganizationManifest":
+        """
+        Read the manifest of `destination_path`; an empty one if there is none or it is unreadable.
+        """
+        manifest = cls(destination_path)
+        try:
+            with open(manifest.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                manifest.files = data.get("files", {})
+            else:
+                logger.warning(f"Ignoring manifest {manifest.path} with version {data.get('version')}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading manifest {manifest.path}: {e}")
+        return manifest
+
+    def save(self):
+        """
+        Write the manifest atomically.
+        """
+        os.makedirs(self.destination_path, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "saved_at": time.time(), "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def diff(self, source_path: str, stats: Dict[str, Tuple[int, int]]) -> Tuple[List[str], List[str]]:
+        """
+        Compare the current files of `source_path` with the manifest.
+
+        A source file that is gone but whose placed copy is still in the
+        destination, as after a move, stays organized.
+
+        Returns:
+            Tuple[List[str], List[str]]: Files that are new or changed, and
+            manifest entries under `source_path` whose file is gone from both places.
+        """
+        changed = [
+            path for path, (size, mtime_ns) in stats.items()
+            if path not in self.files
+            or self.files[path].get("size") != size
+            or self.files[path].get("mtime_ns") != mtime_ns
+        ]
+        prefix = os.path.join(os.path.abspath(source_path), "")
+        removed = [
+            path for path, entry in self.files.items()
+            if path.startswith(prefix) and path not in stats and not self._placed(entry)
+        ]
+        return changed, removed
+
+    @staticmethod
+    def _placed(entry: Dict[str, Any]) -> bool:
+        return any(entry.get(key) and os.path.exists(entry[key]) for key in ("dst_path", "dst_path_new"))
+
+    def folders(self) -> List[str]:
+        """
+        Destination folders in use, relative to the destination.
+        """
+        folders = set()
+        for entry in self.files.values():
+            dst_path = entry.get("dst_path")
+            if dst_path:
+                folder = os.path.relpath(os.path.dirname(dst_path), self.destination_path)
+                if folder != "." and not folder.startswith(".."):
+                    folders.add(folder)
+        return sorted(folders)
+
+    def update(self, concatenated: Iterable[Dict[str, Any]], stats: Dict[str, Tuple[int, int]]):
+        """
+        Record newly organized files from concatenate_summaries_and_file_tree output.
+        """
+        for item in concatenated:
+            path = os.path.abspath(item["file_path"])
+            size, mtime_ns = stats.get(path, (None, None))
+            self.files[path] = {
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "summary": item.get("summary"),
+                "dst_path": item.get("dst_path"),
+                "dst_path_new": item.get("dst_path_new"),
+            }
+
+    def remove(self, paths: Iterable[str]):
+        for path in paths:
+            self.files.pop(path, None)
+
+    def concatenated_data(self) -> List[Dict[str, Any]]:
+        """
+        All recorded files in the shape of concatenate_summaries_and_file_tree output.
+        """
+        return [
+            {
+                "file_path": path,
+                "summary": entry.get("summary"),
+                "dst_path": entry.get("dst_path"),
+                "dst_path_new": entry.get("dst_path_new"),
+            }
+            for path, entry in self.files.items()
+        ]
@@ -0,0 +1,153 @@
+import os
+import json
+import mmap
+import time
+import zlib
+import hashlib
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Folder of the cache index and blobs; override with the NST_PARSED_CACHE_DIR environment variable
+DEFAULT_CACHE_DIR = os.environ.get(
+    "NST_PARSED_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "nst", "parsed"),
+)
+# Total size of compressed blobs before the least recently used ones are evicted
+DEFAULT_MAX_BYTES = int(os.environ.get("NST_PARSED_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+COMPRESSION_LEVEL = 6
+# Bump when parsing changes so texts parsed the old way are not reused
+PARSER_VERSION = "2"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS parsed_last_used ON parsed (last_used);
+"""
+
+
+def file_key(file_path: str) -> Optional[str]:
+    """
+    Cache key of a file's parsed text: its path, size, mtime and inode, so
+    any change to the file misses the cache. None if the file cannot be read.
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    identity = f"{os.path.abspath(file_path)}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_ino}\0{PARSER_VERSION}"
+    return hashlib.sha256(identity.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class ParsedTextCache:
+    """
+    On-disk cache of parsed documents: one zlib-compressed JSON blob per file,
+    with an SQLite index for size-based LRU eviction. Blobs are memory-mapped
+    when read.
+
+    Safe to share between processes; blobs are written to a temporary name
+    and renamed into place, so a reader never sees a partial blob.
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(cache_dir, "index.sqlite3")
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", key[:2], f"{key}.json.z")
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        The cached documents of `key`, or None on a miss.
+        """
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    documents = json.loads(zlib.decompress(data))
+        except (OSError, ValueError, zlib.error):
+            return None
+        with self._write_lock, self._connect() as conn:
+            conn.execute("UPDATE parsed SET last_used = ? WHERE key = ?", (time.time(), key))
+        return documents
+
+    def put(self, key: str, documents: List[Dict[str, Any]]):
+        """
+        Store the documents parsed from one file, then evict least recently used blobs over the size limit.
+        """
+        raw = json.dumps(documents, ensure_ascii=False, default=str).encode("utf-8", "surrogatepass")
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed (key, size, raw_size, last_used) VALUES (?, ?, ?, ?)",
+                (key, len(data), len(raw), time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parsed").fetchone()
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM parsed ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append(key)
+            total -= size
+        conn.executemany("DELETE FROM parsed WHERE key = ?", [(key,) for key in doomed])
+        for key in doomed:
+            try:
+                os.unlink(self._blob_path(key))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Evicted {len(doomed)} parsed texts")
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            count, total, raw = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM parsed"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "raw_bytes": raw, "max_bytes": self.max_bytes}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_parsed_text_cache() -> ParsedTextCache:
+    """
+    Return the process-wide ParsedTextCache at DEFAULT_CACHE_DIR, opening it on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ParsedTextCache()
+        return _default_cache
@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Receives the progress events of the work running in the current context
+_reporter: ContextVar[Optional[Callable[[Dict[str, Any]], None]]] = ContextVar("progress_reporter", default=None)
+
+
+def report_progress(stage: str, **data: Any):
+    """
+    Send a progress event to the reporter of the current context, if any.
+
+    The reporter may raise to stop the work, e.g. when a job is cancelled, so
+    call this where an exception can unwind cleanly.
+    """
+    reporter = _reporter.get()
+    if reporter is not None:
+        reporter({"stage": stage, **data})
+
+
+@contextmanager
+def progress_reporter(callback: Callable[[Dict[str, Any]], None]) -> Iterator[None]:
+    """
+    Route report_progress calls made in this context, and in contexts copied from it, to `callback`.
+    """
+    token = _reporter.set(callback)
+    try:
+        yield
+    finally:
+        _reporter.reset(token)
@@ -0,0 +1,102 @@
+import os
+import gzip
+import json
+from typing import Dict, List, Any
+
+import msgpack
+import zstandard
+from fastapi import Response
+
+# Media types understood by /explorefolder
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.nst.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+def _accepted(header: str) -> List[str]:
+    """
+    Return the media types or codings of an Accept-style header, most preferred first.
+    """
+    items = []
+    for position, part in enumerate(header.split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        quality = 1.0
+        for field in fields[1:]:
+            if field.startswith("q="):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            items.append((-quality, position, fields[0].lower()))
+    return [value for _, _, value in sorted(items)]
+
+
+def negotiate_media_type(accept: str) -> str:
+    """
+    Pick the response format for an Accept header, defaulting to plain JSON.
+    """
+    for media_type in _accepted(accept or ""):
+        if media_type in (COLUMNAR_JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, JSON_MEDIA_TYPE):
+            return media_type
+        if media_type in ("application/x-msgpack", "application/vnd.msgpack"):
+            return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def columnar_from_listing(root: str, files: List[str], folders: List[str]) -> Dict[str, Any]:
+    """
+    Convert absolute file paths and relative folders into the columnar layout of scan_folder_columnar.
+    """
+    prefix_len = len(os.path.join(os.path.abspath(root), ""))
+    dirs = []
+    dir_index: Dict[str, int] = {}
+
+    def intern(rel_path: str) -> int:
+        index = dir_index.get(rel_path)
+        if index is None:
+            index = dir_index[rel_path] = len(dirs)
+            dirs.append(rel_path)
+        return index
+
+    file_dir = []
+    file_name = []
+    for path in files:
+        parent, name = os.path.split(path[prefix_len:])
+        file_dir.append(intern(parent))
+        file_name.append(name)
+    return {
+        "dirs": dirs,
+        "file_dir": file_dir,
+        "file_name": file_name,
+        "folders": [intern(folder) for folder in folders],
+    }
+
+
+def encode_response(payload: Dict[str, Any], media_type: str, accept_encoding: str = "") -> Response:
+    """
+    Serialize a payload directly, skipping response_model validation, and compress it
+    with zstd or gzip when the client accepts it.
+    """
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        for coding in _accepted(accept_encoding or ""):
+            if coding == "zstd":
+                body = zstandard.ZstdCompressor(level=3).compress(body)
+            elif coding == "gzip":
+                body = gzip.compress(body, compresslevel=5)
+            else:
+                continue
+            headers["Content-Encoding"] = coding
+            break
+    return Response(content=body, media_type=media_type, headers=headers)
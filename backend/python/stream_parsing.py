@@ -0,0 +1,148 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a JSON document arriving in chunks.
+
+    Yields every object of the first array stored under `key` (at any depth)
+    as soon as its closing brace arrives, without waiting for the rest of the
+    document. Each chunk is scanned once and only the pieces of the open
+    string and item are kept, so feeding n characters costs O(n).
+    """
+    def __init__(self, key: str = "files"):
+        self.key = key
+        self._chunks: List[str] = []
+        self._stack: List[str] = []     # open containers, "{" or "["
+        self._keys: List[Optional[str]] = []  # key awaiting a value in each open object
+        self._in_string = False
+        self._escape = False
+        self._string_parts: List[str] = []  # earlier chunks' text of the open string
+        self._last_string: Optional[str] = None
+        self._array_depth: Optional[int] = None  # stack depth inside the target array
+        self._item_parts: Optional[List[str]] = None  # earlier chunks' text of the open item
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        """
+        All the text fed so far.
+        """
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Add a chunk of text and return the array items it completed.
+        """
+        self._chunks.append(chunk)
+        items = []
+        # Where the open string and item start in this chunk; 0 if they began in an earlier one
+        string_start = 0
+        item_start = 0
+        for i, c in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._string_parts.append(chunk[string_start:i])
+                    self._last_string = "".join(self._string_parts)
+                    self._string_parts = []
+                continue
+            if c == '"':
+                self._in_string = True
+                string_start = i + 1
+            elif c == ":":
+                if self._stack and self._stack[-1] == "{":
+                    self._keys[-1] = self._last_string
+            elif c == ",":
+                if self._stack and self._stack[-1] == "{":
+                    self._keys[-1] = None
+            elif c in "{[":
+                in_target = self._array_depth is not None and len(self._stack) == self._array_depth
+                if (
+                    c == "["
+                    and not self._done
+                    and self._array_depth is None
+                    and self._stack
+                    and self._stack[-1] == "{"
+                    and self._keys[-1] == self.key
+                ):
+                    self._array_depth = len(self._stack) + 1
+                self._stack.append(c)
+                self._keys.append(None)
+                if in_target:
+                    self._item_parts = []
+                    item_start = i
+            elif c in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                self._keys.pop()
+                if self._array_depth is not None:
+                    if len(self._stack) == self._array_depth and self._item_parts is not None:
+                        self._item_parts.append(chunk[item_start:i + 1])
+                        try:
+                            items.append(json.loads("".join(self._item_parts)))
+                        except json.JSONDecodeError as e:
+                            logger.warning(f"Skipping malformed streamed item: {e}")
+                        self._item_parts = None
+                    elif len(self._stack) < self._array_depth:
+                        # The target array closed
+                        self._array_depth = None
+                        self._done = True
+        if self._in_string:
+            self._string_parts.append(chunk[string_start:])
+        if self._item_parts is not None:
+            self._item_parts.append(chunk[item_start:])
+        return items
+
+
+def iter_stream_text(response: Iterable[Any]) -> Iterable[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Yield (content delta, usage) pairs from a streamed litellm completion.
+    Usage is only reported by providers that send it, usually on the last chunk.
+    """
+    for chunk in response:
+        choices = getattr(chunk, "choices", None) or []
+        delta = getattr(choices[0], "delta", None) if choices else None
+        content = getattr(delta, "content", None) or ""
+        usage = getattr(chunk, "usage", None)
+        if usage is not None and not isinstance(usage, dict):
+            usage = usage.model_dump() if hasattr(usage, "model_dump") else dict(usage)
+        yield content, usage
+
+
+def consume_stream(
+    response: Iterable[Any],
+    key: str = "files",
+    on_item: Optional[Callable[[Any], None]] = None,
+) -> Tuple[str, List[Any], Optional[Dict[str, Any]]]:
+    """
+    Read a streamed completion to the end, calling `on_item` with each item of
+    the `key` array as soon as it is complete.
+
+    Returns:
+        Tuple[str, List[Any], Optional[Dict[str, Any]]]: The full content, the
+        items parsed on the way and the reported token usage.
+    """
+    parser = JSONArrayStreamParser(key)
+    items = []
+    usage = None
+    for content, chunk_usage in iter_stream_text(response):
+        if chunk_usage:
+            usage = chunk_usage
+        if content:
+            for item in parser.feed(content):
+                items.append(item)
+                if on_item is not None:
+                    on_item(item)
+    return parser.text, items, usage
@@ -0,0 +1,125 @@
+import os
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Location of the cache database; override with the NST_SUMMARY_CACHE_PATH environment variable
+DEFAULT_CACHE_PATH = os.environ.get(
+    "NST_SUMMARY_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "nst", "summary_cache.sqlite3"),
+)
+# Total size of cached summaries before the least recently used ones are evicted
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used);
+"""
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def summary_key(content_digest: str, model: str, prompt_version: str) -> str:
+    """
+    Cache key of one document's summary: its content hash, the model and the prompt version.
+    """
+    return hashlib.sha256(f"{content_digest}\0{model}\0{prompt_version}".encode()).hexdigest()
+
+
+class SummaryCache:
+    """
+    Persistent SQLite cache of document summaries with size-based LRU eviction.
+    """
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        """
+        Return the cached summaries for `keys`, marking them as recently used.
+        """
+        found = {}
+        with self._write_lock, self._connect() as conn:
+            for key in dict.fromkeys(keys):
+                row = conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE summaries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+
+    def put_many(self, entries: Iterable[Tuple[str, str]]):
+        """
+        Store (key, summary) pairs, then evict least recently used entries over the size limit.
+        """
+        now = time.time()
+        rows = [(key, summary, len(summary.encode("utf-8", "surrogatepass")), now) for key, summary in entries]
+        if not rows:
+            return
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM summaries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM summaries WHERE key = ?", doomed)
+        logger.info(f"Evicted {len(doomed)} cached summaries")
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """
+    Return the process-wide SummaryCache at DEFAULT_CACHE_PATH, opening it on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SummaryCache()
+        return _default_cache
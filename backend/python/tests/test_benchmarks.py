@@ -0,0 +1,89 @@
+import json
+import os
+
+import httpx
+import pytest
+
+from benchmarks import run
+from benchmarks.llm_stub import StubLLMServer
+from benchmarks.synthetic_tree import generate_tree, synthetic_documents
+
+
+@pytest.mark.parametrize("shape, depth", [("wide", 1), ("deep", 4), ("balanced", 4)])
+def test_generate_tree_shapes(tmp_path, shape, depth):
+    root = tmp_path / "tree"
+    info = generate_tree(str(root), files=230, shape=shape, files_per_folder=10, depth=4)
+    walked = list(os.walk(root))
+    assert sum(len(files) for _, _, files in walked) == 230
+    assert max(folder[len(str(root)):].count(os.sep) for folder, _, _ in walked) == depth
+    assert info["folders"] == 23
+    assert info["total_bytes"] == sum(os.path.getsize(os.path.join(folder, f)) for folder, _, files in walked for f in files)
+
+
+def test_generate_tree_is_reproducible_and_reused(tmp_path):
+    first = generate_tree(str(tmp_path / "a"), files=50, files_per_folder=10, seed=3)
+    second = generate_tree(str(tmp_path / "b"), files=50, files_per_folder=10, seed=3)
+    names = lambda root: sorted(os.path.relpath(os.path.join(d, f), root) for d, _, fs in os.walk(root) for f in fs)
+    assert names(tmp_path / "a") == names(tmp_path / "b")
+    assert first == second
+
+    marker = tmp_path / "a" / "marker"
+    marker.write_text("kept")
+    generate_tree(str(tmp_path / "a"), files=50, files_per_folder=10, seed=3)
+    assert marker.exists()
+    generate_tree(str(tmp_path / "a"), files=60, files_per_folder=10, seed=3)
+    assert not marker.exists()
+
+
+def test_stub_server_answers_like_openai():
+    docs = synthetic_documents(3)
+    prompt = json.dumps([{"file_path": d["file_path"], "content": d["content"]} for d in docs])
+    body = {"model": "stub", "messages": [{"role": "system", "content": "json"}, {"role": "user", "content": prompt}]}
+    with StubLLMServer(latency=0.01) as stub:
+        response = httpx.post(f"{stub.url}/chat/completions", json=body).json()
+        content = json.loads(response["choices"][0]["message"]["content"])
+        assert [f["file_path"] for f in content["files"]] == [d["file_path"] for d in docs]
+        assert response["usage"]["total_tokens"] > 0
+
+        with httpx.stream("POST", f"{stub.url}/chat/completions", json={**body, "stream": True, "stream_options": {"include_usage": True}}) as streamed:
+            events = [line[6:] for line in streamed.iter_lines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event) for event in events[:-1]]
+        assert json.loads("".join(c["choices"][0]["delta"].get("content", "") for c in chunks)) == content
+        assert chunks[-1]["usage"] == response["usage"]
+        assert stub.stats() == {"requests": 2, "peak_in_flight": 1}
+
+
+def test_llm_suite_writes_json(tmp_path, monkeypatch):
+    import dataorganization
+    import llm_scheduler
+
+    monkeypatch.setattr(llm_scheduler, "_scheduler", llm_scheduler.LLMScheduler(fallback_model=None))
+    monkeypatch.setattr(dataorganization, "get_summary_cache", lambda: None)
+    output = tmp_path / "results.json"
+    assert run.main(["--suite", "llm", "--documents", "12", "--latency", "0", "--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report["environment"]["cpu_count"] == os.cpu_count()
+    by_name = {entry["name"]: entry["metrics"] for entry in report["results"]}
+    assert by_name["llm/query_summaries"]["files"] == 12
+    assert by_name["llm/query_summaries"]["missing"] == 0
+    assert by_name["llm/create_file_tree/single"]["files"] == 12
+    assert by_name["llm/create_file_tree/single"]["requests"] == 1
+
+
+def test_explore_case_measures_latency_rss_and_payload(tmp_path):
+    root = tmp_path / "tree"
+    generate_tree(str(root), files=40, files_per_folder=10)
+    plain = run._explore_case(str(root), "json", False, False, 2)
+    gzipped = run._explore_case(str(root), "json", False, True, 2)
+    assert plain["latency_min"] <= plain["latency_median"] <= plain["latency_p95"]
+    assert plain["payload_bytes"] == plain["decoded_bytes"]
+    assert gzipped["payload_bytes"] < gzipped["decoded_bytes"] == plain["decoded_bytes"]
+    assert plain["peak_rss_bytes"] > 0
+
+
+def test_compare_flags_slowdowns_beyond_tolerance():
+    baseline = [{"name": "a", "metrics": {"wall_time": 1.0}}, {"name": "b", "metrics": {"latency_median": 0.1}}]
+    results = [{"name": "a", "metrics": {"wall_time": 1.1}}, {"name": "b", "metrics": {"latency_median": 0.2}}, {"name": "c", "metrics": {"wall_time": 9}}]
+    regressions = run.compare(results, baseline, tolerance=0.2)
+    assert [(r["name"], r["metric"]) for r in regressions] == [("b", "latency_median")]
@@ -0,0 +1,23 @@
+from checkpoints import CheckpointStore, fingerprint
+
+
+def test_fingerprint_is_stable_and_input_sensitive():
+    assert fingerprint("stage", {"b": 1, "a": [1, 2]}) == fingerprint("stage", {"a": [1, 2], "b": 1})
+    assert fingerprint("stage", [("/a", (1, 2))]) != fingerprint("stage", [("/a", (1, 3))])
+
+
+def test_put_get_and_expiry(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), max_age=100)
+    assert store.get("summaries", "k") is None
+    store.put("summaries", "k", {"files": [{"file_path": "/a", "summary": "s"}]})
+    assert store.get("summaries", "k") == {"files": [{"file_path": "/a", "summary": "s"}]}
+    assert store.get("file_tree", "k") is None
+    assert store.stats()["entries"] == 1
+
+    import checkpoints
+
+    now = checkpoints.time.time()
+    monkeypatch.setattr(checkpoints.time, "time", lambda: now + 101)
+    assert store.get("summaries", "k") is None
+    store.put("file_tree", "k", [])
+    assert store.stats()["entries"] == 1
@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from progress import report_progress
+
+
+@pytest.fixture
+def client(monkeypatch):
+    release = threading.Event()
+
+    def fake_run(**params):
+        report_progress("summarizing", documents=1, total=2)
+        release.wait(5)
+        report_progress("organizing", files=2)
+        return {"concatenated_data": [{"file_path": params["source_directory"]}]}
+
+    monkeypatch.setattr(main, "run_data_organization", fake_run)
+    monkeypatch.setattr(main, "job_manager", main.JobManager(max_workers=1))
+    with TestClient(main.app) as test_client:
+        test_client.release = release
+        yield test_client
+
+
+def submit(client, tmp_path):
+    response = client.post("/dataorg/jobs", json={
+        "source_directory": str(tmp_path),
+        "destination_directory": str(tmp_path / "out"),
+        "summary_model": "m",
+        "tree_model": "m",
+    })
+    assert response.status_code == 202
+    return response.json()["job_id"]
+
+
+def test_submit_poll_events_and_result(client, tmp_path):
+    job_id = submit(client, tmp_path)
+    assert client.get(f"/dataorg/jobs/{job_id}/result").status_code == 409
+    client.release.set()
+
+    with client.stream("GET", f"/dataorg/jobs/{job_id}/events") as response:
+        events = [json.loads(line[6:]) for line in response.iter_lines() if line.startswith("data: ")]
+    assert [e.get("status") or e.get("stage") for e in events] == ["queued", "running", "summarizing", "organizing", "succeeded"]
+
+    assert client.get(f"/dataorg/jobs/{job_id}").json()["status"] == "succeeded"
+    assert client.get(f"/dataorg/jobs/{job_id}/result").json() == {"concatenated_data": [{"file_path": str(tmp_path)}]}
+    assert [job["job_id"] for job in client.get("/dataorg/jobs").json()] == [job_id]
+
+
+def test_cancel_and_unknown_jobs(client, tmp_path):
+    running = submit(client, tmp_path)
+    queued = submit(client, tmp_path)
+    assert client.delete(f"/dataorg/jobs/{queued}").json()["status"] == "cancelled"
+    client.delete(f"/dataorg/jobs/{running}")
+    client.release.set()
+    main.job_manager.get(running).future.result(timeout=5)
+    assert client.get(f"/dataorg/jobs/{running}").json()["status"] == "cancelled"
+    assert client.get("/dataorg/jobs/nope").status_code == 404
+    assert client.post("/dataorg/jobs", json={
+        "source_directory": str(tmp_path / "missing"), "destination_directory": "x", "summary_model": "m", "tree_model": "m",
+    }).status_code == 404
+
+
+def test_job_usage(client, tmp_path, monkeypatch):
+    from usage_accounting import record_completion
+
+    def fake_run(**params):
+        record_completion("ollama/test", {"prompt_tokens": 7, "completion_tokens": 3}, 0.1, stage="summarizing")
+        return {}
+
+    monkeypatch.setattr(main, "run_data_organization", fake_run)
+    job_id = submit(client, tmp_path)
+    main.job_manager.get(job_id).future.result(timeout=5)
+    usage = client.get(f"/dataorg/jobs/{job_id}/usage").json()
+    assert usage["totals"]["total_tokens"] == 10
+    assert usage["by_stage"]["summarizing"]["calls"] == 1
+    assert client.get("/usage", params={"job_id": job_id}).json()["totals"]["calls"] == 1
+
+
+def test_planner_options_reach_the_workflow(client, tmp_path, monkeypatch):
+    received = {}
+    monkeypatch.setattr(main, "run_data_organization", lambda **params: received.update(params) or {})
+    response = client.post("/dataorg/jobs", json={
+        "source_directory": str(tmp_path), "destination_directory": str(tmp_path / "out"),
+        "summary_model": "m", "tree_model": "m", "planner": "embedding", "embedder": "ollama/nomic-embed-text",
+    })
+    main.job_manager.get(response.json()["job_id"]).future.result(timeout=5)
+    assert received["planner"] == "embedding" and received["embedder"] == "ollama/nomic-embed-text"
+    assert client.post("/dataorg/jobs", json={
+        "source_directory": str(tmp_path), "destination_directory": "x", "summary_model": "m", "tree_model": "m", "planner": "bogus",
+    }).status_code == 422
+
+
+def test_rollback_rejects_foreign_journals(client, tmp_path, monkeypatch):
+    import materialization
+
+    monkeypatch.setattr(materialization, "JOURNAL_REGISTRY", str(tmp_path / "journals.txt"))
+    forged = tmp_path / "forged.jsonl"
+    forged.write_text("")
+    assert client.post("/dataorg/rollback", json={"journal": str(forged)}).status_code == 403
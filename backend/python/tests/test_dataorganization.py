@@ -0,0 +1,348 @@
+import json
+import os
+import re
+import threading
+
+from types import SimpleNamespace
+
+import pytest
+
+import dataorganization
+import llm_scheduler
+import materialization
+from checkpoints import CheckpointStore
+from summary_cache import SummaryCache
+
+
+@pytest.fixture(autouse=True)
+def summary_cache(tmp_path, monkeypatch):
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite3"))
+    monkeypatch.setattr(dataorganization, "get_summary_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_store(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(dataorganization, "get_checkpoint_store", lambda: store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def journal_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(materialization, "JOURNAL_REGISTRY", str(tmp_path / "journals.txt"))
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    scheduler = llm_scheduler.LLMScheduler(fallback_model=None, sleep=lambda seconds: None)
+    monkeypatch.setattr(llm_scheduler, "_scheduler", scheduler)
+    return scheduler
+
+
+class FakeResponse:
+    def __init__(self, content, prompt_tokens=10, completion_tokens=5):
+        self._dict = {
+            "choices": [{"message": {"content": content}}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def to_dict(self):
+        return self._dict
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    Replace litellm's completion with a fake that summarizes every file path in the prompt.
+    """
+    calls = []
+    lock = threading.Lock()
+
+    def completion(model, messages, **kwargs):
+        if "Propose one folder name" in messages[-1]["content"]:
+            files = json.loads(messages[-1]["content"].split("Files: ", 1)[1])
+            with lock:
+                calls.append({"model": model, "paths": [f["file_name"] for f in files], "kwargs": kwargs})
+            return FakeResponse(json.dumps({"folder": files[0]["summary"].split()[0] + " files"}))
+        if "dst_path" in messages[0]["content"]:
+            # File tree planning: file everything under a folder named after its first summary word
+            items = json.loads(messages[-1]["content"])
+            dst = re.search(r"destination directory is '([^']+)'", messages[0]["content"]).group(1)
+            with lock:
+                calls.append({"model": model, "paths": [i["file_path"] for i in items], "kwargs": kwargs})
+            files = [
+                {
+                    "src_path": i["file_path"],
+                    "dst_path": f"{dst}/{i['summary'].split()[0]}/{i['file_path'].rsplit('/', 1)[1]}",
+                    "dst_path_new": f"{dst}/{i['summary'].split()[0]}/new_{i['file_path'].rsplit('/', 1)[1]}",
+                }
+                for i in items
+            ]
+            return FakeResponse(json.dumps({"files": files}))
+        prompt = messages[-1]["content"]
+        paths = re.findall(r'"file_path": "(/[^"]+)"', prompt)
+        with lock:
+            calls.append({"model": model, "paths": paths, "prompt": prompt, "kwargs": kwargs})
+        files = [{"file_path": p, "summary": f"summary of {p}"} for p in paths]
+        return FakeResponse(json.dumps({"files": files}))
+
+    monkeypatch.setattr(dataorganization, "completion", completion)
+    return calls
+
+
+def make_docs(n, size=50):
+    return [{"content": "word " * size, "file_path": f"/src/f{i}.txt", "file_name": f"f{i}.txt"} for i in range(n)]
+
+
+def test_query_summaries_batches_and_merges(fake_llm):
+    docs = make_docs(25)
+    result = dataorganization.query_summaries.fn(
+        docs, "localhost", 11434, "ollama/test", batch_tokens=400, batch_files=4, max_concurrency=3
+    )
+    assert len(fake_llm) > 1
+    assert all(len(call["paths"]) <= 4 for call in fake_llm)
+    assert sorted(f["file_path"] for f in result["files"]) == sorted(d["file_path"] for d in docs)
+    assert result["usage"]["total_tokens"] == 15 * len(fake_llm)
+
+
+def test_query_summaries_survives_a_failed_batch(fake_llm, monkeypatch):
+    good = dataorganization.completion
+
+    def flaky(model, messages, **kwargs):
+        if "/src/f0.txt" in messages[-1]["content"]:
+            raise RuntimeError("boom")
+        return good(model, messages, **kwargs)
+
+    monkeypatch.setattr(dataorganization, "completion", flaky)
+    result = dataorganization.query_summaries.fn(
+        make_docs(6), "localhost", 11434, "ollama/test", batch_files=2, max_concurrency=2
+    )
+    assert sorted(f["file_path"] for f in result["files"]) == [f"/src/f{i}.txt" for i in range(2, 6)]
+
+
+def test_query_summaries_only_sends_cache_misses(fake_llm):
+    docs = make_docs(6)
+    first = dataorganization.query_summaries.fn(docs, "localhost", 11434, "ollama/test")
+    assert len(first["files"]) == 6
+
+    docs[2] = dict(docs[2], content="changed")
+    fake_llm.clear()
+    second = dataorganization.query_summaries.fn(docs, "localhost", 11434, "ollama/test")
+    assert [call["paths"] for call in fake_llm] == [["/src/f2.txt"]]
+    assert sorted(f["file_path"] for f in second["files"]) == sorted(d["file_path"] for d in docs)
+
+    fake_llm.clear()
+    dataorganization.query_summaries.fn(docs, "localhost", 11434, "ollama/other")
+    assert len(fake_llm) == 1 and len(fake_llm[0]["paths"]) == 6
+
+
+def test_query_summaries_sends_excerpts_only(fake_llm):
+    doc = {"content": "lorem ipsum " * 20000, "file_path": "/src/big.txt", "creation_date": "2024-01-01"}
+    dataorganization.query_summaries.fn([doc], "localhost", 11434, "ollama/test", excerpt_tokens=300)
+    (call,) = fake_llm
+    assert call["paths"] == ["/src/big.txt"]
+    assert len(call["prompt"]) < 5000
+    assert "creation_date" not in call["prompt"] and "content_hash" not in call["prompt"]
+
+
+@pytest.mark.parametrize("planner", ["single", "map_reduce"])
+def test_create_file_tree_planners(fake_llm, planner):
+    summaries = [{"file_path": f"/src/r{i}.txt", "summary": f"{'report' if i % 2 else 'Report'} number {i}"} for i in range(9)]
+    tree = dataorganization.create_file_tree.fn(
+        summaries, "localhost", 11434, "/src", "/dst", model="ollama/test", planner=planner, cluster_size=4
+    )
+    assert sorted(e["src_path"] for e in tree) == sorted(s["file_path"] for s in summaries)
+    if planner == "map_reduce":
+        assert len(fake_llm) > 1 and all(len(call["paths"]) <= 4 for call in fake_llm)
+        # Folder spellings from different clusters are reconciled
+        assert {e["dst_path"].rsplit("/", 1)[0] for e in tree} in ({"/dst/report"}, {"/dst/Report"})
+    else:
+        assert len(fake_llm) == 1
+
+
+def test_single_planner_output_is_reconciled(fake_llm, monkeypatch):
+    summaries = [{"file_path": f"/src/r{i}.txt", "summary": f"report {i}"} for i in range(3)]
+
+    def completion(model, messages, **kwargs):
+        files = [
+            {"src_path": "/src/r0.txt", "dst_path": "/etc/r0.txt"},
+            {"src_path": "/home/user/.ssh/id_rsa", "dst_path": "/dst/keys/id_rsa"},
+            {"src_path": "/src/r1.txt", "dst_path": "reports/r1.txt"},
+        ]
+        return FakeResponse(json.dumps({"files": files}))
+
+    monkeypatch.setattr(dataorganization, "completion", completion)
+    tree = dataorganization.create_file_tree.fn(summaries, "localhost", 11434, "/src", "/dst", model="ollama/test", planner="single")
+    by_src = {e["src_path"]: e["dst_path"] for e in tree}
+    assert sorted(by_src) == ["/src/r0.txt", "/src/r1.txt", "/src/r2.txt"]
+    assert by_src["/src/r0.txt"] == "/dst/r0.txt"
+    assert by_src["/src/r1.txt"] == "/dst/reports/r1.txt"
+    assert all(dst.startswith("/dst/") for dst in by_src.values())
+
+
+def test_create_file_tree_embedding_planner_only_names_clusters(fake_llm):
+    summaries = [{"file_path": f"/src/inv{i}.txt", "summary": "invoice payment vendor billing"} for i in range(5)]
+    summaries += [{"file_path": f"/src/pic{i}.jpg", "summary": "beach holiday sunset photo"} for i in range(5)]
+    tree = dataorganization.create_file_tree.fn(
+        summaries, "localhost", 11434, "/src", "/dst", model="ollama/test", planner="embedding", cluster_size=5
+    )
+    assert len(fake_llm) == 2
+    by_src = {e["src_path"]: e for e in tree}
+    assert by_src["/src/inv3.txt"]["dst_path"] == "/dst/invoice_files/inv3.txt"
+    assert by_src["/src/pic0.jpg"]["dst_path"] == "/dst/beach_files/pic0.jpg"
+    assert by_src["/src/pic0.jpg"]["dst_path_new"] == by_src["/src/pic0.jpg"]["dst_path"]
+
+
+def test_query_summaries_streams_entries(fake_llm, monkeypatch):
+    buffered = dataorganization.completion
+
+    def streaming(model, messages, stream=False, **kwargs):
+        content = buffered(model, messages, **kwargs).to_dict()["choices"][0]["message"]["content"]
+        assert stream
+        return iter(
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + 3]))], usage=None)
+            for i in range(0, len(content), 3)
+        )
+
+    monkeypatch.setattr(dataorganization, "completion", streaming)
+    seen = []
+    result = dataorganization.query_summaries.fn(
+        make_docs(3), "localhost", 11434, "ollama/test", stream=True, on_summary=seen.append
+    )
+    assert [f["file_path"] for f in result["files"]] == [f"/src/f{i}.txt" for i in range(3)]
+    assert seen == result["files"]
+
+
+def test_workflow_concurrent_mode_pipelines_summaries(fake_llm, tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(45):
+        (src / f"f{i}.txt").write_text(f"document number {i}")
+    (src / "copy_of_f0.txt").write_text("document number 0")
+    words = [f"word{i}" for i in range(80)]
+    (src / "long_v1.txt").write_text(" ".join(words))
+    (src / "long_v2.txt").write_text(" ".join(words[:-1] + ["changed"]))
+    result = dataorganization.document_processing_workflow(
+        str(src), str(tmp_path / "dst"), "localhost", 1, "ollama/test", "ollama/test", concurrent=True,
+        materialize_mode="copy"
+    )
+    summary_calls = [call for call in fake_llm if call["paths"] and call["paths"][0].endswith(".txt") and "prompt" in call]
+    # One summarization run per loaded chunk, duplicates left out
+    assert len(summary_calls) == 3
+    assert sum(len(call["paths"]) for call in summary_calls) == 46
+    assert len(result["summaries"]["files"]) == 48
+    assert result["summaries"]["duplicates"] == {str(src / "copy_of_f0.txt"): [str(src / "f0.txt")], str(src / "long_v1.txt"): [str(src / "long_v2.txt")]}
+    assert sorted(e["file_path"] for e in result["concatenated_data"]) == sorted(str(p) for p in src.iterdir())
+    assert all(e["summary"] != "No summary available." for e in result["concatenated_data"])
+    assert result["materialization"]["applied"] == {"copy": 48}
+    assert all(os.path.isfile(e["dst_path"]) for e in result["concatenated_data"])
+
+
+def test_workflow_uses_the_requested_planner(fake_llm, tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(4):
+        (src / f"f{i}.txt").write_text(f"document number {i}")
+    result = dataorganization.document_processing_workflow(
+        str(src), str(tmp_path / "dst"), "localhost", 1, "ollama/test", "ollama/test", planner="embedding", embedder="hashing"
+    )
+    # The embedding planner only asks the model to name clusters, by file name
+    tree_calls = [call for call in fake_llm if "prompt" not in call]
+    assert tree_calls and all(not path.startswith("/") for call in tree_calls for path in call["paths"])
+    assert len(result["file_tree"]) == 4
+
+
+def test_usage_is_recorded_per_stage(fake_llm, tmp_path, monkeypatch):
+    import usage_accounting
+
+    ledger = usage_accounting.UsageLedger()
+    monkeypatch.setattr(usage_accounting, "_ledger", ledger)
+    docs = make_docs(6)
+    with usage_accounting.usage_scope(job_id="job") as usage:
+        result = dataorganization.query_summaries.fn(docs, "localhost", 11434, "gpt-4o-mini", batch_files=2)
+        dataorganization.create_file_tree.fn(result["files"], "localhost", 11434, "/src", str(tmp_path), model="gpt-4o-mini")
+    summary = ledger.summary(job_id="job")
+    assert summary["by_stage"]["summarizing"]["calls"] == 3
+    assert summary["by_stage"]["planning"]["calls"] == 1
+    assert usage.totals()["total_tokens"] == 15 * 4
+    assert result["cost"] == summary["by_stage"]["summarizing"]["cost"] > 0
+
+
+def test_transient_failures_are_retried_and_planning_falls_back(fake_llm, monkeypatch, tmp_path):
+    import litellm
+
+    completion = dataorganization.completion
+    failures = {"summary": 2}
+
+    def flaky(model, messages, **kwargs):
+        if model == "tree-model":
+            raise litellm.ServiceUnavailableError(message="down", llm_provider="openai", model=model)
+        if "dst_path" not in messages[0]["content"] and failures["summary"]:
+            failures["summary"] -= 1
+            raise litellm.Timeout(message="timed out", llm_provider="openai", model=model)
+        return completion(model, messages, **kwargs)
+
+    monkeypatch.setattr(dataorganization, "completion", flaky)
+    docs = make_docs(3)
+    result = dataorganization.query_summaries.fn(docs, "localhost", 11434, "summary-model")
+    assert len(result["files"]) == 3
+    tree = dataorganization.create_file_tree.fn(
+        result["files"], "localhost", 11434, "/src", str(tmp_path), model="tree-model", fallback_models=["summary-model"]
+    )
+    assert len(tree) == 3
+    assert fake_llm[-1]["model"] == "summary-model"
+
+
+def test_completed_batches_survive_a_failed_run(fake_llm, monkeypatch):
+    completion = dataorganization.completion
+
+    def failing_on_f5(model, messages, **kwargs):
+        if "/src/f5.txt" in messages[-1]["content"]:
+            raise ValueError("bad request")
+        return completion(model, messages, **kwargs)
+
+    monkeypatch.setattr(dataorganization, "completion", failing_on_f5)
+    docs = [dict(doc, content=f"document {i} " * 20) for i, doc in enumerate(make_docs(8))]
+    first = dataorganization.query_summaries.fn(docs, "localhost", 11434, "ollama/test", batch_files=2, max_concurrency=1)
+    assert first["missing"] == 2
+
+    monkeypatch.setattr(dataorganization, "completion", completion)
+    fake_llm.clear()
+    second = dataorganization.query_summaries.fn(docs, "localhost", 11434, "ollama/test", batch_files=2)
+    assert second["missing"] == 0
+    # Only the batch that failed is sent again
+    assert [call["paths"] for call in fake_llm] == [["/src/f4.txt", "/src/f5.txt"]]
+
+
+def test_workflow_resumes_from_stage_checkpoints(fake_llm, monkeypatch, tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(5):
+        (src / f"f{i}.txt").write_text(f"document number {i}")
+    completion = dataorganization.completion
+
+    def failing_tree(model, messages, **kwargs):
+        if "dst_path" in messages[0]["content"]:
+            raise ValueError("planning failed")
+        return completion(model, messages, **kwargs)
+
+    monkeypatch.setattr(dataorganization, "completion", failing_tree)
+    args = (str(src), str(tmp_path / "dst"), "localhost", 1, "ollama/test", "ollama/test")
+    first = dataorganization.document_processing_workflow(*args)
+    assert first["file_tree"] == [] and len(first["summaries"]["files"]) == 5
+
+    monkeypatch.setattr(dataorganization, "completion", completion)
+    fake_llm.clear()
+    second = dataorganization.document_processing_workflow(*args)
+    # Summaries come from the checkpoint; only planning reaches the model
+    assert [len(call["paths"]) for call in fake_llm] == [5]
+    assert len(second["file_tree"]) == 5
+
+    fake_llm.clear()
+    third = dataorganization.document_processing_workflow(*args)
+    assert fake_llm == [] and third["file_tree"] == second["file_tree"]
@@ -0,0 +1,88 @@
+import random
+
+from deduplication import (
+    NearDuplicateIndex,
+    fan_out_summaries,
+    find_duplicate_files,
+    find_near_duplicates,
+    merge_groups,
+    simhash,
+)
+
+
+def test_exact_duplicates_by_size_partial_and_full_hash(tmp_path):
+    files = {
+        "a.txt": b"same content",
+        "b.txt": b"same content",
+        "c.txt": b"other conten",  # same size, different bytes
+        "big1.bin": b"x" * 100 + b"1",
+        "big2.bin": b"x" * 100 + b"2",  # same size and same first bytes
+        "big3.bin": b"x" * 100 + b"1",
+    }
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    paths = [str(tmp_path / name) for name in files] + [str(tmp_path / "missing.txt")]
+    duplicates = find_duplicate_files(paths, partial_bytes=16)
+    assert duplicates == {
+        str(tmp_path / "a.txt"): [str(tmp_path / "b.txt")],
+        str(tmp_path / "big1.bin"): [str(tmp_path / "big3.bin")],
+    }
+
+
+def test_simhash_near_duplicates():
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(500)]
+    base = [rng.choice(vocabulary) for _ in range(300)]
+    edited = list(base)
+    edited[150] = "edited"
+    unrelated = [rng.choice(vocabulary) for _ in range(300)]
+    assert simhash("too short") is None
+    assert bin(simhash(" ".join(base)) ^ simhash(" ".join(edited))).count("1") <= 6
+
+    docs = [
+        {"file_path": "/a", "content": " ".join(base)},
+        {"file_path": "/b", "excerpt": " ".join(edited), "content": ""},
+        {"file_path": "/c", "content": " ".join(unrelated)},
+        {"file_path": "/d", "content": "short"},
+        {"file_path": "/e", "content": "short"},
+    ]
+    assert find_near_duplicates(docs) == {"/a": ["/b"]}
+
+    index = NearDuplicateIndex()
+    assert index.add("/a", " ".join(base)) is None
+    assert index.add("/b", " ".join(edited)) == "/a"
+
+
+def test_merge_and_fan_out():
+    groups = merge_groups({"/a": ["/b"]}, {"/b": ["/c"], "/x": ["/y"]})
+    assert {key: sorted(value) for key, value in groups.items()} == {"/a": ["/b", "/c"], "/x": ["/y"]}
+    files = [{"file_path": "/a", "summary": "A"}, {"file_path": "/x", "summary": "X"}]
+    fanned = fan_out_summaries(files, groups)
+    assert fanned[:2] == files
+    assert {(f["file_path"], f["summary"], f["duplicate_of"]) for f in fanned[2:]} == {("/b", "A", "/a"), ("/c", "A", "/a"), ("/y", "X", "/x")}
+
+
+def test_simhash_covers_every_page_of_long_texts():
+    import excerpting
+    from document_loading import join_pages
+
+    rng = random.Random(1)
+    vocabulary = [f"w{i}" for i in range(2000)]
+    cover = " ".join(rng.choice(vocabulary) for _ in range(200))
+    report_a = join_pages([{"content": cover, "page_label": "1", "file_path": "/a.pdf"}] + [
+        {"content": " ".join(rng.choice(vocabulary) for _ in range(3000)), "page_label": str(i)} for i in range(2, 12)
+    ])
+    report_b = join_pages([{"content": cover, "page_label": "1", "file_path": "/b.pdf"}] + [
+        {"content": " ".join(rng.choice(vocabulary) for _ in range(3000)), "page_label": str(i)} for i in range(2, 12)
+    ])
+    assert report_a[0]["pages"] == 11 and "page_label" not in report_a[0]
+
+    docs = [excerpting.prepare_document(doc, fingerprint=True) for doc in report_a + report_b]
+    assert "simhash" not in excerpting.prompt_fields(docs[0])
+    assert find_near_duplicates(docs) == {}
+
+    # A small edit to a long text is still found, although only a sample of its shingles is hashed
+    words = report_a[0]["content"].split()
+    words[len(words) // 2] = "edited"
+    edited = excerpting.prepare_document({"file_path": "/c.pdf", "content": " ".join(words)}, fingerprint=True)
+    assert find_near_duplicates([docs[0], edited]) == {"/a.pdf": ["/c.pdf"]}
@@ -0,0 +1,58 @@
+import pytest
+
+from document_loading import iter_documents, list_document_files
+
+
+@pytest.fixture
+def docs_dir(tmp_path):
+    for i in range(7):
+        (tmp_path / f"doc{i}.txt").write_text(f"contents of document {i}")
+    (tmp_path / "notes.md").write_text("# Notes\n\nsome notes")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "deep.txt").write_text("deep")
+    return tmp_path
+
+
+def test_lists_without_parsing(docs_dir):
+    assert len(list_document_files(str(docs_dir))) == 8
+    assert len(list_document_files(str(docs_dir), recursive=True)) == 9
+
+
+def test_empty_folder_yields_nothing(tmp_path):
+    assert list(iter_documents(str(tmp_path))) == []
+
+
+def test_iter_documents_inline(docs_dir):
+    docs = list(iter_documents(str(docs_dir), workers=1))
+    paths = [d["file_path"] for d in docs]
+    assert paths == sorted(paths, key=paths.index)  # file order
+    assert {p.rsplit("/", 1)[1] for p in paths} == {f"doc{i}.txt" for i in range(7)} | {"notes.md"}
+    doc0 = next(d for d in docs if d["file_name"] == "doc0.txt")
+    assert doc0["content"] == "contents of document 0"
+
+
+def test_iter_documents_in_processes_matches_inline(docs_dir):
+    inline = list(iter_documents(str(docs_dir), workers=1))
+    pooled = list(iter_documents(str(docs_dir), workers=2, process_extensions={".txt"}))
+    assert [(d["file_path"], d["content"]) for d in pooled] == [(d["file_path"], d["content"]) for d in inline]
+
+
+def test_pages_are_joined_into_one_document(monkeypatch, tmp_path):
+    import document_loading
+
+    class Page:
+        def __init__(self, number):
+            self.text = f"page {number} text"
+            self.metadata = {"file_path": str(tmp_path / "a.pdf"), "file_name": "a.pdf", "page_label": str(number)}
+
+    class Reader:
+        def __init__(self, input_files):
+            pass
+
+        def load_data(self):
+            return [Page(1), Page(2)]
+
+    monkeypatch.setattr(document_loading, "SimpleDirectoryReader", Reader)
+    (doc,) = document_loading.load_file(str(tmp_path / "a.pdf"), use_cache=False)
+    assert doc["content"] == "page 1 text\n\npage 2 text"
+    assert doc["pages"] == 2 and "page_label" not in doc
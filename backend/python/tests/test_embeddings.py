@@ -0,0 +1,27 @@
+import numpy as np
+
+from embeddings import HashingEmbedder, cluster_texts, get_embedder, kmeans
+
+
+def test_hashing_embedder_is_normalized_and_similarity_aware():
+    vectors = HashingEmbedder().embed(["invoice payment vendor", "vendor invoice payment due", "beach holiday photo", ""])
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_kmeans_separates_blobs():
+    rng = np.random.default_rng(1)
+    a = rng.normal([5, 0, 0], 0.1, size=(20, 3))
+    b = rng.normal([0, 5, 0], 0.1, size=(20, 3))
+    vectors = np.vstack([a, b])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = kmeans(vectors, 2)
+    assert len(set(labels[:20])) == 1 and len(set(labels[20:])) == 1
+    assert labels[0] != labels[20]
+
+
+def test_cluster_texts_groups_topics():
+    texts = [f"invoice payment vendor billing {i}" for i in range(6)] + [f"beach holiday sunset photo {i}" for i in range(6)]
+    groups = cluster_texts(texts, get_embedder("hashing"), cluster_size=6)
+    assert sorted(sorted(g) for g in groups) == [list(range(6)), list(range(6, 12))]
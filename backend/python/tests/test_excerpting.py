@@ -0,0 +1,41 @@
+from excerpting import build_excerpt, detect_headings, prepare_document, prompt_fields
+from llm_batching import count_tokens
+
+
+LONG_TEXT = "\n".join(
+    ["# Quarterly report", "intro " * 50, "## Revenue", "numbers " * 2000, "SUMMARY OF FINDINGS", "closing words " * 50, "THE END"]
+)
+
+
+def test_short_text_is_kept_whole():
+    assert build_excerpt("a short note", 100) == "a short note"
+
+
+def test_detect_headings():
+    text = "Title\n=====\nbody\n# Intro\n1.2 Methods used\nplain sentence here.\nRESULTS\ndef main():\n"
+    assert detect_headings(text) == ["Title", "# Intro", "1.2 Methods used", "RESULTS", "def main():"]
+
+
+def test_long_text_is_capped_with_head_tail_and_headings():
+    excerpt = build_excerpt(LONG_TEXT, 200)
+    assert count_tokens(excerpt) <= 200
+    assert excerpt.startswith("Headings: # Quarterly report; ## Revenue; SUMMARY OF FINDINGS; THE END")
+    assert "intro intro" in excerpt
+    assert excerpt.rstrip().endswith("THE END")
+    assert "[...]" in excerpt
+
+
+def test_prepare_document_drops_unneeded_metadata():
+    doc = {
+        "content": LONG_TEXT,
+        "file_path": "/src/report.md",
+        "file_name": "report.md",
+        "file_type": "text/markdown",
+        "file_size": 123,
+        "creation_date": "2024-01-01",
+        "last_accessed_date": "2024-01-02",
+    }
+    prepared = prepare_document(doc, 100)
+    assert set(prepared) == {"file_path", "file_name", "file_type", "file_size", "excerpt", "content_hash"}
+    assert prepare_document(prepared, 100) is prepared
+    assert "content_hash" not in prompt_fields(prepared)
@@ -0,0 +1,70 @@
+import os
+import json
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from response_encoding import COLUMNAR_JSON_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in ["a/b", "c"]:
+        (tmp_path / d).mkdir(parents=True)
+    for f in ["top.txt", "a/one.pdf", "a/b/two.md", "c/three.md", "c/four"]:
+        (tmp_path / f).write_text("x")
+    return tmp_path
+
+
+def test_stream_yields_ndjson_batches_and_summary(client, tree):
+    response = client.post("/explorefolder/stream", json={"folder": str(tree), "batch_size": 2})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    batches, summary = records[:-1], records[-1]
+    assert all(record["type"] == "batch" and len(record["files"]) + len(record["folders"]) <= 2 for record in batches)
+    assert sorted(f for b in batches for f in b["files"]) == sorted(
+        str(tree / f) for f in ["top.txt", "a/one.pdf", "a/b/two.md", "c/three.md", "c/four"]
+    )
+    assert sorted(f for b in batches for f in b["folders"]) == ["a", "a/b", "c"]
+    assert summary["type"] == "summary"
+    assert summary["path"] == str(tree)
+    assert set(summary["extensions"]) == {".txt", ".pdf", ".md", ""}
+    assert (summary["file_count"], summary["folder_count"]) == (5, 3)
+
+
+def test_stream_applies_scan_filter(client, tree):
+    response = client.post("/explorefolder/stream", json={"folder": str(tree), "include_extensions": [".md"]})
+    summary = json.loads(response.text.splitlines()[-1])
+    assert summary["file_count"] == 2
+    assert summary["extensions"] == [".md"]
+
+
+def test_stream_missing_folder(client, tmp_path):
+    response = client.post("/explorefolder/stream", json={"folder": str(tmp_path / "missing")})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("accept", [COLUMNAR_JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE])
+def test_explorefolder_columnar_layouts(client, tree, accept):
+    response = client.post("/explorefolder", json={"folder": str(tree)}, headers={"Accept": accept})
+
+    assert response.headers["content-type"] == accept
+    body = msgpack.unpackb(response.content) if accept == MSGPACK_MEDIA_TYPE else response.json()
+    assert body["root"] == str(tree)
+    names = sorted(os.path.join(body["dirs"][d], name) for d, name in zip(body["file_dir"], body["file_name"]))
+    assert names == ["a/b/two.md", "a/one.pdf", "c/four", "c/three.md", "top.txt"]
+
+
+def test_explorefolder_documents_every_media_type(client):
+    content = client.get("/openapi.json").json()["paths"]["/explorefolder"]["post"]["responses"]["200"]["content"]
+    assert set(content) == {JSON_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE}
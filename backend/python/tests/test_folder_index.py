@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import pytest
+
+from folder_index import FolderIndex
+from folder_scanner import scan_folder
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for d in ["a/b", "c"]:
+        (root / d).mkdir(parents=True)
+    for f in ["top.txt", "a/one.pdf", "a/b/two.pdf", "c/three.md"]:
+        (root / f).write_text("data")
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    return FolderIndex(str(tmp_path / "index.sqlite3"))
+
+
+def test_listing_matches_scan(tree, index):
+    index.refresh(str(tree))
+    listing = index.listing(str(tree))
+    scan = scan_folder(str(tree))
+    assert set(listing["files"]) == set(scan["files"])
+    assert set(listing["folders"]) == set(scan["folders"])
+    assert set(listing["extensions"]) == set(scan["extensions"])
+
+
+def test_unchanged_rescan_relists_nothing(tree, index):
+    first = index.refresh(str(tree))
+    assert first["relisted"] == first["directories"] == 4
+    assert index.refresh(str(tree))["relisted"] == 0
+
+
+def test_rescan_relists_only_changed_directory(tree, index):
+    index.refresh(str(tree))
+    (tree / "c" / "new.pdf").write_text("new")
+    assert index.refresh(str(tree))["relisted"] == 1
+    stats = index.stats(str(tree))
+    assert stats["file_count"] == 5
+    assert stats["extensions"][".pdf"] == {"count": 3, "bytes": 11}
+
+
+def test_removed_subtree_is_purged(tree, index):
+    index.refresh(str(tree))
+    shutil.rmtree(tree / "a")
+    index.refresh(str(tree))
+    listing = index.listing(str(tree))
+    assert sorted(listing["folders"]) == ["c"]
+    assert not any(os.sep + "a" + os.sep in f for f in listing["files"])
+    assert index.stats(str(tree))["file_count"] == 2
+
+
+def test_stats_for_unknown_root(tree, index):
+    assert index.stats(str(tree)) is None
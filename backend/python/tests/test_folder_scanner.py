@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from folder_scanner import ScanFilter, scan_folder, file_extension, iter_folder_batches
+
+
+def walk_folder(folder):
+    """
+    The os.walk-based listing /explorefolder used before the scandir engine.
+    """
+    files = []
+    folders = []
+    extensions = set()
+    for root, dirs, filenames in os.walk(folder):
+        rel_root = os.path.relpath(root, folder)
+        if rel_root != '.':
+            folders.append(rel_root)
+        folders.extend([os.path.join(rel_root, d) for d in dirs])
+        for filename in filenames:
+            files.append(os.path.abspath(os.path.join(root, filename)))
+            extensions.add(os.path.splitext(filename)[1])
+    return files, folders, extensions
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in ["a/b/c", "a/d", "e", ".hidden/x"]:
+        (tmp_path / d).mkdir(parents=True)
+    for f in ["top.txt", ".bashrc", "a/one.pdf", "a/b/two.md", "a/b/c/three", "a/d/four.tar.gz", "e/five.", ".hidden/x/six.py"]:
+        (tmp_path / f).write_text("x")
+    (tmp_path / "link").symlink_to(tmp_path / "a", target_is_directory=True)
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_scan_folder_matches_os_walk(tree, workers):
+    files, folders, extensions = walk_folder(str(tree))
+    result = scan_folder(str(tree), workers=workers)
+
+    assert len(result["files"]) == len(files)
+    assert set(result["files"]) == set(files)
+    assert set(result["extensions"]) == extensions
+    # os.walk listed each subdirectory twice, top-level ones as "./name"
+    assert len(result["folders"]) == len(set(result["folders"]))
+    assert set(result["folders"]) == {os.path.normpath(f) for f in folders}
+
+
+def test_scan_folder_relative_root(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    files, _, _ = walk_folder("a")
+    assert set(scan_folder("a")["files"]) == set(files)
+
+
+@pytest.mark.parametrize("name", ["a", ".a", "..a.b", "a.", ".", "..", "a.b.c", ".a.", "a.tar.gz"])
+def test_file_extension_matches_splitext(name):
+    assert file_extension(name) == os.path.splitext(name)[1]
+
+
+def test_scan_filter_prunes_gitignored_and_hidden(tmp_path):
+    for d in ["node_modules/x", "src/build", "docs/deep", ".git"]:
+        (tmp_path / d).mkdir(parents=True)
+    (tmp_path / ".gitignore").write_text("node_modules/\n*.log\n!keep.log\n**/build\ndocs/**/*.tmp\n")
+    for f in ["a.log", "keep.log", "a.pdf", "node_modules/x/i.js", "src/build/o.js", "src/m.py",
+              "docs/deep/t.tmp", "docs/t.tmp", "docs/r.md", ".git/cfg"]:
+        (tmp_path / f).write_text("x")
+
+    scan_filter = ScanFilter(respect_gitignore=True, include_hidden=False)
+    result = scan_folder(str(tmp_path), scan_filter=scan_filter)
+    files = {os.path.relpath(f, tmp_path) for f in result["files"]}
+    assert files == {"keep.log", "a.pdf", "src/m.py", "docs/r.md"}
+    assert set(result["folders"]) == {"src", "docs", "docs/deep"}
+
+
+def test_scan_filter_extensions_and_depth(tree):
+    result = scan_folder(str(tree), scan_filter=ScanFilter(include_extensions=["PDF", ".md"], max_depth=2))
+    assert {os.path.relpath(f, tree) for f in result["files"]} == {"a/one.pdf"}
+    assert set(result["folders"]) == {"a", "a/b", "a/d", "e", ".hidden", ".hidden/x", "link"}
+
+
+def test_empty_scan_filter_is_noop():
+    assert ScanFilter().is_noop
+    assert not ScanFilter(max_depth=1).is_noop
+    assert not ScanFilter(min_size=0).is_noop
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_iter_folder_batches_matches_scan_folder(tree, workers):
+    records = list(iter_folder_batches(str(tree), workers=workers, batch_size=3))
+    batches, summary = records[:-1], records[-1]
+    result = scan_folder(str(tree), workers=workers)
+
+    assert all(record["type"] == "batch" for record in batches)
+    assert all(0 < len(b["files"]) + len(b["folders"]) <= 3 for b in batches)
+    assert sorted(f for b in batches for f in b["files"]) == sorted(result["files"])
+    assert sorted(f for b in batches for f in b["folders"]) == sorted(result["folders"])
+    assert summary["type"] == "summary"
+    assert set(summary["extensions"]) == set(result["extensions"])
+    assert summary["file_count"] == len(result["files"])
+    assert summary["folder_count"] == len(result["folders"])
+
+
+def test_iter_folder_batches_splits_one_large_directory(tmp_path):
+    for i in range(250):
+        (tmp_path / f"f{i:03d}.txt").write_text("x")
+    for i in range(150):
+        (tmp_path / f"d{i:03d}").mkdir()
+
+    records = list(iter_folder_batches(str(tmp_path), batch_size=100))
+
+    assert [len(r["files"]) + len(r["folders"]) for r in records[:-1]] == [100, 100, 100, 100]
+    assert records[-1] == {"type": "summary", "extensions": [".txt"], "file_count": 250, "folder_count": 150}
+
+
+def test_iter_folder_batches_empty_folder(tmp_path):
+    assert list(iter_folder_batches(str(tmp_path))) == [
+        {"type": "summary", "extensions": [], "file_count": 0, "folder_count": 0}
+    ]
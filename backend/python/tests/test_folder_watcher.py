@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+
+from folder_watcher import WatcherRegistry, FolderWatcher
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_subscribe_shares_and_stops_watcher(tmp_path, loop):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "f.txt").write_text("x")
+    registry = WatcherRegistry()
+
+    watcher, first = registry.subscribe(str(tmp_path), loop)
+    same, second = registry.subscribe(str(tmp_path), loop)
+    assert same is watcher
+    assert watcher.snapshot()["file_count"] == 1
+
+    registry.unsubscribe(watcher, first)
+    assert registry._watchers
+    registry.unsubscribe(watcher, second)
+    assert not registry._watchers
+
+
+def test_start_failure_is_raised_and_unregistered(tmp_path, loop, monkeypatch):
+    def fail(self):
+        raise OSError(28, "inotify watch limit reached")
+
+    monkeypatch.setattr(FolderWatcher, "start", fail)
+    registry = WatcherRegistry()
+    with pytest.raises(OSError):
+        registry.subscribe(str(tmp_path), loop)
+    assert not registry._watchers
+
+
+def test_initial_scan_does_not_hold_registry_lock(tmp_path, loop, monkeypatch):
+    slow_root = tmp_path / "slow"
+    fast_root = tmp_path / "fast"
+    slow_root.mkdir()
+    fast_root.mkdir()
+    release = threading.Event()
+    original_start = FolderWatcher.start
+
+    def start(self):
+        if self.root == str(slow_root):
+            release.wait(5)
+        original_start(self)
+
+    monkeypatch.setattr(FolderWatcher, "start", start)
+    registry = WatcherRegistry()
+    slow = threading.Thread(target=registry.subscribe, args=(str(slow_root), loop))
+    slow.start()
+    try:
+        # Another root can be subscribed and released while the slow scan runs
+        done = threading.Event()
+
+        def other():
+            watcher, queue = registry.subscribe(str(fast_root), loop)
+            registry.unsubscribe(watcher, queue)
+            done.set()
+
+        threading.Thread(target=other).start()
+        assert done.wait(2)
+    finally:
+        release.set()
+        slow.join()
+        for watcher in list(registry._watchers.values()):
+            watcher.stop()
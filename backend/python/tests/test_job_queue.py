@@ -0,0 +1,78 @@
+import threading
+
+from job_queue import CANCELLED, FAILED, SUCCEEDED, JobManager
+from progress import report_progress
+
+
+def wait_for(job, timeout=5):
+    job.future.result(timeout=timeout)
+    return job
+
+
+def test_job_runs_and_reports_progress():
+    manager = JobManager(max_workers=1)
+
+    def work(n):
+        for i in range(n):
+            report_progress("counting", done=i + 1, total=n)
+        return n * 2
+
+    job = wait_for(manager.submit("test", work, {"n": 3}))
+    assert job.status == SUCCEEDED and job.result == 6
+    assert job.progress == {"stage": "counting", "done": 3, "total": 3}
+    kinds = [(e["type"], e.get("status") or e.get("stage")) for e in job.events]
+    assert kinds == [("status", "queued"), ("status", "running")] + [("progress", "counting")] * 3 + [("status", "succeeded")]
+    assert [e["seq"] for e in job.events] == list(range(1, 7))
+
+
+def test_failed_job_records_error():
+    manager = JobManager(max_workers=1)
+
+    def work():
+        raise ValueError("bad input")
+
+    job = wait_for(manager.submit("test", work, {}))
+    assert job.status == FAILED and job.error == "bad input"
+
+
+def test_cancel_running_and_queued_jobs():
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        report_progress("after release")
+        return "finished"
+
+    running = manager.submit("test", work, {})
+    queued = manager.submit("test", work, {})
+    assert started.wait(5)
+    manager.cancel(queued.job_id)
+    assert queued.status == CANCELLED
+    manager.cancel(running.job_id)
+    release.set()
+    wait_for(running)
+    assert running.status == CANCELLED and running.result is None
+
+
+def test_concurrency_is_bounded():
+    manager = JobManager(max_workers=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+    gate = threading.Event()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        gate.wait(0.2)
+        with lock:
+            active.pop()
+
+    jobs = [manager.submit("test", work, {}) for _ in range(5)]
+    for job in jobs:
+        wait_for(job)
+    assert max(peak) == 2
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from llm_batching import count_tokens, merge_file_results, pack_batches, run_batches
+
+
+def test_pack_batches_respects_budget_and_item_cap():
+    batches = pack_batches([3, 3, 3, 9, 1, 1, 1], token_budget=6, cost=lambda n: n, max_items=2)
+    assert batches == [[3, 3], [3], [9], [1, 1], [1]]
+
+
+def test_pack_batches_keeps_order_and_items():
+    items = list(range(50))
+    batches = pack_batches(items, token_budget=10, cost=lambda n: n % 7)
+    assert [i for batch in batches for i in batch] == items
+    assert all(sum(i % 7 for i in b) <= 10 or len(b) == 1 for b in batches)
+
+
+def test_count_tokens_counts_something():
+    assert count_tokens("") == 0 or count_tokens("") == 1
+    assert count_tokens("hello world " * 10) > count_tokens("hello world")
+
+
+def test_run_batches_limits_concurrency_and_keeps_order():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work(batch):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        return batch * 2
+
+    assert run_batches(work, list(range(12)), max_concurrency=3) == [i * 2 for i in range(12)]
+    assert 1 < peak <= 3
+
+
+def test_merge_file_results_sums_usage():
+    merged = merge_file_results([
+        {"files": [{"file_path": "a"}], "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6}},
+        {"files": []},
+        {"files": [{"file_path": "b"}], "usage": {"prompt_tokens": 2, "completion_tokens": None, "total_tokens": 2}},
+    ])
+    assert [f["file_path"] for f in merged["files"]] == ["a", "b"]
+    assert merged["usage"] == {"prompt_tokens": 7, "completion_tokens": 1, "total_tokens": 8}
@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import litellm
+import pytest
+
+from llm_clients import ClientPool
+
+
+@pytest.fixture
+def fake_ollama():
+    """
+    Minimal Ollama server recording each request and the client port it came from.
+    """
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, body):
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            requests.append((self.path, None, self.client_address[1]))
+            self.reply({"models": []})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests.append((self.path, body, self.client_address[1]))
+            self.reply({
+                "model": body["model"], "created_at": "2024-01-01T00:00:00Z", "response": '{"ok": true}',
+                "done": True, "prompt_eval_count": 3, "eval_count": 2,
+            })
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+
+
+def test_completions_reuse_one_connection(fake_ollama):
+    api_base, requests = fake_ollama
+    pool = ClientPool()
+    for _ in range(3):
+        response = litellm.completion(
+            model="ollama/test", messages=[{"role": "user", "content": "hi"}], api_base=api_base,
+            **pool.completion_kwargs("ollama/test", api_base)
+        )
+        assert response.choices[0].message.content == '{"ok": true}'
+    assert len({port for _, _, port in requests}) == 1
+    assert pool.completion_kwargs("gpt-4o-mini", api_base) == {}
+    pool.close()
+
+
+def test_preload_only_loads_ollama_models(fake_ollama):
+    api_base, requests = fake_ollama
+    pool = ClientPool(keep_alive="1h")
+    assert pool.preload(["ollama/a", "gpt-4o-mini", "ollama_chat/b", "ollama/a"], api_base) == {"ollama/a": True, "ollama_chat/b": True}
+    assert [(path, body["model"], body["keep_alive"]) for path, body, _ in requests] == [
+        ("/api/generate", "a", "1h"),
+        ("/api/generate", "b", "1h"),
+    ]
+    assert pool.preload(["ollama/a"], "http://127.0.0.1:9") == {"ollama/a": False}
+
+
+def test_model_list_is_cached_for_its_ttl(fake_ollama):
+    api_base, requests = fake_ollama
+    now = [0.0]
+    pool = ClientPool(model_list_ttl=60, clock=lambda: now[0])
+    pool.list_models(api_base)
+    now[0] = 59
+    pool.list_models(api_base)
+    assert len(requests) == 1
+    now[0] = 61
+    pool.list_models(api_base)
+    assert len(requests) == 2
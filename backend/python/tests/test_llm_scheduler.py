@@ -0,0 +1,104 @@
+import threading
+
+import litellm
+import pytest
+
+from llm_scheduler import LLMScheduler, TokenBucket
+
+
+def rate_limit_error():
+    return litellm.RateLimitError(message="slow down", llm_provider="openai", model="m")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_allows_bursts_then_waits():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=4, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(4)] == [0.0] * 4
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire(10) == pytest.approx(2.0)  # capped at the capacity
+
+
+def test_retries_transient_errors_with_backoff():
+    sleeps = []
+    attempts = []
+
+    def completion(model, messages, api_base, **kwargs):
+        attempts.append(model)
+        if len(attempts) < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    scheduler = LLMScheduler(max_retries=3, backoff=1.0, fallback_model=None, sleep=sleeps.append)
+    assert scheduler.complete(completion, "a", []) == ("ok", "a", False)
+    assert attempts == ["a", "a", "a"]
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+
+
+def test_falls_back_to_other_models():
+    attempts = []
+
+    def completion(model, messages, api_base, **kwargs):
+        attempts.append((model, api_base))
+        if model == "tree":
+            raise ValueError("bad request")
+        if model == "summary":
+            raise rate_limit_error()
+        return "ok"
+
+    scheduler = LLMScheduler(max_retries=1, fallback_model="ollama/local", fallback_api_base="http://ollama", sleep=lambda s: None)
+    response, model, _ = scheduler.complete(completion, "tree", [], api_base="http://api", fallbacks=["summary", "tree"])
+    assert (response, model) == ("ok", "ollama/local")
+    # Non-retryable errors move on at once; retryable ones use up their retries first
+    assert attempts == [("tree", "http://api"), ("summary", "http://api"), ("summary", "http://api"), ("ollama/local", "http://ollama")]
+
+    def failing(model, messages, api_base, **kwargs):
+        raise rate_limit_error()
+
+    with pytest.raises(litellm.RateLimitError):
+        LLMScheduler(max_retries=0, fallback_model=None).complete(failing, "tree", [])
+
+
+def test_identical_requests_in_flight_are_sent_once():
+    release = threading.Event()
+    calls = []
+
+    def completion(model, messages, api_base, **kwargs):
+        calls.append(model)
+        release.wait(5)
+        return {"answer": 42}
+
+    scheduler = LLMScheduler(fallback_model=None)
+    messages = [{"role": "user", "content": "same"}]
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(scheduler.complete(completion, "m", messages)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    while not scheduler._in_flight:
+        pass
+    # Give the followers time to find the request in flight
+    threading.Event().wait(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ["m"]
+    assert sorted(shared for _, _, shared in results) == [False, True, True, True]
+
+    scheduler.complete(completion, "m", messages, stream=True)
+    scheduler.complete(completion, "m", messages, stream=True)
+    assert calls == ["m", "m", "m"]
@@ -0,0 +1,132 @@
+import os
+
+import pytest
+
+import materialization
+from materialization import copy_file, materialize, rollback, unique_directories
+
+
+@pytest.fixture(autouse=True)
+def journal_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(materialization, "JOURNAL_REGISTRY", str(tmp_path / "journals.txt"))
+
+
+def make_tree(tmp_path, n=20):
+    src = tmp_path / "src"
+    src.mkdir()
+    dst = tmp_path / "dst"
+    tree = []
+    for i in range(n):
+        path = src / f"f{i}.txt"
+        path.write_text(f"file {i}")
+        folder = "even/deep" if i % 2 == 0 else "odd"
+        tree.append({"src_path": str(path), "dst_path": str(dst / folder / path.name), "dst_path_new": str(dst / folder / f"new_{path.name}")})
+    return src, dst, tree
+
+
+def test_unique_directories_keeps_only_deepest_folders():
+    paths = ["/d/a/x.txt", "/d/a/b/y.txt", "/d/a-c/z.txt", "/d/a/b/w.txt", "/d/e/f/g/h.txt"]
+    assert sorted(unique_directories(paths)) == ["/d/a-c", "/d/a/b", "/d/e/f/g"]
+
+
+@pytest.mark.parametrize("mode", ["move", "hardlink", "copy"])
+def test_materialize_and_roll_back(tmp_path, mode):
+    src, dst, tree = make_tree(tmp_path)
+    result = materialize(tree, str(dst), mode, workers=4)
+    assert result["failed"] == [] and sum(result["applied"].values()) == 20
+    for entry in tree:
+        assert open(entry["dst_path"]).read() == f"file {os.path.basename(entry['src_path'])[1:-4]}"
+        assert os.path.exists(entry["src_path"]) == (mode != "move")
+    if mode == "hardlink":
+        assert os.path.samefile(tree[0]["src_path"], tree[0]["dst_path"])
+
+    undone = rollback(result["journal"])
+    assert undone["failed"] == []
+    assert all(os.path.exists(entry["src_path"]) for entry in tree)
+    # Only the journal folder is left in the destination
+    assert os.listdir(dst) == [".nst_journal"]
+
+
+def test_dry_run_and_existing_destinations(tmp_path):
+    src, dst, tree = make_tree(tmp_path, 4)
+    preview = materialize(tree, str(dst), "move", dry_run=True, use_new_names=True)
+    assert not dst.exists()
+    assert preview["directories"] == 4  # dst, dst/even, dst/even/deep and dst/odd
+    assert [op["dst"] for op in preview["operations"]] == [entry["dst_path_new"] for entry in tree]
+
+    os.makedirs(os.path.dirname(tree[0]["dst_path"]))
+    open(tree[0]["dst_path"], "w").write("keep me")
+    result = materialize(tree, str(dst), "copy")
+    assert [failure["src"] for failure in result["failed"]] == [tree[0]["src_path"]]
+    assert open(tree[0]["dst_path"]).read() == "keep me"
+    assert result["applied"] == {"copy": 3}
+    assert rollback(result["journal"])["failed"] == []
+    assert open(tree[0]["dst_path"]).read() == "keep me"
+
+
+def test_copy_file_keeps_content_and_mtime(tmp_path):
+    src = tmp_path / "big.bin"
+    src.write_bytes(os.urandom(3 * 1024 * 1024))
+    os.utime(src, (1_000_000, 1_000_000))
+    copy_file(str(src), str(tmp_path / "copy.bin"))
+    assert (tmp_path / "copy.bin").read_bytes() == src.read_bytes()
+    assert os.stat(tmp_path / "copy.bin").st_mtime == 1_000_000
+    with pytest.raises(FileExistsError):
+        copy_file(str(src), str(tmp_path / "copy.bin"))
+
+
+def test_rejects_unknown_sources_and_escaping_destinations(tmp_path, monkeypatch):
+    src, dst, tree = make_tree(tmp_path, 4)
+    secret = tmp_path / "secret.txt"
+    secret.write_text("not organized")
+    monkeypatch.chdir(tmp_path)
+    bad = [
+        {"src_path": str(secret), "dst_path": str(dst / "secret.txt")},
+        {"src_path": tree[1]["src_path"], "dst_path": str(tmp_path / "elsewhere" / "f1.txt")},
+        {"src_path": tree[2]["src_path"], "dst_path": str(dst / ".." / "f2.txt")},
+        {"src_path": tree[3]["src_path"], "dst_path": "relative/f3.txt"},
+    ]
+    result = materialize([tree[0]] + bad, str(dst), "move", sources=[e["src_path"] for e in tree], source_path=str(src))
+    assert result["applied"] == {"move": 2}
+    assert sorted(f["src"] for f in result["failed"]) == sorted([str(secret), tree[1]["src_path"], tree[2]["src_path"]])
+    assert secret.exists() and not (tmp_path / "elsewhere").exists()
+    # Relative destinations are taken from the destination folder, not the working directory
+    assert (dst / "relative" / "f3.txt").exists() and not (tmp_path / "relative").exists()
+
+
+def test_rollback_only_accepts_registered_journals(tmp_path):
+    src, dst, tree = make_tree(tmp_path, 2)
+    forged = tmp_path / "forged.jsonl"
+    forged.write_text('{"op": "copy", "src": "/x", "dst": "%s"}\n' % tree[0]["src_path"])
+    with pytest.raises(PermissionError):
+        rollback(str(forged))
+    assert os.path.exists(tree[0]["src_path"])
+
+
+class Crash(BaseException):
+    pass
+
+
+def test_rollback_after_a_crash_mid_chunk(tmp_path, monkeypatch):
+    src, dst, tree = make_tree(tmp_path, 10)
+    apply = materialization._apply
+    applied = []
+
+    def crashing_apply(mode, s, d):
+        journal = next((dst / ".nst_journal").iterdir()).read_text()
+        assert d in journal  # journaled before it is applied
+        if len(applied) == 6:
+            raise Crash()
+        applied.append(d)
+        return apply(mode, s, d)
+
+    monkeypatch.setattr(materialization, "_apply", crashing_apply)
+    with pytest.raises(Crash):
+        materialize(tree, str(dst), "move", workers=1)
+    assert sum(os.path.exists(entry["src_path"]) for entry in tree) == 4
+
+    journal = str(next((dst / ".nst_journal").iterdir()))
+    undone = rollback(journal)
+    assert undone["failed"] == [] and undone["undone"] == 6 + 3  # six moves and three folders
+    assert all(os.path.exists(entry["src_path"]) for entry in tree)
+    assert os.listdir(dst) == [".nst_journal"]
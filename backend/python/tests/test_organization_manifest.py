@@ -0,0 +1,60 @@
+import os
+
+from organization_manifest import OrganizationManifest, stat_files
+
+
+def test_diff_reports_new_changed_and_removed(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (src / name).write_text(name)
+    dst = tmp_path / "dst"
+
+    manifest = OrganizationManifest.load(str(dst))
+    stats = stat_files(str(p) for p in src.iterdir())
+    changed, removed = manifest.diff(str(src), stats)
+    assert sorted(os.path.basename(p) for p in changed) == ["a.txt", "b.txt", "c.txt"]
+    assert removed == []
+    manifest.update(
+        [{"file_path": p, "summary": "s", "dst_path": str(dst / "docs" / os.path.basename(p))} for p in changed],
+        stats,
+    )
+    manifest.save()
+
+    (src / "b.txt").write_text("changed contents")
+    os.utime(src / "b.txt", ns=(1, 1))
+    (src / "c.txt").unlink()
+    (src / "d.txt").write_text("d")
+    manifest = OrganizationManifest.load(str(dst))
+    changed, removed = manifest.diff(str(src), stat_files(str(p) for p in src.iterdir()))
+    assert sorted(os.path.basename(p) for p in changed) == ["b.txt", "d.txt"]
+    assert [os.path.basename(p) for p in removed] == ["c.txt"]
+    assert manifest.folders() == ["docs"]
+    assert len(manifest.concatenated_data()) == 3
+
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    (tmp_path / ".nst_manifest.json").write_text("{not json")
+    assert OrganizationManifest.load(str(tmp_path)).files == {}
+
+
+def test_moved_files_stay_in_the_manifest(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    dst = tmp_path / "dst"
+    (dst / "docs").mkdir(parents=True)
+    for name in ["a.txt", "b.txt"]:
+        (src / name).write_text(name)
+    stats = stat_files(str(p) for p in src.iterdir())
+    manifest = OrganizationManifest(str(dst))
+    manifest.update([{"file_path": p, "summary": "s", "dst_path": str(dst / "docs" / os.path.basename(p))} for p in stats], stats)
+
+    # a.txt was moved into the destination; b.txt was deleted without being placed
+    os.rename(src / "a.txt", dst / "docs" / "a.txt")
+    (src / "b.txt").unlink()
+    changed, removed = manifest.diff(str(src), stat_files(str(p) for p in src.iterdir()))
+    assert changed == []
+    assert [os.path.basename(p) for p in removed] == ["b.txt"]
+    manifest.remove(removed)
+    assert manifest.folders() == ["docs"]
+    assert [os.path.basename(item["file_path"]) for item in manifest.concatenated_data()] == ["a.txt"]
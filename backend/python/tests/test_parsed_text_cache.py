@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+import document_loading
+import parsed_text_cache
+from parsed_text_cache import ParsedTextCache, file_key
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ParsedTextCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(document_loading, "get_parsed_text_cache", lambda: cache)
+    return cache
+
+
+def test_key_changes_with_the_file(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    key = file_key(str(path))
+    assert file_key(str(path)) == key
+    path.write_text("two!")
+    assert file_key(str(path)) != key
+    assert file_key(str(tmp_path / "missing.txt")) is None
+
+
+def test_put_get_round_trip(cache):
+    docs = [{"content": "päge one " * 100, "page_label": "1"}, {"content": "page two", "page_label": "2"}]
+    assert cache.get("k" * 64) is None
+    cache.put("k" * 64, docs)
+    assert cache.get("k" * 64) == docs
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] < stats["raw_bytes"]  # stored compressed
+
+
+def test_evicts_least_recently_used_over_size(tmp_path, monkeypatch):
+    cache = ParsedTextCache(str(tmp_path / "cache"))
+    now = [1000.0]
+    monkeypatch.setattr(parsed_text_cache.time, "time", lambda: now[0])
+
+    def docs(i):
+        return [{"content": os.urandom(4096).hex()}]
+
+    cache.put("a" * 64, docs(0))
+    cache.max_bytes = int(cache.stats()["bytes"] * 2.5)  # room for two blobs
+    now[0] += 1
+    cache.put("b" * 64, docs(1))
+    now[0] += 1
+    assert cache.get("a" * 64) is not None  # a is now the most recently used
+    now[0] += 1
+    cache.put("c" * 64, docs(2))
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None
+    assert cache.get("c" * 64) is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert not os.path.exists(cache._blob_path("b" * 64))
+
+
+def test_load_file_reuses_cached_parse(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(document_loading, "CACHED_EXTENSIONS", frozenset({".txt"}))
+    path = tmp_path / "doc.txt"
+    path.write_text("parsed once")
+    first = document_loading.load_file(str(path))
+    assert first[0]["content"] == "parsed once"
+    assert cache.stats()["entries"] == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(document_loading, "SimpleDirectoryReader", fail)
+    assert document_loading.load_file(str(path)) == first
+    assert list(document_loading.iter_documents(str(tmp_path), workers=2, files=[str(path)], process_extensions={".txt"})) == first
+
+    path.write_text("changed contents")
+    monkeypatch.undo()
+    monkeypatch.setattr(document_loading, "get_parsed_text_cache", lambda: cache)
+    monkeypatch.setattr(document_loading, "CACHED_EXTENSIONS", frozenset({".txt"}))
+    assert document_loading.load_file(str(path))[0]["content"] == "changed contents"
+
+
+def test_uncached_formats_are_not_stored(cache, tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("cheap to parse")
+    assert document_loading.load_file(str(path))[0]["content"] == "cheap to parse"
+    assert cache.stats()["entries"] == 0
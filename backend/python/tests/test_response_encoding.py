@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+
+import msgpack
+import pytest
+import zstandard
+
+from folder_scanner import scan_folder, scan_folder_columnar
+from response_encoding import (
+    COLUMNAR_JSON_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    MIN_COMPRESS_SIZE,
+    MSGPACK_MEDIA_TYPE,
+    columnar_from_listing,
+    encode_response,
+    negotiate_media_type,
+)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", JSON_MEDIA_TYPE),
+    ("*/*", JSON_MEDIA_TYPE),
+    ("text/html", JSON_MEDIA_TYPE),
+    (MSGPACK_MEDIA_TYPE, MSGPACK_MEDIA_TYPE),
+    ("application/x-msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/vnd.msgpack", MSGPACK_MEDIA_TYPE),
+    ("APPLICATION/VND.NST.COLUMNAR+JSON", COLUMNAR_JSON_MEDIA_TYPE),
+    (f"{JSON_MEDIA_TYPE}, {MSGPACK_MEDIA_TYPE}", JSON_MEDIA_TYPE),
+    (f"{JSON_MEDIA_TYPE};q=0.5, {MSGPACK_MEDIA_TYPE}", MSGPACK_MEDIA_TYPE),
+    (f"{MSGPACK_MEDIA_TYPE};q=0.2, {COLUMNAR_JSON_MEDIA_TYPE};q=0.9", COLUMNAR_JSON_MEDIA_TYPE),
+    (f"{MSGPACK_MEDIA_TYPE};q=0", JSON_MEDIA_TYPE),
+    (f"{MSGPACK_MEDIA_TYPE};q=bogus, {COLUMNAR_JSON_MEDIA_TYPE}", COLUMNAR_JSON_MEDIA_TYPE),
+])
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+def payload(entries):
+    return {"message": "Folder explored", "files": [f"/root/file{i:05d}.txt" for i in range(entries)]}
+
+
+@pytest.mark.parametrize("accept_encoding, coding, decompress", [
+    ("gzip", "gzip", gzip.decompress),
+    ("zstd", "zstd", zstandard.ZstdDecompressor().decompress),
+    ("gzip;q=0.5, zstd", "zstd", zstandard.ZstdDecompressor().decompress),
+    ("zstd;q=0, gzip", "gzip", gzip.decompress),
+])
+def test_encode_response_compresses_large_bodies(accept_encoding, coding, decompress):
+    data = payload(200)
+    response = encode_response(data, JSON_MEDIA_TYPE, accept_encoding)
+    assert response.headers["content-encoding"] == coding
+    assert json.loads(decompress(response.body)) == data
+
+
+@pytest.mark.parametrize("accept_encoding", ["", "identity", "br", "zstd;q=0"])
+def test_encode_response_without_accepted_coding(accept_encoding):
+    data = payload(200)
+    response = encode_response(data, JSON_MEDIA_TYPE, accept_encoding)
+    assert "content-encoding" not in response.headers
+    assert json.loads(response.body) == data
+
+
+def test_encode_response_leaves_small_bodies_uncompressed():
+    data = payload(1)
+    assert len(json.dumps(data)) < MIN_COMPRESS_SIZE
+    response = encode_response(data, JSON_MEDIA_TYPE, "gzip, zstd")
+    assert "content-encoding" not in response.headers
+    assert json.loads(response.body) == data
+
+
+def test_encode_response_msgpack():
+    data = payload(3)
+    response = encode_response(data, MSGPACK_MEDIA_TYPE)
+    assert response.media_type == MSGPACK_MEDIA_TYPE
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert msgpack.unpackb(response.body, raw=False) == data
+
+
+def expand(columnar):
+    files = {os.path.join(columnar["dirs"][d], name) for d, name in zip(columnar["file_dir"], columnar["file_name"])}
+    folders = {columnar["dirs"][d] for d in columnar["folders"]}
+    return files, folders
+
+
+def test_columnar_from_listing_matches_scan_folder_columnar(tmp_path):
+    for d in ["a/b/c", "d"]:
+        (tmp_path / d).mkdir(parents=True)
+    for f in ["top.txt", "a/one.pdf", "a/b/two.md", "a/b/c/three", "d/four.md"]:
+        (tmp_path / f).write_text("x")
+
+    listing = scan_folder(str(tmp_path))
+    converted = columnar_from_listing(str(tmp_path), listing["files"], listing["folders"])
+    scanned = scan_folder_columnar(str(tmp_path))
+
+    assert expand(converted) == expand(scanned)
+    assert len(converted["dirs"]) == len(set(converted["dirs"]))
+    assert expand(converted)[0] == {"top.txt", "a/one.pdf", "a/b/two.md", "a/b/c/three", "d/four.md"}
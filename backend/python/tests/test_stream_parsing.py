@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+
+from stream_parsing import JSONArrayStreamParser, consume_stream
+
+
+DOCUMENT = {
+    "meta": {"files": "not this one", "note": "brace } and [ in a string \" quoted"},
+    "files": [
+        {"file_path": "/a {x}.txt", "summary": "nested {\"json\": [1, 2]}", "tags": [{"k": 1}]},
+        {"file_path": "/b.txt", "summary": "b"},
+    ],
+    "later": {"files": [{"ignored": True}]},
+}
+
+
+def test_items_are_emitted_as_soon_as_complete():
+    text = json.dumps(DOCUMENT, indent=1)
+    parser = JSONArrayStreamParser("files")
+    first_b = text.index('"/b.txt"')
+    emitted = parser.feed(text[:first_b])
+    assert emitted == [DOCUMENT["files"][0]]
+    emitted += parser.feed(text[first_b:])
+    assert emitted == DOCUMENT["files"]
+    assert parser.text == text
+
+
+def test_any_chunking_gives_the_same_items():
+    text = json.dumps(DOCUMENT)
+    for size in (1, 2, 7, 64):
+        parser = JSONArrayStreamParser()
+        items = []
+        for i in range(0, len(text), size):
+            items += parser.feed(text[i:i + size])
+        assert items == DOCUMENT["files"]
+
+
+def test_strings_and_items_split_over_many_chunks():
+    files = [{"file_path": f"/f{i}.txt", "summary": "s" * 100} for i in range(2000)]
+    text = json.dumps({"files": files})
+    parser = JSONArrayStreamParser()
+    items = []
+    for c in text:
+        items += parser.feed(c)
+    assert items == files
+    assert parser.text == text
+
+
+def chunk(content=None, usage=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=usage)
+
+
+def test_consume_stream_reports_items_and_usage():
+    text = json.dumps({"files": DOCUMENT["files"]})
+    seen = []
+    stream = [chunk(text[i:i + 5]) for i in range(0, len(text), 5)] + [chunk(None, {"total_tokens": 9})]
+    content, items, usage = consume_stream(iter(stream), on_item=seen.append)
+    assert content == text
+    assert items == seen == DOCUMENT["files"]
+    assert usage == {"total_tokens": 9}
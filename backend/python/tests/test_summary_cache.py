@@ -0,0 +1,26 @@
+from summary_cache import SummaryCache, content_hash, summary_key
+
+
+def test_keys_depend_on_content_model_and_prompt_version():
+    digest = content_hash("hello")
+    assert summary_key(digest, "m1", "1") == summary_key(content_hash("hello"), "m1", "1")
+    assert summary_key(digest, "m1", "1") != summary_key(digest, "m2", "1")
+    assert summary_key(digest, "m1", "1") != summary_key(digest, "m1", "2")
+    assert summary_key(digest, "m1", "1") != summary_key(content_hash("hello!"), "m1", "1")
+
+
+def test_round_trip(tmp_path):
+    cache = SummaryCache(str(tmp_path / "c.sqlite3"))
+    cache.put_many([("a", "summary a"), ("b", "summary b")])
+    assert cache.get_many(["a", "b", "missing"]) == {"a": "summary a", "b": "summary b"}
+    assert SummaryCache(str(tmp_path / "c.sqlite3")).get_many(["a"]) == {"a": "summary a"}
+
+
+def test_evicts_least_recently_used_over_size_limit(tmp_path):
+    cache = SummaryCache(str(tmp_path / "c.sqlite3"), max_bytes=25)
+    cache.put_many([("a", "x" * 10)])
+    cache.put_many([("b", "x" * 10)])
+    cache.get_many(["a"])  # a is now more recently used than b
+    cache.put_many([("c", "x" * 10)])
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["bytes"] <= 25
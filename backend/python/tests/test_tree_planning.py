@@ -0,0 +1,55 @@
+from tree_planning import cluster_label, cluster_summaries, folder_name, reconcile_plans
+
+
+def summary(path, text):
+    return {"file_path": path, "summary": text}
+
+
+def test_clusters_group_related_files_and_respect_size():
+    items = [summary(f"/src/invoice_{i}.pdf", "invoice payment amount vendor billing") for i in range(7)]
+    items += [summary(f"/src/photo_{i}.jpg", "vacation beach holiday photo sunset") for i in range(7)]
+    clusters = cluster_summaries(items, max_size=5)
+    assert all(len(c) <= 5 for c in clusters)
+    assert sum(len(c) for c in clusters) == 14
+    for cluster in clusters:
+        kinds = {item["file_path"].split("/")[-1].split("_")[0] for item in cluster}
+        # Full clusters are never mixed; only leftovers are packed together
+        assert len(kinds) == 1 or len(cluster) < 5
+
+
+def test_reconcile_merges_spellings_and_fills_gaps(tmp_path):
+    dst = str(tmp_path / "dst")
+    clusters = [
+        [summary("/src/a.txt", ""), summary("/src/b.txt", "")],
+        [summary("/src/c.txt", ""), summary("/src/d.txt", "")],
+    ]
+    plans = [
+        [
+            {"src_path": "/src/a.txt", "dst_path": f"{dst}/Finance_Reports/a.txt", "dst_path_new": f"{dst}/Finance_Reports/a_v1.txt"},
+            {"src_path": "/src/b.txt", "dst_path": f"{dst}/Finance_Reports/b.txt"},
+        ],
+        [
+            {"src_path": "/src/c.txt", "dst_path": f"{dst}/finance-reports/a.txt", "dst_path_new": "/elsewhere/c.txt"},
+            {"src_path": "/src/unknown.txt", "dst_path": f"{dst}/x/unknown.txt"},
+        ],
+    ]
+    tree = {e["src_path"]: e for e in reconcile_plans(clusters, plans, dst)}
+    assert set(tree) == {"/src/a.txt", "/src/b.txt", "/src/c.txt", "/src/d.txt"}
+    assert tree["/src/b.txt"]["dst_path_new"] == f"{dst}/Finance_Reports/b.txt"
+    # Same folder under another spelling, and a colliding file name
+    assert tree["/src/c.txt"]["dst_path"] == f"{dst}/Finance_Reports/a_1.txt"
+    assert tree["/src/c.txt"]["dst_path_new"] == f"{dst}/c.txt"
+    # Left out by the model: placed with the rest of its cluster
+    assert tree["/src/d.txt"]["dst_path"] == f"{dst}/Finance_Reports/d.txt"
+
+
+def test_folder_name_sanitizes_model_output():
+    assert folder_name("Finance Reports/2024 Q1") == "Finance_Reports/2024_Q1"
+    assert folder_name("/../../etc/passwd/x") == "etc/passwd"
+    assert folder_name("  ") == ""
+
+
+def test_cluster_label_uses_common_terms():
+    items = [summary(f"/src/{i}.txt", "invoice from vendor") for i in range(3)] + [summary("/src/x.txt", "photo")]
+    assert {"invoice", "vendor"} & set(cluster_label(items, terms=3).split("_"))
+    assert cluster_label([]) == "misc"
@@ -0,0 +1,57 @@
+import threading
+from contextvars import copy_context
+
+from usage_accounting import UsageLedger, aggregate, completion_cost, record_completion, usage_scope
+import usage_accounting
+
+
+def test_scopes_label_and_collect_records(monkeypatch):
+    ledger = UsageLedger()
+    monkeypatch.setattr(usage_accounting, "_ledger", ledger)
+    usage = {"prompt_tokens": 100, "completion_tokens": 20}
+
+    record_completion("ollama/a", usage, 0.5)
+    with usage_scope(job_id="j1") as job:
+        with usage_scope(stage="summarizing") as stage:
+            record_completion("ollama/a", usage, 1.0)
+        record_completion("ollama/a", usage, 1.0, stage="planning")
+
+    assert [r.get("job_id") for r in ledger.records()] == [None, "j1", "j1"]
+    assert stage.totals()["calls"] == 1
+    assert job.totals()["total_tokens"] == 240
+    summary = ledger.summary(job_id="j1")
+    assert summary["totals"]["calls"] == 2
+    assert set(summary["by_stage"]) == {"summarizing", "planning"}
+    assert "by_job" not in summary
+
+
+def test_records_from_worker_threads_reach_the_scope(monkeypatch):
+    monkeypatch.setattr(usage_accounting, "_ledger", UsageLedger())
+
+    def work():
+        for _ in range(200):
+            record_completion("ollama/a", {"prompt_tokens": 1, "completion_tokens": 1}, 0.01)
+
+    with usage_scope(stage="summarizing") as meter:
+        threads = [threading.Thread(target=copy_context().run, args=(work,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    totals = meter.totals()
+    assert totals["calls"] == 1600 and totals["total_tokens"] == 3200
+
+
+def test_costs_and_aggregates():
+    assert completion_cost("ollama/llama3", 1000, 1000) == 0.0
+    assert completion_cost("unknown-model", 1000, 1000) == 0.0
+    assert completion_cost("gpt-4o-mini", 1000, 1000) > 0
+    records = [
+        {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20, "cost": 0.5, "latency": 2.0, "time": 102.0},
+        {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20, "cost": 0.5, "latency": 2.0, "time": 102.0},
+    ]
+    totals = aggregate(records)
+    assert totals["cost"] == 1.0 and totals["mean_latency"] == 2.0
+    # Two overlapping two-second calls: throughput over wall time, not summed latency
+    assert totals["wall_time"] == 2.0 and totals["tokens_per_second"] == 20.0
+    assert aggregate([])["calls"] == 0
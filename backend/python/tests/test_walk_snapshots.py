@@ -0,0 +1,43 @@
+import pytest
+
+from walk_snapshots import WalkSnapshot, decode_cursor
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in ["a0/b", "a1/b", "a2/b", ".git"]:
+        (tmp_path / d).mkdir(parents=True)
+    for f in ["root.txt", "a0/f.txt", "a0/b/g.txt", "a1/f.txt", "a1/b/g.txt", "a2/b/g.txt", ".git/x"]:
+        (tmp_path / f).write_text("x")
+    return tmp_path
+
+
+def read_all(snapshot, limit=3):
+    files, folders = [], []
+    offset = 0
+    while True:
+        page = snapshot.page(offset, limit)
+        files += page["files"]
+        folders += page["folders"]
+        if page["next_cursor"] is None:
+            return files, folders
+        _, offset = decode_cursor(page["next_cursor"])
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_pages_cover_the_whole_tree(tree, workers):
+    files, folders = read_all(WalkSnapshot("s", str(tree), workers))
+    assert len(files) == 7
+    assert len(folders) == 7
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_depth_limits_prune_dropped_folders(tree, workers):
+    files, folders = read_all(WalkSnapshot("s", str(tree), workers, depth_limits={1: 1}))
+    # One folder survives at depth 1; nothing below the dropped ones is reported
+    assert len(folders) == 2
+    kept = [f for f in folders if "/" not in f][0]
+    assert set(folders) == {kept, f"{kept}/b"}
+    # Files have their own quota, so the root's file is still listed
+    assert str(tree / "root.txt") in files
+    assert all(f == str(tree / "root.txt") or f.startswith(str(tree / kept)) for f in files)
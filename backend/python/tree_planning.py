@@ -0,0 +1,177 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import Any, Dict, List, Sequence
+
+# Files per planning request in map-reduce mode
+DEFAULT_CLUSTER_SIZE = 40
+# Minimum cosine similarity between a file's terms and a cluster's for the file to join it
+CLUSTER_SIMILARITY = 0.2
+# Terms kept per cluster centroid
+CENTROID_TERMS = 50
+
+_WORD = re.compile(r"[a-z][a-z0-9]{2,}")
+_STOPWORDS = frozenset(
+    "the and for with this that from are was were has have had not but its his her their our your you they "
+    "them which what when where who will would can could should file files document contains content "
+    "contents about into also such these those than then there here been being each other some more most "
+    "txt pdf docx md csv json html".split()
+)
+
+
+def summary_terms(item: Dict[str, Any]) -> Counter:
+    """
+    Term counts of one summary entry: the words of its summary, file name and parent folder.
+    """
+    path = item.get("file_path") or item.get("src_path") or ""
+    parent, name = os.path.split(path)
+    text = " ".join([str(item.get("summary", "")), os.path.splitext(name)[0], os.path.basename(parent)])
+    words = _WORD.findall(re.sub(r"[_\-.]", " ", text.lower()))
+    return Counter(w for w in words if w not in _STOPWORDS)
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def cluster_summaries(summaries: Sequence[Dict[str, Any]], max_size: int = DEFAULT_CLUSTER_SIZE) -> List[List[Dict[str, Any]]]:
+    """
+    Group related summaries locally, without the model, into clusters of at most `max_size`.
+
+    Files are visited in path order and join the open cluster whose term
+    centroid is most similar, or start a new one. Clusters that stay small
+    are then packed together so every planning request carries a useful
+    amount of work.
+    """
+    clusters: List[List[Dict[str, Any]]] = []
+    centroids: List[Counter] = []
+    for item in sorted(summaries, key=lambda s: s.get("file_path") or s.get("src_path") or ""):
+        terms = summary_terms(item)
+        best, best_score = -1, CLUSTER_SIMILARITY
+        for i, centroid in enumerate(centroids):
+            if len(clusters[i]) >= max_size:
+                continue
+            score = _cosine(terms, centroid)
+            if score >= best_score:
+                best, best_score = i, score
+        if best < 0:
+            clusters.append([item])
+            centroids.append(Counter(terms))
+        else:
+            clusters[best].append(item)
+            centroid = centroids[best]
+            centroid.update(terms)
+            if len(centroid) > CENTROID_TERMS * 2:
+                centroids[best] = Counter(dict(centroid.most_common(CENTROID_TERMS)))
+
+    # Pack small clusters together, keeping related files adjacent
+    packed: List[List[Dict[str, Any]]] = []
+    small: List[Dict[str, Any]] = []
+    for cluster in sorted(clusters, key=len, reverse=True):
+        if len(cluster) >= max_size // 2:
+            packed.append(cluster)
+            continue
+        if len(small) + len(cluster) > max_size:
+            packed.append(small)
+            small = []
+        small.extend(cluster)
+    if small:
+        packed.append(small)
+    return packed
+
+
+def cluster_label(items: Sequence[Dict[str, Any]], terms: int = 2) -> str:
+    """
+    A folder name made of the most common terms of a cluster, for when the model cannot name it.
+    """
+    counts = Counter()
+    for item in items:
+        counts.update(set(summary_terms(item)))
+    return "_".join(term for term, _ in counts.most_common(terms)) or "misc"
+
+
+def folder_name(raw: str) -> str:
+    """
+    Sanitize a model-proposed folder name into a relative path of at most two levels.
+    """
+    parts = []
+    for part in re.split(r"[/\\]+", str(raw)):
+        part = re.sub(r"[^A-Za-z0-9_\-]+", "_", part.strip()).strip("_-")
+        if part and part not in (".", ".."):
+            parts.append(part)
+    return os.path.join(*parts[:2]) if parts else ""
+
+
+def _canonical(component: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", component.lower())
+
+
+def _unique_path(path: str, taken: set) -> str:
+    if path not in taken:
+        return path
+    stem, ext = os.path.splitext(path)
+    n = 1
+    while f"{stem}_{n}{ext}" in taken:
+        n += 1
+    return f"{stem}_{n}{ext}"
+
+
+def reconcile_plans(
+    clusters: Sequence[Sequence[Dict[str, Any]]],
+    plans: Sequence[Sequence[Dict[str, str]]],
+    destination_path: str,
+) -> List[Dict[str, str]]:
+    """
+    Merge per-cluster plans into one consistent file tree.
+
+    - Folder names that differ only in case or punctuation are merged into
+      the spelling seen first.
+    - Destinations outside `destination_path` are moved under it.
+    - Two files planned onto the same destination get numbered names.
+    - Files a cluster's plan left out are placed in that cluster's most used
+      folder, or in the destination root.
+    """
+    destination = os.path.abspath(destination_path)
+    spellings: Dict[str, str] = {}
+    taken: Dict[str, set] = {"dst_path": set(), "dst_path_new": set()}
+
+    def normalize(path: str) -> str:
+        path = os.path.abspath(os.path.join(destination, path))
+        if path != destination and not path.startswith(os.path.join(destination, "")):
+            path = os.path.join(destination, os.path.basename(path))
+        folder, name = os.path.split(os.path.relpath(path, destination))
+        parts = []
+        for part in [p for p in folder.split(os.sep) if p not in ("", ".")]:
+            key = "/".join([_canonical(p) for p in parts] + [_canonical(part)])
+            parts.append(spellings.setdefault(key, part))
+        return os.path.join(destination, *parts, name)
+
+    file_tree = []
+    for cluster, plan in zip(clusters, plans):
+        expected = [item.get("file_path") for item in cluster]
+        expected_set = set(expected)
+        planned = {}
+        for entry in plan:
+            src = entry.get("src_path")
+            if src in expected_set and src not in planned and entry.get("dst_path"):
+                planned[src] = entry
+        folders = Counter(os.path.dirname(normalize(e["dst_path"])) for e in planned.values())
+        fallback = folders.most_common(1)[0][0] if folders else destination
+        for src in expected:
+            entry = planned.get(src)
+            if entry is None:
+                name = os.path.basename(src)
+                entry = {"src_path": src, "dst_path": os.path.join(fallback, name), "dst_path_new": os.path.join(fallback, name)}
+            result = {"src_path": src}
+            for key in ("dst_path", "dst_path_new"):
+                path = normalize(entry.get(key) or entry["dst_path"])
+                result[key] = _unique_path(path, taken[key])
+                taken[key].add(result[key])
+            file_tree.append(result)
+    return file_tree
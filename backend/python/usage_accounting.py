@@ -0,0 +1,164 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import litellm
+
+# Completion records kept in the process-wide ledger before the oldest are dropped
+MAX_USAGE_RECORDS = 100_000
+
+# Labels that group records in summaries
+GROUP_LABELS = ("job_id", "stage")
+
+
+class UsageMeter:
+    """
+    Collects the records of the completions made inside one usage_scope.
+
+    Appending to a deque is atomic, so worker threads record without a lock.
+    """
+    def __init__(self, labels: Dict[str, Any]):
+        self.labels = labels
+        self._records: deque = deque()
+
+    def add(self, record: Dict[str, Any]):
+        self._records.append(record)
+
+    def records(self) -> List[Dict[str, Any]]:
+        return list(self._records.copy())
+
+    def totals(self) -> Dict[str, Any]:
+        return aggregate(self.records())
+
+
+class UsageLedger(UsageMeter):
+    """
+    Every completion made by the process, bounded to the most recent `max_records`.
+    """
+    def __init__(self, max_records: int = MAX_USAGE_RECORDS):
+        super().__init__({})
+        self._records = deque(maxlen=max_records)
+
+    def summary(self, **labels: Any) -> Dict[str, Any]:
+        """
+        Totals of the records matching `labels`, overall and per stage, job and model.
+        """
+        records = [
+            record for record in self.records()
+            if all(record.get(key) == value for key, value in labels.items())
+        ]
+        result = {"totals": aggregate(records)}
+        for key in (*GROUP_LABELS, "model"):
+            if key in labels:
+                continue
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for record in records:
+                groups.setdefault(str(record.get(key)), []).append(record)
+            result[f"by_{key.replace('_id', '')}"] = {name: aggregate(group) for name, group in groups.items()}
+        return result
+
+
+# Labels and meters of the usage scopes open in the current context
+_scope: ContextVar[Tuple[Dict[str, Any], Tuple[UsageMeter, ...]]] = ContextVar("usage_scope", default=({}, ()))
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """
+    The process-wide ledger.
+    """
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger()
+        return _ledger
+
+
+@contextmanager
+def usage_scope(**labels: Any) -> Iterator[UsageMeter]:
+    """
+    Label the completions made in this context, and in contexts copied from it,
+    and collect them in the returned meter. Scopes nest: inner labels are added
+    to outer ones and every enclosing meter sees the record.
+    """
+    outer_labels, meters = _scope.get()
+    meter = UsageMeter({**outer_labels, **labels})
+    token = _scope.set((meter.labels, meters + (meter,)))
+    try:
+        yield meter
+    finally:
+        _scope.reset(token)
+
+
+def completion_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Price of a completion from litellm's model price list; 0 for local and unknown models.
+    """
+    prices = litellm.model_cost.get(model)
+    if prices is None and "/" in model:
+        prices = litellm.model_cost.get(model.split("/", 1)[1])
+    if not prices or model.startswith(("ollama/", "ollama_chat/")):
+        return 0.0
+    return (
+        prompt_tokens * (prices.get("input_cost_per_token") or 0.0)
+        + completion_tokens * (prices.get("output_cost_per_token") or 0.0)
+    )
+
+
+def record_completion(model: str, usage: Dict[str, Any], latency: float, **labels: Any) -> Dict[str, Any]:
+    """
+    Record one completion in the ledger and in every usage scope open in the current context.
+
+    Args:
+        model (str): Model the completion was made with.
+        usage (Dict[str, Any]): Token usage with prompt_tokens and completion_tokens.
+        latency (float): Seconds from the request to the last byte of the response.
+
+    Returns:
+        Dict[str, Any]: The record.
+    """
+    scope_labels, meters = _scope.get()
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    completion_tokens = int(usage.get("completion_tokens") or 0)
+    record = {
+        **scope_labels,
+        **labels,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": int(usage.get("total_tokens") or prompt_tokens + completion_tokens),
+        "latency": latency,
+        "cost": completion_cost(model, prompt_tokens, completion_tokens),
+        "time": time.time(),
+    }
+    get_usage_ledger().add(record)
+    for meter in meters:
+        meter.add(record)
+    return record
+
+
+def aggregate(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sum a set of records into calls, tokens, cost, latency and throughput.
+    """
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0.0, "latency": 0.0}
+    first: Optional[float] = None
+    last: Optional[float] = None
+    for record in records:
+        totals["calls"] += 1
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens", "cost", "latency"):
+            totals[key] += record[key]
+        started = record["time"] - record["latency"]
+        first = started if first is None else min(first, started)
+        last = record["time"] if last is None else max(last, record["time"])
+    wall = (last - first) if first is not None else 0.0
+    totals["wall_time"] = wall
+    # Concurrent calls overlap, so throughput is measured over wall time rather than summed latency
+    totals["tokens_per_second"] = totals["total_tokens"] / wall if wall > 0 else 0.0
+    totals["mean_latency"] = totals["latency"] / totals["calls"] if totals["calls"] else 0.0
+    return totals
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+from folder_scanner import DirectoryListing, ScanFilter, iter_scan, file_extension
+
+# Snapshots older than this (seconds since last use) are dropped
+SNAPSHOT_TTL = 600
+# Upper bound on the number of walks kept in memory at once
+MAX_SNAPSHOTS = 16
+
+
+class WalkSnapshot:
+    """
+    A server-side walk of one folder that is advanced lazily as pages are requested.
+
+    Entries are recorded in walk order, so following pages read from memory
+    instead of walking the disk again. Entry depth counts from the root's
+    children (depth 1). `depth_limits` maps a depth to the maximum number of
+    folders and, separately, the maximum number of files kept at that depth.
+    Folders over the limit are pruned from the walk, so nothing below them is
+    visited or reported.
+    """
+    def __init__(
+        self,
+        snapshot_id: str,
+        root: str,
+        workers: int = 1,
+        depth_limits: Optional[Dict[int, int]] = None,
+        scan_filter: Optional[ScanFilter] = None,
+    ):
+        self.snapshot_id = snapshot_id
+        self.root = root
+        self.depth_limits = depth_limits or {}
+        self.entries: List[Tuple[str, bool]] = []  # (path, is_file)
+        self.extensions = set()
+        self.file_count = 0
+        self.folder_count = 0
+        self.complete = False
+        self.last_access = time.monotonic()
+        self._folder_counts: Dict[int, int] = {}
+        self._file_counts: Dict[int, int] = {}
+        select = self._limit_listing if self.depth_limits else None
+        self._listings = iter_scan(root, workers=workers, scan_filter=scan_filter, select=select)
+        self._lock = threading.Lock()
+
+    def _take(self, counts: Dict[int, int], depth: int, wanted: int) -> int:
+        """
+        Reserve up to `wanted` slots of the quota at `depth`; returns how many were granted.
+        """
+        limit = self.depth_limits.get(depth)
+        if limit is None:
+            return wanted
+        count = counts.get(depth, 0)
+        granted = max(0, min(wanted, limit - count))
+        counts[depth] = count + granted
+        return granted
+
+    def _limit_listing(self, listing: DirectoryListing) -> DirectoryListing:
+        """
+        Apply the per-depth folder and file quotas to one listing during the walk.
+        """
+        depth = listing.depth + 1
+        dirs = listing.dirs[:self._take(self._folder_counts, depth, len(listing.dirs))]
+        files = listing.files[:self._take(self._file_counts, depth, len(listing.files))]
+        return listing._replace(dirs=dirs, files=files)
+
+    def _fill(self, size: int):
+        """
+        Advance the walk until at least `size` entries are recorded or it ends.
+        """
+        while len(self.entries) < size and not self.complete:
+            listing = next(self._listings, None)
+            if listing is None:
+                self.complete = True
+                break
+            prefix = os.path.join(listing.path, "")
+            for name in listing.dirs:
+                rel_path = os.path.join(listing.rel_path, name) if listing.rel_path else name
+                self.entries.append((rel_path, False))
+                self.folder_count += 1
+            for entry in listing.files:
+                self.entries.append((prefix + entry.name, True))
+                self.extensions.add(file_extension(entry.name))
+                self.file_count += 1
+
+    def page(self, offset: int, limit: int) -> Dict[str, Any]:
+        """
+        Return the entries in [offset, offset + limit) and the cursor for the next page.
+        """
+        with self._lock:
+            self.last_access = time.monotonic()
+            # Read one entry past the page so we know whether another page exists
+            self._fill(offset + limit + 1)
+            window = self.entries[offset:offset + limit]
+            end = offset + len(window)
+            has_more = end < len(self.entries) or not self.complete
+            return {
+                "files": [path for path, is_file in window if is_file],
+                "folders": [path for path, is_file in window if not is_file],
+                "extensions": list(self.extensions),
+                "next_cursor": encode_cursor(self.snapshot_id, end) if has_more else None,
+                "complete": self.complete,
+                "total_files": self.file_count,
+                "total_folders": self.folder_count,
+            }
+
+
+class SnapshotStore:
+    """
+    Keeps the most recently used walk snapshots, evicting by TTL and count.
+    """
+    def __init__(self, ttl: float = SNAPSHOT_TTL, max_snapshots: int = MAX_SNAPSHOTS):
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[str, WalkSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        now = time.monotonic()
+        for snapshot_id in [k for k, s in self._snapshots.items() if now - s.last_access > self.ttl]:
+            del self._snapshots[snapshot_id]
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+
+    def create(
+        self,
+        root: str,
+        workers: int = 1,
+        depth_limits: Optional[Dict[int, int]] = None,
+        scan_filter: Optional[ScanFilter] = None,
+    ) -> WalkSnapshot:
+        snapshot = WalkSnapshot(uuid.uuid4().hex, root, workers, depth_limits, scan_filter)
+        with self._lock:
+            self._snapshots[snapshot.snapshot_id] = snapshot
+            self._evict()
+        return snapshot
+
+    def get(self, snapshot_id: str) -> Optional[WalkSnapshot]:
+        with self._lock:
+            self._evict()
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is not None:
+                self._snapshots.move_to_end(snapshot_id)
+            return snapshot
+
+
+def encode_cursor(snapshot_id: str, offset: int) -> str:
+    """
+    Encode a snapshot id and entry offset as an opaque cursor string.
+    """
+    raw = json.dumps({"s": snapshot_id, "o": offset}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        snapshot_id, offset = str(data["s"]), int(data["o"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return snapshot_id, offset